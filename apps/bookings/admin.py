@@ -1,8 +1,18 @@
+from functools import partial
+
 from django.contrib import admin
+from django.db import transaction
 from django.utils import timezone
 from django.db.models import Q
 from django.utils.html import format_html
-from .models import Event
+from apps.core.versioning import StaleVersion, VersionedModelForm
+from .conflicts import IntervalIndex
+from .models import Event, EventSeries, WaitlistEntry
+from .tasks import (
+    reject_overlapping_pending, revoke_event_transitions, schedule_event_transitions,
+    send_approval_notifications, sync_space_status
+)
+from .transitions import can_transition, transition
 from apps.notifications.views import send_booking_approved_notification, send_booking_rejected_notification
 
 # Define status choices as constants to ensure consistency
@@ -67,6 +77,7 @@ class EventStatusFilter(admin.SimpleListFilter):
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
+    form = VersionedModelForm
     list_display = ('event_name', 'status_with_badge', 'space', 'event_type',
                    'formatted_start_time', 'formatted_end_time', 
                    'organizer_name', 'time_until_event')
@@ -151,93 +162,168 @@ class EventAdmin(admin.ModelAdmin):
     formatted_end_time.admin_order_field = 'end_datetime'
 
     def save_model(self, request, obj, form, change):
-        if change:
-            old_obj = Event.objects.get(pk=obj.pk)
-            old_status = old_obj.status
-            new_status = obj.status
-            
-            # Validate status transitions
-            if old_status == STATUS_COMPLETED and new_status != STATUS_COMPLETED:
-                # Don't allow changing completed events
-                self.message_user(request, 'Completed events cannot be modified.', level='ERROR')
-                obj.status = STATUS_COMPLETED
-            
-            elif old_status == STATUS_CANCELLED and new_status not in [STATUS_CANCELLED, STATUS_REJECTED]:
-                # Don't allow reactivating cancelled events
-                self.message_user(request, 'Cancelled events cannot be reactivated.', level='ERROR')
-                obj.status = STATUS_CANCELLED
-            
-            elif old_status != STATUS_CONFIRMED and new_status == STATUS_CONFIRMED:
-                # When confirming an event, check for conflicts
-                conflicts = Event.objects.filter(
-                    space=obj.space,
-                    status=STATUS_CONFIRMED,
-                    start_datetime__lt=obj.end_datetime,
-                    end_datetime__gt=obj.start_datetime
-                ).exclude(pk=obj.pk)
-                
-                if conflicts.exists():
-                    self.message_user(
-                        request,
-                        'Cannot confirm event due to scheduling conflict.',
-                        level='ERROR'
-                    )
-                    obj.status = old_status
-                else:
-                    # Send confirmation notification
-                    super().save_model(request, obj, form, change)
-                    send_booking_approved_notification(obj, obj.space, obj.user)
-                    self.message_user(
-                        request,
-                        'Event confirmed successfully and notification sent.',
-                        level='SUCCESS'
-                    )
-                    return
-            
-            elif new_status == STATUS_COMPLETED and obj.end_datetime > timezone.now():
-                # Don't allow marking future events as completed
+        if not change:
+            super().save_model(request, obj, form, change)
+            if obj.status == STATUS_CONFIRMED:
+                transaction.on_commit(partial(schedule_event_transitions, obj))
+            return
+
+        # Values as loaded by the change view, so no second fetch is needed
+        previous = {
+            attname: obj.loaded_value(attname)
+            for attname in ('status', 'start_datetime', 'end_datetime', 'space_id')
+        }
+        old_status, new_status = previous['status'], obj.status
+        # The form saves every other field; the status goes through transition()
+        obj.status = old_status
+        if new_status != old_status:
+            error = self.status_change_error(obj, old_status, new_status)
+            if error:
+                self.message_user(request, error, level='ERROR')
+                new_status = old_status
+
+        # Write only what the form changed; a status-only edit skips this
+        changed = obj.changed_fields()
+        if changed:
+            try:
+                # A savepoint, so the admin's transaction survives a stale save
+                with transaction.atomic():
+                    obj.save(update_fields=[*changed, 'updated_at'])
+            except StaleVersion:
+                # Lost a race with another save after the form was checked
                 self.message_user(
                     request,
-                    'Cannot mark future events as completed.',
+                    'The event was changed by someone else; your changes were not saved.',
                     level='ERROR'
                 )
-                obj.status = old_status
-        
-        # Send rejection email if status changed to 'rejected'
-        if change:
-            old_obj = Event.objects.get(pk=obj.pk)
-            # Send rejection email if status changed to 'rejected'
-            if old_obj.status != 'rejected' and obj.status == 'rejected':
-                send_booking_rejected_notification(obj, obj.space, obj.user)
-        
-        super().save_model(request, obj, form, change)
+                return
+            self.reschedule_transitions(previous, obj)
+        if new_status == old_status:
+            return
 
-    def mark_as_confirmed(self, request, queryset):
-        now = timezone.now()
-        success_count = 0
-        error_count = 0
-        
-        for event in queryset.filter(status=STATUS_PENDING):
-            # Check for conflicts
+        changed = transition(Event.objects.filter(pk=obj.pk), new_status, from_statuses=old_status)
+        if not changed:
+            # Someone else changed the status after the form was loaded;
+            # tell nobody about a change that did not happen
+            self.message_user(
+                request,
+                f'The event is no longer {old_status}; its status was not changed and no notification was sent.',
+                level='ERROR'
+            )
+            return
+        obj.status = new_status
+        if new_status == STATUS_CONFIRMED:
+            send_booking_approved_notification(obj, obj.space, obj.user)
+            self.message_user(
+                request,
+                'Event confirmed successfully and notification sent.',
+                level='SUCCESS'
+            )
+            rejected = reject_overlapping_pending(changed)
+            if rejected:
+                self.message_user(
+                    request,
+                    f'{len(rejected)} overlapping pending events were rejected.',
+                    level='WARNING'
+                )
+        elif new_status == STATUS_REJECTED:
+            send_booking_rejected_notification(obj, obj.space, obj.user)
+
+    def status_change_error(self, obj, old_status, new_status):
+        """Why obj may not move from old_status to new_status, or None"""
+        if old_status == STATUS_COMPLETED:
+            return 'Completed events cannot be modified.'
+        if old_status == STATUS_CANCELLED and new_status != STATUS_REJECTED:
+            return 'Cancelled events cannot be reactivated.'
+        if not can_transition(old_status, new_status):
+            return f'Events cannot move from {old_status} to {new_status}.'
+        if new_status == STATUS_COMPLETED and obj.end_datetime > timezone.now():
+            return 'Cannot mark future events as completed.'
+        if new_status == STATUS_CONFIRMED:
             conflicts = Event.objects.filter(
-                space=event.space,
+                space=obj.space,
                 status=STATUS_CONFIRMED,
-                start_datetime__lt=event.end_datetime,
-                end_datetime__gt=event.start_datetime
-            ).exclude(pk=event.pk)
-            
+                start_datetime__lt=obj.end_datetime,
+                end_datetime__gt=obj.start_datetime
+            ).exclude(pk=obj.pk)
             if conflicts.exists():
-                error_count += 1
-                self.message_user(
-                    request,
-                    f'Cannot confirm "{event.event_name}" due to scheduling conflict.',
-                    level='ERROR'
+                return 'Cannot confirm event due to scheduling conflict.'
+        return None
+
+    def reschedule_transitions(self, previous, obj):
+        """Move the start/end tasks of a confirmed event whose time or space changed"""
+        rescheduled = (
+            previous['start_datetime'] != obj.start_datetime or
+            previous['end_datetime'] != obj.end_datetime or
+            previous['space_id'] != obj.space_id
+        )
+        if previous['status'] != STATUS_CONFIRMED or not rescheduled:
+            return
+        transaction.on_commit(partial(
+            revoke_event_transitions,
+            obj.pk, previous['start_datetime'], previous['end_datetime']
+        ))
+        # Free the old space now if the event was in progress
+        transaction.on_commit(partial(
+            sync_space_status, {previous['space_id'], obj.space_id}
+        ))
+        transaction.on_commit(partial(schedule_event_transitions, obj))
+
+    def mark_as_confirmed(self, request, queryset):
+        with transaction.atomic():
+            selected = queryset.filter(status=STATUS_PENDING)
+            first_start = selected.order_by('start_datetime').values('start_datetime')[:1]
+            last_end = selected.order_by('-end_datetime').values('end_datetime')[:1]
+            # The selected pending events plus every confirmed event in their
+            # spaces and time span, locked, in a single query
+            rows = Event.objects.select_for_update().filter(
+                Q(pk__in=selected.values('pk')) |
+                Q(
+                    status=STATUS_CONFIRMED,
+                    space__in=selected.values('space'),
+                    start_datetime__lt=last_end,
+                    end_datetime__gt=first_start
                 )
-            else:
-                event.status = STATUS_CONFIRMED
-                event.save()
-                send_booking_approved_notification(event, event.space, event.user)
-                success_count += 1
+            ).order_by('created_at', 'id')
+
+            booked = IntervalIndex()
+            candidates = []
+            for event in rows:
+                if event.status == STATUS_CONFIRMED:
+                    booked.add(event.space_id, event.start_datetime, event.end_datetime, event)
+                else:
+                    candidates.append(event)
+
+            # First come, first served among the selected events. Only SQLite
+            # can hold overlapping pending/confirmed rows; on PostgreSQL the
+            # exclusion constraint already kept them out, so nothing conflicts.
+            confirmed, conflicting = [], []
+            for event in candidates:
+                if booked.find_overlap(event.space_id, event.start_datetime, event.end_datetime):
+                    conflicting.append(event)
+                    continue
+                booked.add(event.space_id, event.start_datetime, event.end_datetime, event)
+                confirmed.append(event.pk)
+
+            approved = transition(
+                Event.objects.filter(pk__in=confirmed), STATUS_CONFIRMED, from_statuses=STATUS_PENDING
+            )
+            success_count = len(approved)
+            if approved:
+                # Only the events this transition actually confirmed
+                transaction.on_commit(partial(send_approval_notifications.delay, [event.id for event in approved]))
+            # Including the selected events that lost to one confirmed here
+            # (SQLite only, see reject_overlapping_pending)
+            rejected = reject_overlapping_pending(approved)
+
+        rejected_ids = {event.id for event in rejected}
+        conflicting = [event for event in conflicting if event.id not in rejected_ids]
+        for event in conflicting[:10]:
+            self.message_user(
+                request,
+                f'Cannot confirm "{event.event_name}" due to scheduling conflict.',
+                level='ERROR'
+            )
         
         if success_count > 0:
             self.message_user(
@@ -245,26 +331,31 @@ class EventAdmin(admin.ModelAdmin):
                 f'{success_count} events were confirmed successfully.',
                 level='SUCCESS'
             )
-        if error_count > 0:
+        if rejected:
+            self.message_user(
+                request,
+                f'{len(rejected)} overlapping pending events were rejected.',
+                level='WARNING'
+            )
+        if conflicting:
             self.message_user(
                 request,
-                f'{error_count} events could not be confirmed due to conflicts.',
+                f'{len(conflicting)} events could not be confirmed due to conflicts.',
                 level='WARNING'
             )
     mark_as_confirmed.short_description = 'Confirm selected events'
 
     def mark_as_cancelled(self, request, queryset):
-        # Can't cancel completed events
-        non_completed = queryset.exclude(status=STATUS_COMPLETED)
-        skipped = queryset.filter(status=STATUS_COMPLETED).count()
-        updated = non_completed.update(status=STATUS_CANCELLED)
+        # Only pending and confirmed events can be cancelled
+        updated = len(transition(queryset, STATUS_CANCELLED))
+        skipped = queryset.count() - updated
         
         if updated > 0:
             self.message_user(request, f'{updated} events were cancelled.', level='SUCCESS')
         if skipped > 0:
             self.message_user(
                 request,
-                f'{skipped} completed events were skipped.',
+                f'{skipped} completed, cancelled or rejected events were skipped.',
                 level='WARNING'
             )
     mark_as_cancelled.short_description = 'Cancel selected events'
@@ -272,11 +363,9 @@ class EventAdmin(admin.ModelAdmin):
     def mark_as_completed(self, request, queryset):
         now = timezone.now()
         # Only complete confirmed events that have ended
-        completable = queryset.filter(
-            status=STATUS_CONFIRMED,
-            end_datetime__lt=now
-        )
-        updated = completable.update(status=STATUS_COMPLETED)
+        updated = len(transition(
+            queryset.filter(end_datetime__lt=now), STATUS_COMPLETED, from_statuses=STATUS_CONFIRMED
+        ))
         skipped = queryset.count() - updated
         
         if updated > 0:
@@ -294,3 +383,18 @@ class EventAdmin(admin.ModelAdmin):
             'all': ('admin/css/custom_admin.css',)
         }
 
+
+@admin.register(EventSeries)
+class EventSeriesAdmin(admin.ModelAdmin):
+    list_display = ('id', 'space', 'user', 'frequency', 'interval', 'until', 'created_at')
+    list_filter = ('frequency', 'space')
+    search_fields = ('user__email', 'space__name')
+    readonly_fields = ('created_at',)
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event_name', 'space', 'user', 'start_datetime', 'end_datetime', 'status', 'created_at')
+    list_filter = ('status', 'space')
+    search_fields = ('event_name', 'user__email', 'space__name')
+    readonly_fields = ('event', 'created_at', 'promoted_at')
@@ -0,0 +1,163 @@
+import gzip
+import json
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import OCCUPYING_STATUSES, Event, WaitlistEntry
+from .occupancy import event_days, refresh_occupancy
+
+# Events in these statuses that ended EVENT_ARCHIVE_AFTER_DAYS ago are
+# moved out of the database into gzipped newline-delimited JSON files
+ARCHIVE_STATUSES = ('completed', 'cancelled')
+BATCH_SIZE = 1000
+ROWS_PER_FILE = 50_000
+FIELDS = [field.attname for field in Event._meta.concrete_fields]
+
+# events-<first start day>-<last start day>-<run id>.ndjson.gz, days in UTC,
+# so a reader can skip files outside the range it wants without opening them
+FILE_NAME = re.compile(r'^events-(\d{8})-(\d{8})-[0-9a-f]+\.ndjson\.gz$')
+
+
+def archive_dir():
+    return getattr(settings, 'EVENT_ARCHIVE_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'event-archive')
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'EVENT_ARCHIVE_AFTER_DAYS', 365)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable(before):
+    return Event.objects.filter(status__in=ARCHIVE_STATUSES, end_datetime__lt=before)
+
+
+def archive_events(before, batch_size=BATCH_SIZE, rows_per_file=ROWS_PER_FILE):
+    """
+    Move the archivable events that ended before `before` into archive
+    files, oldest id first. Rows are read in keyset batches of batch_size
+    and only deleted once the file holding them is complete on disk.
+    Returns (paths of the files written, number of events archived).
+    """
+    os.makedirs(archive_dir(), exist_ok=True)
+    paths, archived, last_id = [], 0, 0
+    while True:
+        path, ids, last_id = write_archive_file(before, last_id, batch_size, rows_per_file)
+        if path is None:
+            return paths, archived
+        delete_events(ids, batch_size)
+        paths.append(path)
+        archived += len(ids)
+
+
+def write_archive_file(before, last_id, batch_size, rows_per_file):
+    """
+    Stream up to rows_per_file events with an id above last_id into a new
+    archive file. Returns (path or None if there was nothing left, the ids
+    written, the last id written).
+    """
+    run_id = uuid.uuid4().hex[:12]
+    partial = os.path.join(archive_dir(), f'.events-{run_id}.ndjson.gz.partial')
+    ids, first_day, last_day = [], None, None
+    with gzip.open(partial, 'wt', encoding='utf-8') as out:
+        while len(ids) < rows_per_file:
+            rows = list(
+                archivable(before).filter(id__gt=last_id).order_by('id')
+                .values(*FIELDS)[:min(batch_size, rows_per_file - len(ids))]
+            )
+            if not rows:
+                break
+            for row in rows:
+                out.write(json.dumps(row, cls=DjangoJSONEncoder))
+                out.write('\n')
+                day = row['start_datetime'].astimezone(dt_timezone.utc).date()
+                first_day = day if first_day is None else min(first_day, day)
+                last_day = day if last_day is None else max(last_day, day)
+            ids.extend(row['id'] for row in rows)
+            last_id = rows[-1]['id']
+
+    if not ids:
+        os.remove(partial)
+        return None, ids, last_id
+    with open(partial, 'rb') as written:
+        os.fsync(written.fileno())
+    path = os.path.join(archive_dir(), f'events-{first_day:%Y%m%d}-{last_day:%Y%m%d}-{run_id}.ndjson.gz')
+    # Readers only list complete files
+    os.replace(partial, path)
+    return path, ids, last_id
+
+
+def delete_events(ids, batch_size=BATCH_SIZE):
+    """
+    Delete archived events in batches. The post_delete receivers would
+    redraw occupancy once per event, so each batch does what they would,
+    once, around a single DELETE.
+    """
+    table = connection.ops.quote_name(Event._meta.db_table)
+    for offset in range(0, len(ids), batch_size):
+        chunk = ids[offset:offset + batch_size]
+        with transaction.atomic():
+            keys = set()
+            occupying = Event.objects.filter(
+                id__in=chunk, status__in=OCCUPYING_STATUSES
+            ).values_list('space_id', 'start_datetime', 'end_datetime')
+            for space_id, start, end in occupying:
+                keys |= event_days(space_id, start, end)
+            WaitlistEntry.objects.filter(event_id__in=chunk).update(event=None)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(chunk))})', chunk
+                )
+            if keys:
+                # Usage rollups keep the archived days for reporting
+                refresh_occupancy(keys, usage=False)
+
+
+def archive_files(first_day=None, last_day=None):
+    """Complete archive files that may hold events starting between the two days"""
+    try:
+        names = sorted(os.listdir(archive_dir()))
+    except FileNotFoundError:
+        return []
+    paths = []
+    for name in names:
+        match = FILE_NAME.match(name)
+        if not match:
+            continue
+        file_first = datetime.strptime(match[1], '%Y%m%d').date()
+        file_last = datetime.strptime(match[2], '%Y%m%d').date()
+        if (last_day is None or file_first <= last_day) and (first_day is None or file_last >= first_day):
+            paths.append(os.path.join(archive_dir(), name))
+    return paths
+
+
+def read_archive(start, end, space_id=None, statuses=None):
+    """
+    Yield the archived events starting in [start, end), optionally only in
+    one space or in some statuses, as dicts of their column values.
+
+    A run interrupted between writing a file and deleting its rows archives
+    those rows again on its next run, so an id is only yielded once.
+    """
+    seen = set()
+    for path in archive_files(start.astimezone(dt_timezone.utc).date(), end.astimezone(dt_timezone.utc).date()):
+        with gzip.open(path, 'rt', encoding='utf-8') as archived:
+            for line in archived:
+                record = json.loads(line)
+                if space_id is not None and record['space_id'] != space_id:
+                    continue
+                if statuses and record['status'] not in statuses:
+                    continue
+                event_start = parse_datetime(record['start_datetime'])
+                if not start <= event_start < end or record['id'] in seen:
+                    continue
+                seen.add(record['id'])
+                yield record
@@ -0,0 +1,58 @@
+from datetime import timedelta
+from functools import partial
+
+from django.db import transaction
+
+from .space_index import space_intervals
+
+# Availability used to cache each space's busy intervals per (space, day).
+# The interval index in space_index replaced that cache: it holds every
+# active event of a space, so windows spanning days need no stitching, and
+# it is dropped through the same invalidation channel as the booking
+# checks. Without that channel (INTERVAL_INDEX_REDIS_URL), or inside a
+# transaction, the index is not live and every lookup is an indexed SQL
+# range query, so changes made by other processes are never served stale.
+
+
+def invalidate_availability(space_ids):
+    """Drop the indexed intervals of the given spaces in every process"""
+    space_intervals.invalidate(space_ids)
+
+
+def invalidate_availability_on_commit(space_ids):
+    """
+    Drop this process's intervals for the spaces now, so the rest of the
+    transaction sees its own writes, and every process's once it commits
+    """
+    space_ids = set(space_ids)
+    space_intervals.discard(space_ids)
+    transaction.on_commit(partial(invalidate_availability, space_ids))
+
+
+def busy_intervals(space_id, window_start, window_end):
+    """
+    Sorted (start, end) pairs of pending/confirmed events on the space that
+    touch the window, answered from the in-process interval index while it
+    is live and from the database otherwise
+    """
+    return space_intervals.between(space_id, window_start, window_end)
+
+
+def free_slots(intervals, window_start, window_end, min_duration=timedelta(0)):
+    """
+    Gaps of at least min_duration between sorted busy intervals, computed in
+    a single pass.
+    """
+    slots = []
+    cursor = window_start
+    for start, end in intervals:
+        if end <= cursor:
+            continue
+        if start >= window_end:
+            break
+        if start - cursor >= min_duration and start > cursor:
+            slots.append((cursor, start))
+        cursor = max(cursor, end)
+    if window_end > cursor and window_end - cursor >= min_duration:
+        slots.append((cursor, window_end))
+    return slots
@@ -0,0 +1,64 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from .models import Event
+from .space_index import SpaceIntervals, to_micros
+
+
+class IntervalIndex:
+    """
+    Intervals of any number of spaces for answering overlap questions in
+    memory, one SpaceIntervals per space with the items kept alongside.
+    Intervals are half-open, so back-to-back events do not overlap.
+    """
+
+    def __init__(self):
+        self._by_space = defaultdict(SpaceIntervals)
+        self._items = []
+
+    def add(self, space_id, start, end, item):
+        self._by_space[space_id].add(to_micros(start), to_micros(end), len(self._items))
+        self._items.append(item)
+
+    def find_overlap(self, space_id, start, end):
+        """Return the item of an interval overlapping [start, end), or None"""
+        intervals = self._by_space.get(space_id)
+        if intervals is None:
+            return None
+        position = intervals.find_overlap(to_micros(start), to_micros(end))
+        return None if position is None else self._items[position]
+
+
+def load_active_intervals(ranges, exclude_ids=()):
+    """
+    Index every pending/confirmed event overlapping any of the given
+    (space_id, start, end) ranges, using one query over their union.
+    """
+    index = IntervalIndex()
+    ranges = list(ranges)
+    if not ranges:
+        return index
+
+    overlaps_any = reduce(or_, (
+        Q(space_id=space_id, start_datetime__lt=end, end_datetime__gt=start)
+        for space_id, start, end in ranges
+    ))
+    events = Event.objects.filter(overlaps_any).active().exclude(id__in=exclude_ids)
+    for event in events:
+        index.add(event.space_id, event.start_datetime, event.end_datetime, event)
+    return index
+
+
+def load_space_intervals(space_id, start, end, exclude_ids=()):
+    """
+    Index the pending/confirmed events of one space that touch [start, end),
+    e.g. the span of a recurring series, with a single range query.
+    """
+    index = IntervalIndex()
+    events = Event.objects.overlapping(space_id, start, end).exclude(id__in=exclude_ids)
+    for event in events:
+        index.add(event.space_id, event.start_datetime, event.end_datetime, event)
+    return index
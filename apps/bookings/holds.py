@@ -0,0 +1,229 @@
+import logging
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+
+from .space_index import from_micros, to_micros
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'bookings:holds:'
+
+# Members are "<hold id>:<user id>:<start us>:<end us>" scored by their expiry
+# in epoch milliseconds. Expired members are trimmed by the next script
+# that touches the space, and the key itself expires with its last hold,
+# so an abandoned hold never costs a write.
+PARSE_MEMBER = """
+local function parse(member)
+    local hold_id, user, hold_start, hold_end = string.match(member, '^(%w+):(%d+):(%d+):(%d+)$')
+    return hold_id, user, tonumber(hold_start), tonumber(hold_end)
+end
+"""
+
+# KEYS[1] space key; ARGV: now ms, user id, start us, end us, expiry ms, member.
+# Returns the overlapping hold of another user, or nil after adding ours.
+PLACE_SCRIPT = PARSE_MEMBER + """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local start_, end_ = tonumber(ARGV[3]), tonumber(ARGV[4])
+for _, member in ipairs(redis.call('ZRANGE', KEYS[1], 0, -1)) do
+    local _, user, hold_start, hold_end = parse(member)
+    if user ~= ARGV[2] and hold_start < end_ and hold_end > start_ then
+        return member
+    end
+end
+redis.call('ZADD', KEYS[1], ARGV[5], ARGV[6])
+local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+redis.call('PEXPIREAT', KEYS[1], last[2])
+return nil
+"""
+
+# KEYS[1] space key; ARGV: now ms, user id, partial (0 or 1), then start us,
+# end us of each range. Checks every range against other users' holds and
+# takes (removes) the user's own holds overlapping the ranges that are free,
+# in one step, so no hold can be placed between the check and the take.
+# Unless partial is 1 nothing is taken when any range clashes. Returns
+# {clashes, taken}: a member, score pair per range ('' when free) and the
+# member, score pairs taken.
+CONSUME_SCRIPT = PARSE_MEMBER + """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local holds = redis.call('ZRANGE', KEYS[1], 0, -1, 'WITHSCORES')
+local clashes, free, clashed = {}, {}, false
+for i = 4, #ARGV, 2 do
+    local start_, end_ = tonumber(ARGV[i]), tonumber(ARGV[i + 1])
+    local clash = nil
+    for j = 1, #holds, 2 do
+        local _, user, hold_start, hold_end = parse(holds[j])
+        if user ~= ARGV[2] and hold_start < end_ and hold_end > start_ then
+            clash = j
+            break
+        end
+    end
+    if clash then
+        table.insert(clashes, holds[clash])
+        table.insert(clashes, holds[clash + 1])
+        clashed = true
+    else
+        table.insert(clashes, '')
+        table.insert(clashes, '')
+        table.insert(free, {start_, end_})
+    end
+end
+local taken = {}
+if clashed and ARGV[3] ~= '1' then
+    return {clashes, taken}
+end
+for j = 1, #holds, 2 do
+    local _, user, hold_start, hold_end = parse(holds[j])
+    if user == ARGV[2] then
+        for _, range in ipairs(free) do
+            if hold_start < range[2] and hold_end > range[1] then
+                redis.call('ZREM', KEYS[1], holds[j])
+                table.insert(taken, holds[j])
+                table.insert(taken, holds[j + 1])
+                break
+            end
+        end
+    end
+end
+return {clashes, taken}
+"""
+
+# KEYS[1] space key; ARGV: member, score pairs taken by CONSUME_SCRIPT.
+# Puts them back; ones that have expired since are trimmed as usual.
+RESTORE_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    redis.call('ZADD', KEYS[1], ARGV[i + 1], ARGV[i])
+end
+local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+redis.call('PEXPIREAT', KEYS[1], last[2])
+return #ARGV / 2
+"""
+
+
+class HoldsUnavailable(Exception):
+    pass
+
+
+class Hold:
+    __slots__ = ('id', 'user_id', 'start', 'end', 'expires_at')
+
+    def __init__(self, member, score):
+        if isinstance(member, bytes):
+            member = member.decode()
+        hold_id, user_id, start, end = member.split(':')
+        self.id = hold_id
+        self.user_id = int(user_id)
+        self.start = from_micros(int(start))
+        self.end = from_micros(int(end))
+        self.expires_at = datetime.fromtimestamp(score / 1000, tz=dt_timezone.utc)
+
+
+_client = None
+_scripts = {}
+
+
+def get_client():
+    global _client
+    url = getattr(settings, 'BOOKING_HOLD_REDIS_URL', None)
+    if not url:
+        raise HoldsUnavailable('Booking holds are not configured')
+    if _client is None:
+        _client = redis.Redis.from_url(url)
+        _scripts['place'] = _client.register_script(PLACE_SCRIPT)
+        _scripts['consume'] = _client.register_script(CONSUME_SCRIPT)
+        _scripts['restore'] = _client.register_script(RESTORE_SCRIPT)
+    return _client
+
+
+def space_key(space_id):
+    return f'{KEY_PREFIX}{space_id}'
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def place_hold(space_id, user_id, start, end, seconds=None):
+    """
+    Hold [start, end) in the space for the user. Returns (hold, None) or,
+    if another user holds an overlapping range, (None, their hold).
+    """
+    client = get_client()
+    seconds = seconds or getattr(settings, 'BOOKING_HOLD_SECONDS', 600)
+    now = now_ms()
+    expires = now + seconds * 1000
+    member = f'{uuid.uuid4().hex}:{user_id}:{to_micros(start)}:{to_micros(end)}'
+    try:
+        clash = _scripts['place'](
+            keys=[space_key(space_id)],
+            args=[now, user_id, to_micros(start), to_micros(end), expires, member],
+            client=client
+        )
+        if clash is not None:
+            return None, Hold(clash, client.zscore(space_key(space_id), clash) or now)
+    except redis.RedisError as exc:
+        raise HoldsUnavailable('Could not reach the hold store') from exc
+    return Hold(member, expires), None
+
+
+class HoldClaim:
+    """
+    The holds a booking takes from the store, put back if the booking does
+    not go through. Used as a context manager around the booking's
+    transaction, so an exception leaving it restores what was taken; a
+    booking abandoned without one calls restore() itself.
+
+    Fails open when the store is unreachable, since the database remains
+    the authority on bookings.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.taken = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.restore()
+
+    def take(self, space_id, ranges, partial=False):
+        """
+        Check the (start, end) ranges of one space against other users'
+        holds and take the user's own holds overlapping them, atomically.
+        Returns {range index: the other user's Hold} for the ranges held by
+        someone else. Unless partial, nothing is taken if there are any.
+        """
+        ranges = list(ranges)
+        args = [now_ms(), self.user_id, int(partial)]
+        for start, end in ranges:
+            args += [to_micros(start), to_micros(end)]
+        try:
+            client = get_client()
+            clashes, taken = _scripts['consume'](keys=[space_key(space_id)], args=args, client=client)
+        except HoldsUnavailable:
+            return {}
+        except redis.RedisError:
+            logger.warning('Could not check booking holds', exc_info=True)
+            return {}
+        if taken:
+            self.taken.setdefault(space_id, []).extend(taken)
+        return {
+            index: Hold(clashes[2 * index], float(clashes[2 * index + 1]))
+            for index in range(len(ranges))
+            if clashes[2 * index]
+        }
+
+    def restore(self):
+        """Put back every hold taken so far"""
+        taken, self.taken = self.taken, {}
+        for space_id, members in taken.items():
+            try:
+                _scripts['restore'](keys=[space_key(space_id)], args=members, client=get_client())
+            except (HoldsUnavailable, redis.RedisError):
+                # Lost; the slot is simply no longer held
+                logger.warning('Could not restore booking holds', exc_info=True)
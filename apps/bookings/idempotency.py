@@ -0,0 +1,87 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from drf_yasg import openapi
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+KEY_PREFIX = 'bookings:idempotency:'
+# Covers one attempt; a crashed request frees its key after this long
+IN_PROGRESS_TIMEOUT = 60
+IN_PROGRESS = 'in-progress'
+
+IDEMPOTENCY_KEY_PARAMETER = openapi.Parameter(
+    HEADER, openapi.IN_HEADER, type=openapi.TYPE_STRING,
+    description='Unique key per booking attempt; retries with the same key replay the first response'
+)
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def idempotent(handler):
+    """
+    Replay the stored response when a client retries a request with the
+    same Idempotency-Key header, without running the view again.
+
+    Keys are scoped to the user. The first request claims the key with
+    cache.add(), so a concurrent retry gets 409 instead of a second
+    booking. Responses below 500 are kept for IDEMPOTENCY_KEY_TTL seconds;
+    reusing a key with a different body is a 422.
+    """
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return handler(view, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({
+                'message': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key = f'{KEY_PREFIX}{request.user.pk}:{hashlib.sha256(key.encode()).hexdigest()}'
+        fingerprint = request_fingerprint(request)
+        if not cache.add(cache_key, {'state': IN_PROGRESS, 'fingerprint': fingerprint}, IN_PROGRESS_TIMEOUT):
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return replay(stored, fingerprint)
+            # Expired between add() and get(); treat as a fresh request
+            cache.add(cache_key, {'state': IN_PROGRESS, 'fingerprint': fingerprint}, IN_PROGRESS_TIMEOUT)
+
+        try:
+            response = handler(view, request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+            return response
+        cache.set(cache_key, {
+            'state': 'done',
+            'fingerprint': fingerprint,
+            'status': response.status_code,
+            'data': response.data,
+        }, getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+        return response
+    return wrapper
+
+
+def replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return Response({
+            'message': f'{HEADER} was already used for a different request'
+        }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if stored['state'] == IN_PROGRESS:
+        return Response({
+            'message': f'A request with this {HEADER} is still being processed'
+        }, status=status.HTTP_409_CONFLICT)
+    response = Response(stored['data'], status=stored['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
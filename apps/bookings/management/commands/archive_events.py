@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.bookings.archive import BATCH_SIZE, archive_cutoff, archive_events
+
+
+class Command(BaseCommand):
+    help = 'Move completed and cancelled events that ended long ago into gzipped NDJSON archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Archive events that ended more than this many days ago '
+                                 '(default EVENT_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Rows read and deleted per query')
+
+    def handle(self, *args, **options):
+        before = archive_cutoff(options['days'])
+        paths, archived = archive_events(before, batch_size=options['batch_size'])
+        for path in paths:
+            self.stdout.write(f'Wrote {path}')
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} events that ended before {before:%Y-%m-%d}'))
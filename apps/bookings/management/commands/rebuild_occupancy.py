@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from apps.spaces.models import Space
+from apps.bookings.models import OCCUPYING_STATUSES, Event, SpaceOccupancy
+from apps.bookings.occupancy import event_days, refresh_occupancy
+
+SPACES_PER_BATCH = 100
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the occupancy bitmaps from confirmed and completed events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--space', type=int, action='append', dest='spaces',
+                            help='Only rebuild this space (repeatable)')
+
+    def handle(self, *args, **options):
+        space_ids = options['spaces'] or list(Space.objects.order_by('id').values_list('id', flat=True))
+        for offset in range(0, len(space_ids), SPACES_PER_BATCH):
+            batch = space_ids[offset:offset + SPACES_PER_BATCH]
+            # Existing rows are included so days that lost all their events are cleared
+            keys = set(SpaceOccupancy.objects.filter(space_id__in=batch).values_list('space_id', 'day'))
+            events = Event.objects.filter(
+                space_id__in=batch, status__in=OCCUPYING_STATUSES
+            ).values_list('space_id', 'start_datetime', 'end_datetime')
+            for space_id, start, end in events.iterator():
+                keys |= event_days(space_id, start, end)
+            # Not the usage rollups: their archived days have no events left
+            refresh_occupancy(keys, usage=False)
+            self.stdout.write(f'Rebuilt {len(keys)} space-days for {len(batch)} spaces')
+        self.stdout.write(self.style.SUCCESS('Occupancy rebuilt'))
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# Pending and confirmed events on the same space may not overlap. The range is
+# half-open so back-to-back bookings (10:00-11:00, 11:00-12:00) are allowed.
+CREATE_CONSTRAINT = """
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE bookings_event
+    ADD CONSTRAINT bookings_event_no_overlap
+    EXCLUDE USING gist (
+        space_id WITH =,
+        tstzrange(start_datetime, end_datetime, '[)') WITH &&
+    )
+    WHERE (status IN ('pending', 'confirmed'));
+"""
+
+DROP_CONSTRAINT = """
+ALTER TABLE bookings_event DROP CONSTRAINT IF EXISTS bookings_event_no_overlap;
+"""
+
+
+def create_constraint(apps, schema_editor):
+    # SQLite (local development) has no exclusion constraints; the booking
+    # view falls back to a check-then-insert there.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_CONSTRAINT)
+
+
+def drop_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_CONSTRAINT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_constraint, drop_constraint),
+    ]
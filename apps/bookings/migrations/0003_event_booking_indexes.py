@@ -0,0 +1,33 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_event_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['space', 'start_datetime', 'end_datetime'], name='booking_space_range_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('status__in', ('pending', 'confirmed'))), fields=['space', 'start_datetime', 'end_datetime'], name='event_active_space_range_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['status', 'start_datetime'], name='event_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['status', 'end_datetime'], name='event_status_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'start_datetime'], name='event_user_start_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.11 on 2026-10-17 07:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spaces', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bookings', '0003_event_booking_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly')], max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days or weeks')),
+                ('weekdays', models.JSONField(blank=True, default=list, help_text='Weekdays of a weekly series (0 = Monday)')),
+                ('until', models.DateField(help_text='Last day an occurrence may fall on')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('space', models.ForeignKey(help_text='Space where the occurrences will be held', on_delete=django.db.models.deletion.CASCADE, related_name='event_series', to='spaces.space')),
+                ('user', models.ForeignKey(help_text='User who created the series', on_delete=django.db.models.deletion.CASCADE, related_name='event_series', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'event series',
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='series',
+            field=models.ForeignKey(blank=True, help_text='Recurring series this event belongs to', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='bookings.eventseries'),
+        ),
+    ]
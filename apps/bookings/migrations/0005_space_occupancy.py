@@ -0,0 +1,31 @@
+# Generated by Django 4.2.11 on 2026-10-17 07:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spaces', '0001_initial'),
+        ('bookings', '0004_event_series'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpaceOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Local calendar day')),
+                ('slots', models.BinaryField(help_text='96 slot bits, little-endian', max_length=12)),
+                ('space', models.ForeignKey(help_text='Space the bitmap describes', on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='spaces.space')),
+            ],
+            options={
+                'verbose_name_plural': 'space occupancy',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='spaceoccupancy',
+            constraint=models.UniqueConstraint(fields=('space', 'day'), name='space_occupancy_space_day_uniq'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.11 on 2026-10-17 07:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spaces', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bookings', '0005_space_occupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_name', models.CharField(max_length=200)),
+                ('start_datetime', models.DateTimeField()),
+                ('end_datetime', models.DateTimeField()),
+                ('organizer_name', models.CharField(max_length=100)),
+                ('organizer_email', models.EmailField(max_length=254)),
+                ('event_type', models.CharField(choices=[('meeting', 'Meeting'), ('conference', 'Conference'), ('webinar', 'Webinar'), ('workshop', 'Workshop')], default='meeting', max_length=50)),
+                ('attendance', models.PositiveIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('promoted', 'Promoted'), ('withdrawn', 'Withdrawn')], default='waiting', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('promoted_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.OneToOneField(blank=True, help_text='Event created when the entry was promoted', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='bookings.event')),
+                ('space', models.ForeignKey(help_text='Space the slot is in', on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='spaces.space')),
+                ('user', models.ForeignKey(help_text='User waiting for the slot', on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'waitlist entries',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(condition=models.Q(('status', 'waiting')), fields=['space', 'start_datetime', 'end_datetime'], name='waitlist_waiting_range_idx')],
+            },
+        ),
+    ]
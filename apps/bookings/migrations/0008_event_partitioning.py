@@ -0,0 +1,154 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# PostgreSQL only. bookings_event becomes
+#
+#   bookings_event                      PARTITION BY LIST (status)
+#     bookings_event_active             pending, confirmed
+#     bookings_event_closed             completed, cancelled, rejected
+#                                       PARTITION BY RANGE (start_datetime)
+#       bookings_event_closed_YYYY_MM   one per month, managed by
+#                                       apps.bookings.partitions
+#       bookings_event_closed_default   anything not yet split out
+#
+# Conflict checks and listings filter on pending/confirmed, so they are
+# pruned to the active partition, which stays small however much history
+# accumulates. The overlap exclusion constraint cannot be declared on a
+# partitioned table, but every row it applies to lives in the active
+# partition, so it is declared there with its old name.
+#
+# Closing an event moves its row to the closed partition. A concurrent
+# writer that was waiting on that row gets a serialization failure instead
+# of matching nothing; transition() retries those.
+#
+# Both directions rebuild the table, so the migration can be reversed
+# (EventPartitionMigrationTestCase runs it down and up again). Detached
+# monthly partitions are not brought back.
+#
+# The primary key has to include the partition keys. Nothing else can
+# reference bookings_event(id) by foreign key any more, which is why the
+# waitlist entry's link is no longer a database constraint.
+
+OVERLAP_CONSTRAINT_SQL = """
+ALTER TABLE bookings_event_active
+    ADD CONSTRAINT bookings_event_no_overlap
+    EXCLUDE USING gist (
+        space_id WITH =,
+        tstzrange(start_datetime, end_datetime, '[)') WITH &&
+    );
+"""
+
+PLAIN_OVERLAP_CONSTRAINT_SQL = """
+ALTER TABLE bookings_event
+    ADD CONSTRAINT bookings_event_no_overlap
+    EXCLUDE USING gist (
+        space_id WITH =,
+        tstzrange(start_datetime, end_datetime, '[)') WITH &&
+    )
+    WHERE (status IN ('pending', 'confirmed'));
+"""
+
+PARTITIONS_SQL = """
+CREATE TABLE bookings_event_active PARTITION OF bookings_event
+    FOR VALUES IN ('pending', 'confirmed');
+CREATE TABLE bookings_event_closed PARTITION OF bookings_event
+    FOR VALUES IN ('completed', 'cancelled', 'rejected')
+    PARTITION BY RANGE (start_datetime);
+CREATE TABLE bookings_event_closed_default PARTITION OF bookings_event_closed DEFAULT;
+"""
+
+
+def table_definition(cursor, table):
+    """The index and foreign key DDL of table, to replay on its replacement"""
+    cursor.execute("""
+        SELECT indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = %s
+            AND indexname NOT IN ('bookings_event_pkey', 'bookings_event_no_overlap')
+    """, [table])
+    # ON ONLY is how partitioned indexes are described; a plain CREATE
+    # INDEX on either kind of table builds what is needed
+    indexes = [row[0].replace(' ON ONLY ', ' ON ') for row in cursor.fetchall()]
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+    """, [table])
+    foreign_keys = [
+        f'ALTER TABLE bookings_event ADD CONSTRAINT {name} {definition}'
+        for name, definition in cursor.fetchall()
+    ]
+    return indexes + foreign_keys
+
+
+def rebuild_events_table(schema_editor, partitioned):
+    """
+    Copy bookings_event into a new table of the other kind. The old table
+    is renamed out of the way and dropped once the rows are across.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        definition = table_definition(cursor, 'bookings_event')
+    old = 'bookings_event_unpartitioned' if partitioned else 'bookings_event_partitioned'
+
+    schema_editor.execute(f'ALTER TABLE bookings_event RENAME TO {old}')
+    schema_editor.execute(
+        f'CREATE TABLE bookings_event (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        + (' PARTITION BY LIST (status)' if partitioned else '')
+    )
+    # The old id sequence goes with the old table
+    schema_editor.execute('ALTER TABLE bookings_event ALTER COLUMN id DROP DEFAULT')
+    schema_editor.execute('ALTER TABLE bookings_event ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+    if partitioned:
+        schema_editor.execute(PARTITIONS_SQL)
+    schema_editor.execute(f'INSERT INTO bookings_event SELECT * FROM {old}')
+    schema_editor.execute("""
+        SELECT setval(
+            pg_get_serial_sequence('bookings_event', 'id'),
+            COALESCE((SELECT MAX(id) FROM bookings_event), 0) + 1,
+            false
+        )
+    """)
+    # Also drops the partitions of a partitioned old table
+    schema_editor.execute(f'DROP TABLE {old}')
+
+    schema_editor.execute(
+        'ALTER TABLE bookings_event ADD CONSTRAINT bookings_event_pkey PRIMARY KEY '
+        + ('(id, status, start_datetime)' if partitioned else '(id)')
+    )
+    for statement in definition:
+        schema_editor.execute(statement)
+    schema_editor.execute(OVERLAP_CONSTRAINT_SQL if partitioned else PLAIN_OVERLAP_CONSTRAINT_SQL)
+
+
+def partition_events(apps, schema_editor):
+    # SQLite (local development) has no table partitioning
+    if schema_editor.connection.vendor == 'postgresql':
+        rebuild_events_table(schema_editor, partitioned=True)
+
+
+def unpartition_events(apps, schema_editor):
+    # Partitions detached by apps.bookings.partitions are left as they are
+    if schema_editor.connection.vendor == 'postgresql':
+        rebuild_events_table(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_event_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='waitlistentry',
+            name='event',
+            field=models.OneToOneField(
+                blank=True,
+                db_constraint=False,
+                help_text='Event created when the entry was promoted',
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name='waitlist_entry',
+                to='bookings.event'
+            ),
+        ),
+        migrations.RunPython(partition_events, unpartition_events),
+    ]
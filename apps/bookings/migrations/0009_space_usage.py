@@ -0,0 +1,32 @@
+# Generated by Django 4.2.11 on 2026-10-17 07:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spaces', '0002_space_version'),
+        ('bookings', '0008_event_partitioning'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpaceUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Local calendar day')),
+                ('booked_seconds', models.PositiveIntegerField(help_text='Time covered by events on the day')),
+                ('revenue', models.DecimalField(decimal_places=2, help_text='Price per hour times the booked time', max_digits=12)),
+                ('space', models.ForeignKey(help_text='Space the figures are for', on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='spaces.space')),
+            ],
+            options={
+                'verbose_name_plural': 'space usage',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='spaceusage',
+            constraint=models.UniqueConstraint(fields=('space', 'day'), name='space_usage_space_day_uniq'),
+        ),
+    ]
@@ -2,9 +2,83 @@ from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from apps.core.versioning import VersionedModel
 from apps.spaces.models import Space
 
-class Event(models.Model):
+# Statuses that hold a space's time slot. Must match the WHERE clause of the
+# exclusion constraint created in migration 0002_event_no_overlap and, on
+# PostgreSQL, the bounds of the bookings_event_active partition (0008).
+ACTIVE_STATUSES = ('pending', 'confirmed')
+# Statuses shown as occupied on the occupancy calendar
+OCCUPYING_STATUSES = ('confirmed', 'completed')
+OVERLAP_CONSTRAINT = 'bookings_event_no_overlap'
+
+
+def is_overlap_violation(exc):
+    """Return True if an IntegrityError was raised by the overlap constraint"""
+    diag = getattr(exc.__cause__, 'diag', None)
+    if diag is not None and getattr(diag, 'constraint_name', None):
+        return diag.constraint_name == OVERLAP_CONSTRAINT
+    return OVERLAP_CONSTRAINT in str(exc)
+
+
+class EventQuerySet(models.QuerySet):
+    def active(self):
+        """Events that hold their space's time slot"""
+        return self.filter(status__in=ACTIVE_STATUSES)
+
+    def overlapping(self, space, start, end):
+        """Active events on the space whose time range intersects [start, end)"""
+        return self.active().filter(
+            space=space,
+            start_datetime__lt=end,
+            end_datetime__gt=start
+        )
+
+
+class EventSeries(models.Model):
+    """
+    A recurring booking. Each occurrence is an ordinary Event row pointing
+    back at its series, so conflict checks and listings need no special case.
+    """
+    FREQUENCY_CHOICES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+    ]
+
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
+    interval = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Repeat every N days or weeks"
+    )
+    weekdays = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Weekdays of a weekly series (0 = Monday)"
+    )
+    until = models.DateField(help_text="Last day an occurrence may fall on")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='event_series',
+        help_text="User who created the series"
+    )
+    space = models.ForeignKey(
+        Space,
+        on_delete=models.CASCADE,
+        related_name='event_series',
+        help_text="Space where the occurrences will be held"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.get_frequency_display()} series in {self.space.name} until {self.until}"
+
+    class Meta:
+        verbose_name_plural = 'event series'
+
+
+class Event(VersionedModel):
     event_name = models.CharField(max_length=200)
     start_datetime = models.DateTimeField()
     end_datetime = models.DateTimeField()
@@ -75,6 +149,56 @@ class Event(models.Model):
         help_text="Space where the event will be held"
     )
 
+    series = models.ForeignKey(
+        EventSeries,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='occurrences',
+        help_text="Recurring series this event belongs to"
+    )
+
+    objects = EventQuerySet.as_manager()
+
+    TIME_FIELDS = ('start_datetime', 'end_datetime')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded values so saves can tell what changed without
+        # fetching the row again
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._remember_values(fields)
+
+    def _remember_values(self, fields=None):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            loaded = self._loaded_values = {}
+        for field in self._meta.concrete_fields:
+            if fields is None or field.name in fields or field.attname in fields:
+                loaded[field.attname] = getattr(self, field.attname)
+
+    def loaded_value(self, attname):
+        """The value attname had when the event was loaded or last saved"""
+        return getattr(self, '_loaded_values', {}).get(attname)
+
+    def changed_fields(self):
+        """
+        Names of the fields changed since the event was loaded or last
+        saved; every field for an unsaved event
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded is None:
+            return {field.name for field in self._meta.concrete_fields}
+        return {
+            field.name for field in self._meta.concrete_fields
+            if field.attname in loaded and getattr(self, field.attname) != loaded[field.attname]
+        }
+
     def clean(self):
         if self.start_datetime and self.end_datetime:
             if self.start_datetime >= self.end_datetime:
@@ -83,14 +207,163 @@ class Event(models.Model):
                 raise ValidationError('Start datetime cannot be in the past')
 
     def save(self, *args, **kwargs):
-        self.clean()
+        # Only new events and changed times need validating, so a status
+        # change on an event that has already started is allowed
+        update_fields = kwargs.get('update_fields')
+        changed = self.changed_fields()
+        if update_fields is not None:
+            changed &= set(update_fields)
+        if not changed.isdisjoint(self.TIME_FIELDS):
+            self.clean()
         super().save(*args, **kwargs)
+        # version is bumped by every save, whatever update_fields says
+        self._remember_values(None if update_fields is None else [*update_fields, 'version'])
 
     def __str__(self):
         return f"{self.event_name} - {self.space.name}"
 
     class Meta:
         ordering = ['start_datetime']
+        indexes = [
+            # Conflict checks: Event.objects.overlapping()
+            models.Index(
+                fields=['space', 'start_datetime', 'end_datetime'],
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                name='event_active_space_range_idx'
+            ),
+            # ListUpcomingEventsView
+            models.Index(fields=['status', 'start_datetime'], name='event_status_start_idx'),
+            # update_space_status / CheckEventStatusView
+            models.Index(fields=['status', 'end_datetime'], name='event_status_end_idx'),
+            # ListMyEventsView
+            models.Index(fields=['user', 'start_datetime'], name='event_user_start_idx'),
+        ]
+
+class WaitlistEntry(models.Model):
+    """
+    A request for a time slot that was taken when it was made. When an event
+    in the space is cancelled, the earliest entries that now fit are turned
+    into pending events (apps.bookings.waitlist).
+    """
+    STATUS_CHOICES = [
+        ('waiting', 'Waiting'),
+        ('promoted', 'Promoted'),
+        ('withdrawn', 'Withdrawn'),
+    ]
+
+    event_name = models.CharField(max_length=200)
+    start_datetime = models.DateTimeField()
+    end_datetime = models.DateTimeField()
+    organizer_name = models.CharField(max_length=100)
+    organizer_email = models.EmailField()
+    event_type = models.CharField(
+        max_length=50,
+        choices=[
+            ('meeting', 'Meeting'),
+            ('conference', 'Conference'),
+            ('webinar', 'Webinar'),
+            ('workshop', 'Workshop'),
+        ],
+        default='meeting'
+    )
+    attendance = models.PositiveIntegerField(null=True, blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries',
+        help_text="User waiting for the slot"
+    )
+    space = models.ForeignKey(
+        Space,
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries',
+        help_text="Space the slot is in"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
+    event = models.OneToOneField(
+        'Event',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        # Partitioned events have no unique id for a foreign key to reference
+        db_constraint=False,
+        related_name='waitlist_entry',
+        help_text="Event created when the entry was promoted"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    promoted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.event_name} waiting for {self.space_id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name_plural = 'waitlist entries'
+        ordering = ['created_at', 'id']
+        indexes = [
+            # Promotion: waiting entries of a space touching a freed range
+            models.Index(
+                fields=['space', 'start_datetime', 'end_datetime'],
+                condition=models.Q(status='waiting'),
+                name='waitlist_waiting_range_idx'
+            ),
+        ]
+
+
+class SpaceOccupancy(models.Model):
+    """
+    Which 15-minute slots of one local day a space has confirmed or completed
+    events in, as a bitmap: slot i (0 = 00:00-00:15) is bit i % 8 of byte
+    i // 8. Maintained by apps.bookings.occupancy; days without events have
+    no row.
+    """
+    space = models.ForeignKey(
+        Space,
+        on_delete=models.CASCADE,
+        related_name='occupancy',
+        help_text="Space the bitmap describes"
+    )
+    day = models.DateField(help_text="Local calendar day")
+    slots = models.BinaryField(max_length=12, help_text="96 slot bits, little-endian")
+
+    def __str__(self):
+        return f"{self.space_id} on {self.day}"
+
+    class Meta:
+        verbose_name_plural = 'space occupancy'
+        constraints = [
+            models.UniqueConstraint(fields=['space', 'day'], name='space_occupancy_space_day_uniq'),
+        ]
+
+class SpaceUsage(models.Model):
+    """
+    Booked time and revenue of one space on one local day, from its
+    confirmed and completed events. Maintained alongside SpaceOccupancy by
+    apps.bookings.occupancy and reconciled nightly; days without events
+    have no row. Rows outlive the events they were computed from, so
+    reports still cover days whose events were archived.
+    """
+    space = models.ForeignKey(
+        Space,
+        on_delete=models.CASCADE,
+        related_name='usage',
+        help_text="Space the figures are for"
+    )
+    day = models.DateField(help_text="Local calendar day")
+    booked_seconds = models.PositiveIntegerField(help_text="Time covered by events on the day")
+    revenue = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        help_text="Price per hour times the booked time"
+    )
+
+    def __str__(self):
+        return f"{self.space_id} on {self.day}"
+
+    class Meta:
+        verbose_name_plural = 'space usage'
+        constraints = [
+            models.UniqueConstraint(fields=['space', 'day'], name='space_usage_space_day_uniq'),
+        ]
 
 class Booking(models.Model):
     STATUS_CHOICES = [
@@ -128,6 +401,13 @@ class Booking(models.Model):
         
     class Meta:
         ordering = ['-start_datetime']
+        indexes = [
+            # BookingSerializer conflict check
+            models.Index(
+                fields=['space', 'start_datetime', 'end_datetime'],
+                name='booking_space_range_idx'
+            ),
+        ]
         # Ensure no double bookings for the same space
         constraints = [
             models.CheckConstraint(
@@ -0,0 +1,187 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.spaces.models import Space
+from .models import OCCUPYING_STATUSES, Event, SpaceOccupancy, SpaceUsage
+
+SLOT = timedelta(minutes=15)
+SLOTS_PER_DAY = timedelta(days=1) // SLOT
+BITMAP_BYTES = SLOTS_PER_DAY // 8
+EMPTY_DAY = 0
+SECONDS_PER_HOUR = 3600
+CENT = Decimal('0.01')
+
+
+def to_bytes(bits):
+    return bits.to_bytes(BITMAP_BYTES, 'little')
+
+
+def from_bytes(value):
+    # PostgreSQL returns BinaryField values as memoryview
+    return int.from_bytes(bytes(value), 'little')
+
+
+def slot_mask(first_slot, last_slot):
+    """Bits first_slot..last_slot - 1 set"""
+    return ((1 << (last_slot - first_slot)) - 1) << first_slot
+
+
+def day_bounds(day):
+    """Aware [start, end) of a local calendar day"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def event_masks(start, end):
+    """
+    {local day: bitmap} of the slots [start, end) touches, by wall-clock
+    time. A slot that is only partly taken counts as taken.
+    """
+    local_start = timezone.localtime(start).replace(tzinfo=None)
+    local_end = timezone.localtime(end).replace(tzinfo=None)
+    masks = {}
+    day = local_start.date()
+    while day <= local_end.date():
+        midnight = datetime.combine(day, time.min)
+        first_slot = max((local_start - midnight) // SLOT, 0)
+        last_slot = min(-(-(local_end - midnight) // SLOT), SLOTS_PER_DAY)
+        if last_slot > first_slot:
+            masks[day] = slot_mask(first_slot, last_slot)
+        day += timedelta(days=1)
+    return masks
+
+
+def event_days(space_id, start, end):
+    """(space_id, day) keys of the bitmaps an event touches"""
+    return {(space_id, day) for day in event_masks(start, end)}
+
+
+def refresh_occupancy(keys, usage=True):
+    """
+    Rebuild the bitmaps of the given (space_id, day) pairs from their
+    confirmed/completed events, inside the transaction that changed them,
+    and with usage=True their SpaceUsage rollups from the same rows.
+
+    Rebuilding, rather than clearing an event's own bits, keeps slots that
+    another event on the same day shares. The spaces are locked first, so a
+    concurrent change to the same space waits and then sees this one.
+    """
+    days_by_space = defaultdict(set)
+    for space_id, day in keys:
+        days_by_space[space_id].add(day)
+    if not days_by_space:
+        return
+
+    with transaction.atomic():
+        prices = dict(Space.objects.filter(
+            id__in=days_by_space
+        ).select_for_update().order_by('id').values_list('id', 'price_per_hour'))
+
+        # One query over each space's span of affected days
+        spans = []
+        for space_id, days in days_by_space.items():
+            span_start, _ = day_bounds(min(days))
+            _, span_end = day_bounds(max(days))
+            spans.append(Q(space_id=space_id, start_datetime__lt=span_end, end_datetime__gt=span_start))
+        events = list(Event.objects.filter(
+            reduce(or_, spans), status__in=OCCUPYING_STATUSES
+        ).values_list('space_id', 'start_datetime', 'end_datetime'))
+        days_filter = reduce(or_, (
+            Q(space_id=space_id, day__in=days) for space_id, days in days_by_space.items()
+        ))
+
+        bitmaps = {(space_id, day): EMPTY_DAY for space_id, days in days_by_space.items() for day in days}
+        for space_id, start, end in events:
+            for day, mask in event_masks(start, end).items():
+                if (space_id, day) in bitmaps:
+                    bitmaps[(space_id, day)] |= mask
+
+        existing = {(row.space_id, row.day): row for row in SpaceOccupancy.objects.filter(days_filter)}
+        to_create, to_update, to_delete = [], [], []
+        for key, bits in bitmaps.items():
+            row = existing.get(key)
+            if row is None:
+                if bits:
+                    to_create.append(SpaceOccupancy(space_id=key[0], day=key[1], slots=to_bytes(bits)))
+            elif not bits:
+                to_delete.append(row.id)
+            elif from_bytes(row.slots) != bits:
+                row.slots = to_bytes(bits)
+                to_update.append(row)
+
+        SpaceOccupancy.objects.bulk_create(to_create)
+        SpaceOccupancy.objects.bulk_update(to_update, ['slots'])
+        SpaceOccupancy.objects.filter(id__in=to_delete).delete()
+
+        if usage:
+            refresh_usage(bitmaps.keys(), events, prices, days_filter)
+
+
+def event_pieces(start, end):
+    """{local day: (start, end)} of [start, end) split at local midnights"""
+    pieces = {}
+    day, last_day = timezone.localtime(start).date(), timezone.localtime(end).date()
+    while day <= last_day:
+        day_start, day_end = day_bounds(day)
+        piece_start, piece_end = max(start, day_start), min(end, day_end)
+        if piece_end > piece_start:
+            pieces[day] = (piece_start, piece_end)
+        day += timedelta(days=1)
+    return pieces
+
+
+def refresh_usage(keys, events, prices, days_filter):
+    """
+    Rewrite the SpaceUsage rows of keys from the confirmed/completed
+    events overlapping them. Revenue is charged at the space's current
+    price per hour.
+    """
+    booked = {key: 0 for key in keys}
+    revenue = {key: Decimal(0) for key in keys}
+    for space_id, start, end in events:
+        for day, (piece_start, piece_end) in event_pieces(start, end).items():
+            key = (space_id, day)
+            if key in booked:
+                seconds = int((piece_end - piece_start).total_seconds())
+                booked[key] += seconds
+                revenue[key] += prices[space_id] * seconds / SECONDS_PER_HOUR
+
+    existing = {(row.space_id, row.day): row for row in SpaceUsage.objects.filter(days_filter)}
+    to_create, to_update, to_delete = [], [], []
+    for key, seconds in booked.items():
+        amount = revenue[key].quantize(CENT, ROUND_HALF_UP)
+        row = existing.get(key)
+        if row is None:
+            if seconds:
+                to_create.append(SpaceUsage(space_id=key[0], day=key[1], booked_seconds=seconds, revenue=amount))
+        elif not seconds:
+            to_delete.append(row.id)
+        elif (row.booked_seconds, row.revenue) != (seconds, amount):
+            row.booked_seconds, row.revenue = seconds, amount
+            to_update.append(row)
+
+    SpaceUsage.objects.bulk_create(to_create)
+    SpaceUsage.objects.bulk_update(to_update, ['booked_seconds', 'revenue'])
+    SpaceUsage.objects.filter(id__in=to_delete).delete()
+
+
+def occupancy_grid(space_ids, first_day, days):
+    """
+    {space_id: [bitmap per day]} as ints for days first_day..first_day +
+    days - 1, read with one query. Empty days are 0.
+    """
+    day_index = {first_day + timedelta(days=offset): offset for offset in range(days)}
+    grid = {space_id: [EMPTY_DAY] * days for space_id in space_ids}
+    rows = SpaceOccupancy.objects.filter(
+        space_id__in=space_ids, day__range=(first_day, first_day + timedelta(days=days - 1))
+    ).values_list('space_id', 'day', 'slots')
+    for space_id, day, slots in rows:
+        grid[space_id][day_index[day]] = from_bytes(slots)
+    return grid
@@ -0,0 +1,88 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class StartTimeCursorPagination(BasePagination):
+    """
+    Keyset pagination over (start_datetime, id).
+
+    Each page is a single indexed range scan that starts where the previous
+    page ended, so deep pages cost the same as the first one. The cursor is
+    an opaque token encoding the last row's start_datetime and id.
+    """
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        if position is not None:
+            start_datetime, pk = position
+            queryset = queryset.filter(
+                Q(start_datetime__gt=start_datetime) |
+                Q(start_datetime=start_datetime, id__gt=pk)
+            )
+
+        # One extra row tells us whether there is a next page
+        rows = list(queryset.order_by('start_datetime', 'id')[:page_size + 1])
+        page = rows[:page_size]
+        self.next_position = None
+        if len(rows) > page_size:
+            self.next_position = (page[-1].start_datetime, page[-1].id)
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            decoded = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            start_datetime, pk = decoded.rsplit('|', 1)
+            return datetime.fromisoformat(start_datetime), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        start_datetime, pk = position
+        raw = f'{start_datetime.isoformat()}|{pk}'
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+
+class OccupancyCalendarPagination(PageNumberPagination):
+    """Spaces per page of the occupancy calendar"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class SpaceUsageReportPagination(PageNumberPagination):
+    """Spaces per page of the usage report"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,133 @@
+import logging
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Sub-partitioned by start_datetime month; see migration 0008_event_partitioning
+CLOSED_PARTITION = 'bookings_event_closed'
+DEFAULT_PARTITION = 'bookings_event_closed_default'
+MONTH_PARTITION = re.compile(rf'^{CLOSED_PARTITION}_(\d{{4}})_(\d{{2}})$')
+
+
+def month_start(value):
+    """The first instant of value's month, in UTC"""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    years, index = divmod(month.month - 1 + count, 12)
+    return month.replace(year=month.year + years, month=index + 1)
+
+
+def partition_name(month):
+    return f'{CLOSED_PARTITION}_{month:%Y_%m}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT EXISTS (
+                SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid
+                WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+            )
+        """, [CLOSED_PARTITION])
+        return cursor.fetchone()[0]
+
+
+def month_partitions():
+    """{month: table name} of the monthly partitions currently attached"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT child.relname FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)
+        """, [CLOSED_PARTITION])
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = MONTH_PARTITION.match(name)
+        if match:
+            partitions[datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)] = name
+    return partitions
+
+
+def default_partition_months():
+    """Months that have rows waiting in the default partition"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', start_datetime AT TIME ZONE 'UTC') FROM {DEFAULT_PARTITION}"
+        )
+        return {row[0].replace(tzinfo=dt_timezone.utc) for row in cursor.fetchall()}
+
+
+def create_month_partition(month):
+    """
+    Attach the partition for month, moving its rows out of the default
+    partition first; PostgreSQL refuses to attach a range the default
+    partition still has rows for.
+    """
+    name, end = partition_name(month), add_months(month, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE {name} (LIKE {CLOSED_PARTITION} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE start_datetime >= %s AND start_datetime < %s
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, [month, end])
+        cursor.execute(
+            f'ALTER TABLE {CLOSED_PARTITION} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)',
+            [month, end]
+        )
+    return name
+
+
+def ensure_partitions(months_ahead=None):
+    """
+    Create the monthly partitions from the current month to months_ahead
+    months from now, plus any month whose rows are still in the default
+    partition. Returns the names of the partitions created.
+    """
+    if months_ahead is None:
+        months_ahead = getattr(settings, 'EVENT_PARTITION_MONTHS_AHEAD', 3)
+    current = month_start(timezone.now())
+    wanted = {add_months(current, offset) for offset in range(months_ahead + 1)}
+    wanted |= default_partition_months()
+    missing = sorted(wanted - set(month_partitions()))
+    return [create_month_partition(month) for month in missing]
+
+
+def detach_old_partitions(after_months=None):
+    """
+    Detach the monthly partitions that ended more than after_months ago
+    (EVENT_PARTITION_DETACH_MONTHS; never if unset). Their tables are kept,
+    so the rows leave every Event query but can still be dumped or
+    archived. Returns the names of the partitions detached.
+    """
+    if after_months is None:
+        after_months = getattr(settings, 'EVENT_PARTITION_DETACH_MONTHS', None)
+    if after_months is None:
+        return []
+    cutoff = add_months(month_start(timezone.now()), -after_months)
+    detached = []
+    for month, name in sorted(month_partitions().items()):
+        if add_months(month, 1) > cutoff:
+            break
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {CLOSED_PARTITION} DETACH PARTITION {name}')
+        logger.info('Detached event partition %s', name)
+        detached.append(name)
+    return detached
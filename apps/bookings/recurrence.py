@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+# Roughly a year of weekdays; keeps a single request's insert bounded
+MAX_OCCURRENCES = 260
+
+
+def occurrence_days(first_day, frequency, until, interval=1, weekdays=None):
+    """
+    Calendar days of a daily or weekly series, in order. A weekly series
+    without weekdays repeats on the weekday of its first day.
+    """
+    if frequency == 'daily':
+        step = timedelta(days=interval)
+        count = (until - first_day).days // interval + 1
+        return [first_day + step * k for k in range(max(count, 0))]
+
+    weekdays = sorted(set(weekdays or [first_day.weekday()]))
+    week_start = first_day - timedelta(days=first_day.weekday())
+    step = timedelta(weeks=interval)
+    days = []
+    while week_start <= until:
+        days.extend(
+            day for day in (week_start + timedelta(days=weekday) for weekday in weekdays)
+            if first_day <= day <= until
+        )
+        week_start += step
+    return days
+
+
+def expand_occurrences(start, end, frequency, until, interval=1, weekdays=None):
+    """
+    (start, end) pairs for every occurrence of a series whose first
+    occurrence is [start, end). Occurrences keep the local wall-clock time
+    of the first one, so they do not drift across DST changes.
+    """
+    local_start = timezone.localtime(start)
+    wall_time = local_start.time().replace(tzinfo=None)
+    duration = end - start
+    days = occurrence_days(local_start.date(), frequency, until, interval, weekdays)
+    occurrences = []
+    for day in days:
+        occurrence_start = timezone.make_aware(datetime.combine(day, wall_time))
+        occurrences.append((occurrence_start, occurrence_start + duration))
+    return occurrences
@@ -1,5 +1,9 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Event
+from .models import Event, EventSeries, WaitlistEntry
+from .recurrence import MAX_OCCURRENCES, expand_occurrences
 from apps.spaces.models import Space
 from apps.spaces.serializers import SpaceSerializer
 
@@ -11,9 +15,9 @@ class EventSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'event_name', 'start_datetime', 'end_datetime',
             'organizer_name', 'organizer_email', 'event_type', 
-            'attendance', 'status', 'space', 'space_name'
+            'attendance', 'status', 'space', 'space_name', 'version'
         ]
-        read_only_fields = ['id', 'status', 'space_name']
+        read_only_fields = ['id', 'status', 'space_name', 'version']
 
     def validate(self, data):
         """
@@ -31,6 +35,147 @@ class EventSerializer(serializers.ModelSerializer):
 
         return data
 
+class PrefetchedSpaceField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolve the space from a {pk: Space} map in the serializer context, so
+    validating a batch costs one query for all spaces instead of one each
+    """
+    def to_internal_value(self, data):
+        spaces = self.context.get('spaces')
+        if spaces is None:
+            return super().to_internal_value(data)
+        try:
+            return spaces[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+class BatchEventItemSerializer(EventSerializer):
+    space = PrefetchedSpaceField(queryset=Space.objects.all())
+
+    class Meta(EventSerializer.Meta):
+        pass
+
+class EventSeriesSerializer(serializers.ModelSerializer):
+    """
+    A recurring booking. The event fields describe the first occurrence;
+    the recurrence fields say how it repeats.
+    """
+    event_name = serializers.CharField(max_length=200, write_only=True)
+    start_datetime = serializers.DateTimeField(write_only=True)
+    end_datetime = serializers.DateTimeField(write_only=True)
+    organizer_name = serializers.CharField(max_length=100, write_only=True)
+    organizer_email = serializers.EmailField(write_only=True)
+    event_type = serializers.ChoiceField(
+        choices=Event._meta.get_field('event_type').choices,
+        default='meeting',
+        write_only=True
+    )
+    attendance = serializers.IntegerField(min_value=0, required=False, allow_null=True, write_only=True)
+    skip_conflicts = serializers.BooleanField(default=False, write_only=True)
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6),
+        required=False,
+        allow_empty=True
+    )
+    interval = serializers.IntegerField(min_value=1, max_value=52, default=1)
+
+    class Meta:
+        model = EventSeries
+        fields = [
+            'id', 'frequency', 'interval', 'weekdays', 'until', 'space',
+            'event_name', 'start_datetime', 'end_datetime', 'organizer_name',
+            'organizer_email', 'event_type', 'attendance', 'skip_conflicts'
+        ]
+        read_only_fields = ['id']
+
+    def validate(self, data):
+        """
+        Validate the first occurrence and expand the series
+        """
+        start_datetime = data['start_datetime']
+        end_datetime = data['end_datetime']
+        if start_datetime >= end_datetime:
+            raise serializers.ValidationError("End datetime must be after start datetime")
+        if start_datetime < timezone.now():
+            raise serializers.ValidationError("Start datetime cannot be in the past")
+        if data.get('weekdays') and data['frequency'] != 'weekly':
+            raise serializers.ValidationError({'weekdays': 'Only weekly series take weekdays'})
+
+        first_day = timezone.localtime(start_datetime).date()
+        if data['until'] < first_day:
+            raise serializers.ValidationError({'until': 'Must not be before the first occurrence'})
+        if data['until'] > first_day + timedelta(days=366):
+            raise serializers.ValidationError({'until': 'A series may span at most one year'})
+
+        occurrences = expand_occurrences(
+            start_datetime, end_datetime, data['frequency'], data['until'],
+            data['interval'], data.get('weekdays')
+        )
+        if len(occurrences) > MAX_OCCURRENCES:
+            raise serializers.ValidationError(
+                f"A series may have at most {MAX_OCCURRENCES} occurrences"
+            )
+        for previous, current in zip(occurrences, occurrences[1:]):
+            if current[0] < previous[1]:
+                raise serializers.ValidationError(
+                    "Occurrences of the series overlap each other"
+                )
+        data['occurrences'] = occurrences
+        return data
+
+class EventSeriesUpdateSerializer(serializers.Serializer):
+    """Fields that can be changed on every remaining occurrence at once"""
+    event_name = serializers.CharField(max_length=200, required=False)
+    organizer_name = serializers.CharField(max_length=100, required=False)
+    organizer_email = serializers.EmailField(required=False)
+    event_type = serializers.ChoiceField(
+        choices=Event._meta.get_field('event_type').choices,
+        required=False
+    )
+    attendance = serializers.IntegerField(min_value=0, required=False, allow_null=True)
+
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError("Nothing to update")
+        return data
+
+class EventUpdateSerializer(EventSeriesUpdateSerializer):
+    """Fields the organizer can change on a single event"""
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    space_name = serializers.CharField(source='space.name', read_only=True)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = [
+            'id', 'event_name', 'start_datetime', 'end_datetime',
+            'organizer_name', 'organizer_email', 'event_type',
+            'attendance', 'space', 'space_name', 'status', 'event',
+            'created_at', 'promoted_at'
+        ]
+        read_only_fields = ['id', 'space_name', 'status', 'event', 'created_at', 'promoted_at']
+
+    def validate(self, data):
+        if data['start_datetime'] >= data['end_datetime']:
+            raise serializers.ValidationError("End datetime must be after start datetime")
+        if data['start_datetime'] < timezone.now():
+            raise serializers.ValidationError("Start datetime cannot be in the past")
+        return data
+
+class BookingHoldSerializer(serializers.Serializer):
+    space = serializers.PrimaryKeyRelatedField(queryset=Space.objects.all())
+    start_datetime = serializers.DateTimeField()
+    end_datetime = serializers.DateTimeField()
+
+    def validate(self, data):
+        if data['start_datetime'] >= data['end_datetime']:
+            raise serializers.ValidationError("End datetime must be after start datetime")
+        if data['start_datetime'] < timezone.now():
+            raise serializers.ValidationError("Start datetime cannot be in the past")
+        return data
+
 class EventListSerializer(serializers.ModelSerializer):
     space_name = serializers.CharField(source='space.name', read_only=True)
     
@@ -0,0 +1,103 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .availability import invalidate_availability_on_commit
+from .models import ACTIVE_STATUSES, OCCUPYING_STATUSES, Event
+from .occupancy import event_days, refresh_occupancy
+from .tasks import revoke_event_transitions, schedule_transitions, sync_space_status
+from .transitions import status_changed
+from .waitlist import promote_waitlist
+
+# Fields that decide which slots an event occupies
+OCCUPANCY_FIELDS = {'status', 'space', 'start_datetime', 'end_datetime'}
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_space_availability(sender, instance, **kwargs):
+    spaces = {instance.space_id}
+    # An event moved to another space must also drop the one it left
+    if instance.loaded_value('space_id'):
+        spaces.add(instance.loaded_value('space_id'))
+    invalidate_availability_on_commit(spaces)
+
+
+@receiver(post_save, sender=Event)
+def refresh_event_occupancy(sender, instance, created=False, **kwargs):
+    """Redraw the occupancy bitmaps of the days a saved event left or took"""
+    # Still the values from before this save; _remember_values runs after it
+    changed = instance.changed_fields() & OCCUPANCY_FIELDS
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None:
+        changed &= set(update_fields)
+    if not changed:
+        return
+    if changed == {'status'} and not created and (
+        (instance.status in OCCUPYING_STATUSES) == (instance.loaded_value('status') in OCCUPYING_STATUSES)
+    ):
+        return
+    keys = set()
+    if instance.status in OCCUPYING_STATUSES:
+        keys |= event_days(instance.space_id, instance.start_datetime, instance.end_datetime)
+    if not created and instance.loaded_value('status') in OCCUPYING_STATUSES \
+            and instance.loaded_value('start_datetime') is not None:
+        keys |= event_days(
+            instance.loaded_value('space_id'),
+            instance.loaded_value('start_datetime'),
+            instance.loaded_value('end_datetime')
+        )
+    if keys:
+        refresh_occupancy(keys)
+
+
+@receiver(post_delete, sender=Event)
+def clear_event_occupancy(sender, instance, **kwargs):
+    if instance.status in OCCUPYING_STATUSES:
+        refresh_occupancy(event_days(instance.space_id, instance.start_datetime, instance.end_datetime))
+
+
+@receiver(status_changed, sender=Event)
+def apply_status_side_effects(sender, events, to_status, **kwargs):
+    """
+    Side effects of a batch of status changes. Runs once per transition()
+    call, so the cost does not grow with one query per event.
+    """
+    # Only a change between holding and not holding a slot alters availability
+    changed_spaces = {
+        event.space_id for event in events
+        if (event.status in ACTIVE_STATUSES) != (to_status in ACTIVE_STATUSES)
+    }
+    if changed_spaces:
+        invalidate_availability_on_commit(changed_spaces)
+
+    # Slots given up by cancelled or rejected events go to the waitlist
+    if to_status not in ACTIVE_STATUSES:
+        promote_waitlist([event for event in events if event.status in ACTIVE_STATUSES])
+
+    occupancy_changed = [
+        event for event in events
+        if (event.status in OCCUPYING_STATUSES) != (to_status in OCCUPYING_STATUSES)
+    ]
+    if occupancy_changed:
+        refresh_occupancy(set().union(*(
+            event_days(event.space_id, event.start_datetime, event.end_datetime)
+            for event in occupancy_changed
+        )))
+
+    if to_status == 'confirmed':
+        transaction.on_commit(partial(schedule_transitions, events))
+
+    was_confirmed = [event for event in events if event.status == 'confirmed']
+    if was_confirmed:
+        if to_status != 'completed':
+            for event in was_confirmed:
+                transaction.on_commit(partial(
+                    revoke_event_transitions, event.id, event.start_datetime, event.end_datetime
+                ))
+        # Free the space if the event was in progress
+        transaction.on_commit(partial(
+            sync_space_status, {event.space_id for event in was_confirmed}
+        ))
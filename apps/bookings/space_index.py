@@ -0,0 +1,261 @@
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.db import connection
+
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'bookings:interval-index'
+RECONNECT_DELAY = 1
+LOAD_CHUNK_SIZE = 1000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(value):
+    return (value - EPOCH) // MICROSECOND
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+class SpaceIntervals:
+    """
+    The active events of one space as parallel arrays of epoch microseconds,
+    sorted by start. max_ends[i] is the latest end among the first i + 1
+    events, which lets lookups bisect even if intervals overlap (possible on
+    databases without the exclusion constraint). The event ids may be any
+    integer handle; conflicts.IntervalIndex stores positions in a list.
+    """
+    __slots__ = ('starts', 'ends', 'max_ends', 'event_ids')
+
+    def __init__(self, rows=()):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.max_ends = array('q')
+        self.event_ids = array('q')
+        latest_end = None
+        for start, end, event_id in rows:
+            latest_end = end if latest_end is None else max(latest_end, end)
+            self.starts.append(start)
+            self.ends.append(end)
+            self.max_ends.append(latest_end)
+            self.event_ids.append(event_id)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, end, event_id):
+        """Insert an interval, keeping the arrays sorted by start"""
+        position = bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self.event_ids.insert(position, event_id)
+        latest_end = end if position == 0 else max(self.max_ends[position - 1], end)
+        self.max_ends.insert(position, latest_end)
+        # The running maximum only changes up to the first later end beyond ours
+        for index in range(position + 1, len(self.max_ends)):
+            if self.max_ends[index] >= end:
+                break
+            self.max_ends[index] = end
+
+    def find_overlap(self, start, end):
+        """Id of an event overlapping [start, end), or None, in O(log n)"""
+        # Only events starting before our end can overlap. The first event
+        # whose running max end passes our start is the one that raised it,
+        # so its own end does.
+        position = bisect_left(self.starts, end)
+        first = bisect_right(self.max_ends, start)
+        return self.event_ids[first] if first < position else None
+
+    def between(self, start, end):
+        """(start, end) pairs of the events touching [start, end), by start"""
+        first = bisect_right(self.max_ends, start)
+        last = bisect_left(self.starts, end)
+        return [
+            (self.starts[index], self.ends[index])
+            for index in range(first, last)
+            if self.ends[index] > start
+        ]
+
+
+class SpaceIntervalCache:
+    """
+    Per-process LRU of SpaceIntervals, so availability and booking
+    pre-checks can answer overlap questions without SQL.
+
+    Event changes drop the affected spaces here at once and, after commit,
+    in every other process via a Redis pub/sub channel. Without that
+    channel (INTERVAL_INDEX_REDIS_URL unset), while it is not connected
+    (worker start-up, Redis outages) and inside a transaction, the index is
+    not live: nothing is cached, so neither a missed message nor an
+    uncommitted read can leave a space stale, and lookups are answered by
+    indexed range queries instead of loading whole spaces. The database's
+    exclusion constraint remains the final authority on conflicts.
+    """
+
+    def __init__(self):
+        self._spaces = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a load that raced one is not cached
+        self._generation = 0
+        self._listener = None
+        self._subscribed = threading.Event()
+        self._publisher = None
+
+    def get_many(self, space_ids):
+        """{space_id: SpaceIntervals}, loading every missing space in one query"""
+        found, missing = {}, []
+        with self._lock:
+            for space_id in space_ids:
+                intervals = self._spaces.get(space_id)
+                if intervals is None:
+                    missing.append(space_id)
+                else:
+                    self._spaces.move_to_end(space_id)
+                    found[space_id] = intervals
+        if not missing:
+            return found
+
+        generation = self._generation
+        loaded = self._load(missing)
+        found.update(loaded)
+        if self.is_live():
+            with self._lock:
+                if generation == self._generation:
+                    self._spaces.update(loaded)
+                    max_spaces = getattr(settings, 'INTERVAL_INDEX_MAX_SPACES', 10000)
+                    while len(self._spaces) > max_spaces:
+                        self._spaces.popitem(last=False)
+        return found
+
+    def get(self, space_id):
+        return self.get_many([space_id])[space_id]
+
+    def _load(self, space_ids):
+        rows = defaultdict(list)
+        for offset in range(0, len(space_ids), LOAD_CHUNK_SIZE):
+            events = Event.objects.active().filter(
+                space_id__in=space_ids[offset:offset + LOAD_CHUNK_SIZE]
+            ).order_by('space_id', 'start_datetime').values_list(
+                'space_id', 'start_datetime', 'end_datetime', 'id'
+            )
+            for space_id, start, end, event_id in events:
+                rows[space_id].append((to_micros(start), to_micros(end), event_id))
+        return {space_id: SpaceIntervals(rows[space_id]) for space_id in space_ids}
+
+    def is_live(self):
+        """
+        Whether lookups are answered from, and loads kept in, this index.
+        Rows read inside a transaction may be rolled back, so they are not.
+        """
+        return not connection.in_atomic_block and self._can_cache()
+
+    def find_overlap(self, space_id, start, end):
+        """Id of an active event on the space overlapping [start, end), or None"""
+        if not self.is_live():
+            return Event.objects.overlapping(space_id, start, end).values_list('id', flat=True).first()
+        return self.get(space_id).find_overlap(to_micros(start), to_micros(end))
+
+    def between(self, space_id, start, end):
+        """Sorted (start, end) datetimes of the space's active events touching the window"""
+        if not self.is_live():
+            return list(Event.objects.overlapping(space_id, start, end).order_by(
+                'start_datetime'
+            ).values_list('start_datetime', 'end_datetime'))
+        return [
+            (from_micros(event_start), from_micros(event_end))
+            for event_start, event_end in self.get(space_id).between(to_micros(start), to_micros(end))
+        ]
+
+    def discard(self, space_ids):
+        """Forget the given spaces in this process only"""
+        with self._lock:
+            self._generation += 1
+            for space_id in space_ids:
+                self._spaces.pop(space_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._spaces.clear()
+
+    def invalidate(self, space_ids):
+        """Forget the given spaces in this process and tell every other one"""
+        space_ids = sorted(set(space_ids))
+        if not space_ids:
+            return
+        self.discard(space_ids)
+        url = getattr(settings, 'INTERVAL_INDEX_REDIS_URL', None)
+        if not url:
+            return
+        try:
+            if self._publisher is None:
+                self._publisher = redis.Redis.from_url(url)
+            self._publisher.publish(CHANNEL, json.dumps(space_ids))
+        except redis.RedisError:
+            # Subscribers that lost Redis too clear everything on reconnect
+            logger.warning('Could not publish interval index invalidation', exc_info=True)
+
+    def _can_cache(self):
+        url = getattr(settings, 'INTERVAL_INDEX_REDIS_URL', None)
+        if not url:
+            # Changes made by other processes (Celery tasks) would never reach us
+            return False
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(
+                        target=self._listen, args=(url,),
+                        name='interval-index-listener', daemon=True
+                    )
+                    self._listener.start()
+        return self._subscribed.is_set()
+
+    def _listen(self, url):
+        while True:
+            try:
+                pubsub = redis.Redis.from_url(url).pubsub()
+                pubsub.subscribe(CHANNEL)
+                for message in pubsub.listen():
+                    if message['type'] == 'subscribe':
+                        # Anything may have changed while we were not listening
+                        self.clear()
+                        self._subscribed.set()
+                    elif message['type'] == 'message':
+                        self.discard(json.loads(message['data']))
+            except (redis.RedisError, ValueError):
+                logger.warning('Interval index listener disconnected', exc_info=True)
+            finally:
+                self._subscribed.clear()
+                self.clear()
+            time.sleep(RECONNECT_DELAY)
+
+    def reset(self):
+        """Start from scratch, e.g. in a forked child that has no listener thread"""
+        self._lock = threading.Lock()
+        self._spaces = OrderedDict()
+        self._generation += 1
+        self._listener = None
+        self._subscribed = threading.Event()
+        self._publisher = None
+
+
+space_intervals = SpaceIntervalCache()
+
+# A forked child (gunicorn/celery prefork) inherits the cache but not the thread
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=space_intervals.reset)
@@ -1,45 +1,299 @@
-from celery import shared_task
+import logging
+import time
+from datetime import timedelta
+from functools import partial, reduce
+from operator import or_
+
+from celery import current_app, shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Q
 from django.utils import timezone
-from .models import Event
+from .models import OCCUPYING_STATUSES, Event, SpaceOccupancy, SpaceUsage
+from . import archive, partitions
+from .occupancy import day_bounds, event_days, refresh_occupancy
+from .transitions import transition
+from apps.spaces.cache import bump_catalogue_version
+from apps.notifications.views import send_booking_approved_notification, send_booking_rejected_notification
 from apps.spaces.models import Space
 
+logger = logging.getLogger(__name__)
+
+# ETA tasks may be delivered slightly early when worker clocks drift
+TRANSITION_TOLERANCE = timedelta(minutes=1)
+
+# Above this many newly confirmed events, scheduling is done by a worker
+INLINE_SCHEDULE_LIMIT = 20
+
+# How far ahead the previous update_space_status run queued transitions
+TRANSITIONS_SCHEDULED_UNTIL_KEY = 'bookings:transitions-scheduled-until'
+
+# Spaces whose days are rebuilt per transaction by reconcile_space_usage
+RECONCILE_SPACES_PER_BATCH = 100
+
+
+def sync_space_status(space_ids=None):
+    """
+    Mark spaces 'booked' while a confirmed event is in progress and 'free'
+    otherwise. Two UPDATEs regardless of how many spaces are affected.
+    """
+    now = timezone.now()
+    in_progress = Event.objects.filter(
+        space=OuterRef('pk'),
+        status='confirmed',
+        start_datetime__lte=now,
+        end_datetime__gt=now
+    )
+    spaces = Space.objects.all()
+    if space_ids is not None:
+        spaces = spaces.filter(id__in=space_ids)
+
+    freed = spaces.filter(status='booked').filter(
+        ~Exists(in_progress)
+    ).update(status='free', updated_at=now, version=F('version') + 1)
+    booked = spaces.filter(status='free').filter(
+        Exists(in_progress)
+    ).update(status='booked', updated_at=now, version=F('version') + 1)
+    # update() skips the Space signals that normally invalidate the catalogue
+    if freed or booked:
+        transaction.on_commit(bump_catalogue_version)
+    return freed, booked
+
+
+def transition_task_ids(event_id, start_datetime, end_datetime):
+    """
+    Deterministic Celery task ids for an event's start/end transitions, so
+    they can be revoked later from the event's times alone.
+    """
+    return (
+        f'event-{event_id}-start-{int(start_datetime.timestamp())}',
+        f'event-{event_id}-end-{int(end_datetime.timestamp())}',
+    )
+
+
+def transition_horizon():
+    """
+    Latest time an ETA task is queued for. Later transitions are left to
+    update_space_status, so the broker never holds months-long ETAs.
+    """
+    return timezone.now() + timedelta(seconds=settings.EVENT_TRANSITION_HORIZON)
+
+
+def schedule_event_transitions(event, after=None, until=None):
+    """
+    Schedule the space to be booked at the event start and the event to be
+    completed at its end, for the transitions falling in (after, until]
+    """
+    if until is None:
+        until = transition_horizon()
+    start_task_id, end_task_id = transition_task_ids(
+        event.id, event.start_datetime, event.end_datetime
+    )
+    if (after is None or event.start_datetime > after) and event.start_datetime <= until:
+        start_event.apply_async((event.id,), eta=event.start_datetime, task_id=start_task_id)
+    if (after is None or event.end_datetime > after) and event.end_datetime <= until:
+        finish_event.apply_async((event.id,), eta=event.end_datetime, task_id=end_task_id)
+
+
+def schedule_upcoming_transitions():
+    """
+    Schedule the transitions of confirmed events that came within the ETA
+    horizon since the previous sweep. The window starts where that sweep
+    stopped, so a late or missed beat run widens the next window instead of
+    leaving a gap. Transitions already due are left to the reconciliation.
+    """
+    now = timezone.now()
+    until = transition_horizon()
+    after = max(cache.get(TRANSITIONS_SCHEDULED_UNTIL_KEY) or now, now)
+    events = Event.objects.filter(status='confirmed').filter(
+        Q(start_datetime__gt=after, start_datetime__lte=until) |
+        Q(end_datetime__gt=after, end_datetime__lte=until)
+    ).only('id', 'start_datetime', 'end_datetime')
+    count = 0
+    for event in events:
+        schedule_event_transitions(event, after=after, until=until)
+        count += 1
+    cache.set(TRANSITIONS_SCHEDULED_UNTIL_KEY, until, None)
+    return count
+
+
+def schedule_transitions(events):
+    """
+    Schedule transitions for newly confirmed events. Large batches are
+    handed to a worker so the request that confirmed them stays fast.
+    """
+    if len(events) <= INLINE_SCHEDULE_LIMIT:
+        for event in events:
+            schedule_event_transitions(event)
+    else:
+        schedule_confirmed_transitions.delay([event.id for event in events])
+
+
 @shared_task
-def update_space_status():
+def schedule_confirmed_transitions(event_ids):
     """
-    Check for events that have ended and update their space status to 'free'
+    Schedule the start/end transitions of a batch of confirmed events
     """
-    # Find all confirmed events that have ended
-    ended_events = Event.objects.filter(
-        end_datetime__lt=timezone.now(),
+    events = Event.objects.filter(id__in=event_ids, status='confirmed').only(
+        'id', 'start_datetime', 'end_datetime'
+    )
+    count = 0
+    for event in events:
+        schedule_event_transitions(event)
+        count += 1
+    return f"Scheduled transitions for {count} confirmed events"
+
+
+@shared_task
+def send_approval_notifications(event_ids):
+    """
+    Queue the approval emails for events confirmed in bulk, off the admin
+    request
+    """
+    events = Event.objects.filter(
+        id__in=event_ids,
         status='confirmed'
-    ).select_related('space')
-    
-    # Update space status for each event
-    updated_spaces = 0
-    completed_events = 0
-    
-    for event in ended_events:
-        # Check if there are any upcoming events for this space
-        has_upcoming_events = Event.objects.filter(
-            space=event.space,
-            end_datetime__gt=timezone.now(),
-            status='confirmed'
-        ).exclude(id=event.id).exists()
-        
-        if not has_upcoming_events:
-            # If no upcoming events, mark space as free
-            space = event.space
-            if space.status != 'free':
-                space.status = 'free'
-                space.save(update_fields=['status'])
-                updated_spaces += 1
-        
-        # Update event status to 'completed'
-        event.status = 'completed'
-        event.save(update_fields=['status'])
-        completed_events += 1
-    
-    return f"Completed {completed_events} events and freed {updated_spaces} spaces"
+    ).select_related('space', 'user')
+    count = 0
+    with transaction.atomic():
+        for event in events:
+            send_booking_approved_notification(event, event.space, event.user)
+            count += 1
+    return f"Queued approval notifications for {count} confirmed events"
+
+
+@shared_task
+def send_rejection_notifications(event_ids):
+    """
+    Queue the rejection emails for pending events rejected in bulk, off the
+    approving request
+    """
+    events = Event.objects.filter(
+        id__in=event_ids,
+        status='rejected'
+    ).select_related('space', 'user')
+    count = 0
+    with transaction.atomic():
+        for event in events:
+            send_booking_rejected_notification(event, event.space, event.user)
+            count += 1
+    return f"Queued rejection notifications for {count} rejected events"
+
+
+def reject_overlapping_pending(confirmed):
+    """
+    Reject the pending events that overlap any of the just-confirmed events,
+    found and locked with one query in the caller's transaction. Their
+    owners are notified by a worker after commit. Returns the rejected
+    events as they were before the change.
+
+    Only SQLite (local development) can hold such events. On PostgreSQL the
+    bookings_event_no_overlap exclusion constraint covers pending as well as
+    confirmed events, so there is never anything to reject.
+    """
+    if not confirmed or connection.vendor == 'postgresql':
+        return []
+    overlaps_any = reduce(or_, (
+        Q(space_id=event.space_id, start_datetime__lt=event.end_datetime, end_datetime__gt=event.start_datetime)
+        for event in confirmed
+    ))
+    rejected = transition(
+        Event.objects.filter(overlaps_any).exclude(id__in=[event.id for event in confirmed]),
+        'rejected',
+        from_statuses='pending'
+    )
+    if rejected:
+        transaction.on_commit(partial(send_rejection_notifications.delay, [event.id for event in rejected]))
+    return rejected
+
+
+def revoke_event_transitions(event_id, start_datetime, end_datetime):
+    """
+    Revoke transitions scheduled for the given times. The tasks re-check the
+    event when they run, so one that slips through is a no-op.
+    """
+    for task_id in transition_task_ids(event_id, start_datetime, end_datetime):
+        current_app.control.revoke(task_id)
+
+
+@shared_task
+def start_event(event_id):
+    """
+    Mark the space as booked when a confirmed event starts
+    """
+    now = timezone.now()
+    space_id = Event.objects.filter(
+        id=event_id,
+        status='confirmed',
+        start_datetime__lte=now + TRANSITION_TOLERANCE,
+        end_datetime__gt=now
+    ).values_list('space_id', flat=True).first()
+    if space_id is None:
+        return f"Event {event_id} is not starting now; nothing to do"
+
+    Space.objects.filter(id=space_id).update(status='booked', updated_at=now, version=F('version') + 1)
+    bump_catalogue_version()
+    return f"Space {space_id} marked as booked for event {event_id}"
+
+
+@shared_task
+def finish_event(event_id):
+    """
+    Complete a confirmed event when it ends; the status_changed receiver
+    frees its space once this commits
+    """
+    completed = transition(
+        Event.objects.filter(
+            id=event_id,
+            end_datetime__lte=timezone.now() + TRANSITION_TOLERANCE
+        ),
+        'completed',
+        from_statuses='confirmed'
+    )
+    if not completed:
+        return f"Event {event_id} is not ending now; nothing to do"
+    return f"Completed event {event_id}"
+
+
+@shared_task
+def update_space_status():
+    """
+    Reconciliation sweep for the start_event/finish_event ETA tasks
+
+    Completes confirmed events that have ended and brings every space's
+    status in line with its in-progress events. Runs a fixed number of
+    queries however many events ended: one batched transition to complete
+    the events, then one anti-join UPDATE each to free and book spaces.
+    Also queues the ETA tasks of events that came within the horizon.
+    """
+    started = time.monotonic()
+
+    with transaction.atomic():
+        completed = transition(
+            Event.objects.filter(end_datetime__lt=timezone.now()),
+            'completed',
+            from_statuses='confirmed'
+        )
+        completed_events = len(completed)
+        space_ids = {event.space_id for event in completed}
+
+        freed_spaces, booked_spaces = sync_space_status()
+
+    scheduled_events = schedule_upcoming_transitions()
+
+    elapsed_ms = (time.monotonic() - started) * 1000
+    logger.info(
+        'update_space_status: completed %d events across %d spaces, '
+        'freed %d spaces, booked %d spaces, scheduled %d events in %.1fms',
+        completed_events, len(space_ids), freed_spaces, booked_spaces,
+        scheduled_events, elapsed_ms
+    )
+    return (
+        f"Completed {completed_events} events, freed {freed_spaces} spaces, "
+        f"booked {booked_spaces} spaces and scheduled {scheduled_events} events "
+        f"in {elapsed_ms:.1f}ms"
+    )
 
 @shared_task
 def check_pending_events():
@@ -54,17 +308,62 @@ def check_pending_events():
     
     return f"Found {soon_events.count()} pending events that are starting within 24 hours"
 
+
 @shared_task
-def update_space_on_approval(event_id):
-    """
-    Update space status when an event is approved
-    """
-    try:
-        event = Event.objects.get(id=event_id)
-        if event.status == 'confirmed':
-            space = event.space
-            space.status = 'booked'
-            space.save(update_fields=['status'])
-            return f"Space '{space.name}' marked as booked for event '{event.event_name}'"
-    except Event.DoesNotExist:
-        return f"Event with ID {event_id} not found"
+def manage_event_partitions():
+    """
+    Create the monthly partitions of closed events ahead of time and
+    detach the ones past EVENT_PARTITION_DETACH_MONTHS
+    """
+    if not partitions.is_partitioned():
+        return "Events are not partitioned; nothing to do"
+    created = partitions.ensure_partitions()
+    detached = partitions.detach_old_partitions()
+    return f"Created {len(created)} and detached {len(detached)} event partitions"
+
+
+@shared_task
+def archive_old_events():
+    """
+    Move completed and cancelled events that ended more than
+    EVENT_ARCHIVE_AFTER_DAYS ago out of the database into archive files
+    """
+    paths, archived = archive.archive_events(archive.archive_cutoff())
+    return f"Archived {archived} events into {len(paths)} files"
+
+
+@shared_task
+def reconcile_space_usage(days=None):
+    """
+    Safety net for the usage rollups and occupancy bitmaps kept up to date
+    by the event signals: rebuild every space-day from SPACE_USAGE_RECONCILE_DAYS
+    days ago to as far ahead. Days up to the archive cutoff are left alone,
+    since their events may no longer be in the database.
+    """
+    if days is None:
+        days = getattr(settings, 'SPACE_USAGE_RECONCILE_DAYS', 31)
+    today = timezone.localdate()
+    first_day = max(
+        today - timedelta(days=days),
+        timezone.localtime(archive.archive_cutoff()).date() + timedelta(days=1)
+    )
+    last_day = today + timedelta(days=days)
+
+    # Existing rows too, so days that lost all their events are cleared
+    keys = set(SpaceUsage.objects.filter(day__range=(first_day, last_day)).values_list('space_id', 'day'))
+    keys |= set(SpaceOccupancy.objects.filter(day__range=(first_day, last_day)).values_list('space_id', 'day'))
+    window_start, _ = day_bounds(first_day)
+    _, window_end = day_bounds(last_day)
+    events = Event.objects.filter(
+        status__in=OCCUPYING_STATUSES,
+        start_datetime__lt=window_end,
+        end_datetime__gt=window_start
+    ).values_list('space_id', 'start_datetime', 'end_datetime')
+    for space_id, start, end in events.iterator():
+        keys |= {key for key in event_days(space_id, start, end) if first_day <= key[1] <= last_day}
+
+    space_ids = sorted({space_id for space_id, _ in keys})
+    for offset in range(0, len(space_ids), RECONCILE_SPACES_PER_BATCH):
+        batch = set(space_ids[offset:offset + RECONCILE_SPACES_PER_BATCH])
+        refresh_occupancy({key for key in keys if key[0] in batch})
+    return f"Reconciled {len(keys)} space-days from {first_day} to {last_day}"
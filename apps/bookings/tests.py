@@ -1,3 +1,2145 @@
-from django.test import TestCase
+import gzip
+import json
+import random
+import shutil
+import tempfile
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.authentication.models import User
+from apps.notifications.models import OutboxEmail
+from apps.core.versioning import StaleVersion, check_if_match
+from apps.spaces.models import Space
+from .models import Event, EventSeries, SpaceOccupancy, SpaceUsage, WaitlistEntry
+from . import partitions
+from .archive import archive_events, read_archive
+from .conflicts import IntervalIndex
+from .occupancy import day_bounds, event_days, event_masks, occupancy_grid, refresh_occupancy, slot_mask
+from .pagination import StartTimeCursorPagination
+from .recurrence import occurrence_days
+from .holds import Hold, HoldClaim
+from .space_index import SpaceIntervalCache, space_intervals, to_micros
+from .transitions import (
+    SERIALIZATION_ATTEMPTS, InvalidTransition, apply_transition, status_changed, transition
+)
+from .waitlist import promote_waitlist
+from .tasks import (
+    TRANSITIONS_SCHEDULED_UNTIL_KEY, finish_event, manage_event_partitions, reconcile_space_usage,
+    reject_overlapping_pending, send_approval_notifications, send_rejection_notifications, start_event,
+    transition_task_ids, update_space_status
+)
+
+
+class BookingTestMixin:
+    """
+    The organiser, admin, another user and the space most booking tests
+    share, a start time a day ahead, and helpers to book that space
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user(
+            email='organizer@example.com',
+            first_name='Test',
+            last_name='Organizer',
+            password='testpass123'
+        )
+        cls.admin_user = User.objects.create_superuser(
+            email='admin@example.com',
+            first_name='Admin',
+            last_name='User',
+            password='testpass123'
+        )
+        cls.other = User.objects.create_user(
+            email='other@example.com',
+            first_name='Other',
+            last_name='User',
+            password='testpass123'
+        )
+        cls.space = Space.objects.create(
+            name="Test Conference Room",
+            location="Building A, Floor 1",
+            capacity=50,
+            price_per_hour='100.00'
+        )
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        # Space ids are reused between tests; start from an empty index
+        space_intervals.clear()
+        self.now = timezone.now()
+        self.start = self.now + timedelta(days=1)
+        self.day = timezone.localdate(self.start)
+
+    def hours(self, start_hour, end_hour):
+        return self.start + timedelta(hours=start_hour), self.start + timedelta(hours=end_hour)
+
+    def at(self, hour, minute=0, days=0, day=None):
+        """Local wall-clock time on self.day, or on day"""
+        return timezone.make_aware(datetime.combine((day or self.day) + timedelta(days=days), time(hour, minute)))
+
+    def booking_data(self, start, end, name='Team Meeting', space=None):
+        return {
+            'event_name': name,
+            'start_datetime': start.isoformat(),
+            'end_datetime': end.isoformat(),
+            'organizer_name': 'Test Organizer',
+            'organizer_email': 'organizer@example.com',
+            'event_type': 'meeting',
+            'space': (space or self.space).id
+        }
+
+    def create_event(self, start, end, event_status='confirmed', space=None, name='Team Meeting'):
+        # bulk_create skips Event.clean(), which rejects past start times
+        return Event.objects.bulk_create([Event(
+            event_name=name,
+            start_datetime=start,
+            end_datetime=end,
+            organizer_name='Test Organizer',
+            organizer_email='organizer@example.com',
+            status=event_status,
+            user=self.user,
+            space=space or self.space
+        )])[0]
+
+    def book(self, start, end, event_status='pending', space=None):
+        """Create an event through save(), so its signal receivers run"""
+        return Event.objects.create(
+            event_name='Team Meeting',
+            start_datetime=start,
+            end_datetime=end,
+            organizer_name='Test Organizer',
+            organizer_email='organizer@example.com',
+            status=event_status,
+            user=self.user,
+            space=space or self.space
+        )
+
+    def create_events(self, statuses, start=None, space=None):
+        """One-hour events two hours apart from start, one per status"""
+        start = start or self.start
+        return Event.objects.bulk_create([
+            Event(
+                event_name=f'Event {i}',
+                start_datetime=start + timedelta(hours=2 * i),
+                end_datetime=start + timedelta(hours=2 * i + 1),
+                organizer_name='Test Organizer',
+                organizer_email='organizer@example.com',
+                status=event_status,
+                user=self.user,
+                space=space or self.space
+            )
+            for i, event_status in enumerate(statuses)
+        ])
+
+
+class BookEventViewTestCase(BookingTestMixin, APITestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.url = reverse('book-event')
+        self.client.force_authenticate(user=self.user)
+
+    def test_book_event_success(self):
+        """Test booking a free slot creates a pending event"""
+        data = self.booking_data(self.start, self.start + timedelta(hours=2))
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(Event.objects.count(), 1)
+
+    def test_book_event_queues_emails(self):
+        """Test booking writes notifications to the outbox instead of sending inline"""
+        data = self.booking_data(self.start, self.start + timedelta(hours=2))
+
+        with self.settings(ADMIN_EMAIL='admin@example.com'):
+            self.client.post(self.url, data, format='json')
+
+        self.assertEqual(len(mail.outbox), 0)
+        recipients = sorted(
+            tuple(email.recipients) for email in OutboxEmail.objects.all()
+        )
+        self.assertEqual(recipients, [('admin@example.com',), ('organizer@example.com',)])
+
+    def test_book_event_overlap_conflict(self):
+        """Test an overlapping booking returns 409 with the conflicting event"""
+        first = self.booking_data(self.start, self.start + timedelta(hours=2), 'First')
+        second = self.booking_data(
+            self.start + timedelta(hours=1), self.start + timedelta(hours=3), 'Second'
+        )
+        self.client.post(self.url, first, format='json')
+
+        response = self.client.post(self.url, second, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['details']['booked_event'], 'First')
+        self.assertEqual(Event.objects.count(), 1)
+
+    def test_book_event_back_to_back(self):
+        """Test adjacent bookings do not conflict"""
+        first = self.booking_data(self.start, self.start + timedelta(hours=1), 'First')
+        second = self.booking_data(
+            self.start + timedelta(hours=1), self.start + timedelta(hours=2), 'Second'
+        )
+        self.client.post(self.url, first, format='json')
+
+        response = self.client.post(self.url, second, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Event.objects.count(), 2)
+
+    def test_retry_with_idempotency_key_replays_response(self):
+        """Test a retried booking replays the first response without touching the database"""
+        cache.clear()
+        data = self.booking_data(self.start, self.start + timedelta(hours=2))
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'booking-attempt-1'}
+        first = self.client.post(self.url, data, format='json', **headers)
+
+        with self.assertNumQueries(0):
+            retry = self.client.post(self.url, data, format='json', **headers)
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Event.objects.count(), 1)
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+    def test_idempotency_key_reused_for_other_request(self):
+        """Test a key reused with a different body is refused, and keys are per user"""
+        cache.clear()
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'booking-attempt-1'}
+        self.client.post(self.url, self.booking_data(self.start, self.start + timedelta(hours=1)),
+                         format='json', **headers)
+
+        response = self.client.post(
+            self.url, self.booking_data(self.start + timedelta(hours=2), self.start + timedelta(hours=3)),
+            format='json', **headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        self.client.force_authenticate(user=self.other)
+        response = self.client.post(
+            self.url, self.booking_data(self.start + timedelta(hours=2), self.start + timedelta(hours=3)),
+            format='json', **headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class BookingHoldTestCase(BookingTestMixin, APITestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.start = self.start.replace(microsecond=0)
+        self.end = self.start + timedelta(hours=2)
+        self.client.force_authenticate(user=self.user)
+
+    def hold_of(self, user, start, end, expires_in=timedelta(minutes=10)):
+        member = f'abc123:{user.id}:{to_micros(start)}:{to_micros(end)}'
+        return member, (timezone.now() + expires_in).timestamp() * 1000
+
+    def test_hold_slot(self):
+        """Test a free slot can be held and the hold id is returned"""
+        hold = Hold(*self.hold_of(self.user, self.start, self.end))
+        with mock.patch('apps.bookings.views.place_hold', return_value=(hold, None)) as place:
+            response = self.client.post(reverse('booking-hold'), self.booking_data(self.start, self.end), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['hold_id'], 'abc123')
+        place.assert_called_once_with(self.space.id, self.user.id, self.start, self.end)
+
+    def test_hold_unavailable_without_redis(self):
+        """Test holding answers 503 when no hold store is configured"""
+        with self.settings(BOOKING_HOLD_REDIS_URL=None):
+            response = self.client.post(reverse('booking-hold'), self.booking_data(self.start, self.end), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    @contextmanager
+    def hold_store(self, *results):
+        """Stand in for the hold scripts; each take() gets the next result"""
+        consume, restore = mock.Mock(side_effect=results), mock.Mock()
+        with self.settings(BOOKING_HOLD_REDIS_URL='redis://localhost:6379/1'), \
+                mock.patch('apps.bookings.holds._client', mock.MagicMock()), \
+                mock.patch.dict('apps.bookings.holds._scripts', {'consume': consume, 'restore': restore}):
+            yield consume, restore
+
+    def consumed(self, clashes, taken=()):
+        """A consume script reply: per range the clashing hold or None, and the holds taken"""
+        reply = []
+        for hold in clashes:
+            reply += [b'', b''] if hold is None else [hold[0].encode(), str(hold[1]).encode()]
+        return [reply, [value for hold in taken for value in (hold[0].encode(), str(hold[1]).encode())]]
+
+    def test_claim_takes_and_restores(self):
+        """Test a claim checks and takes holds in one script call and puts them back on failure"""
+        own = self.hold_of(self.user, self.start, self.end)
+        theirs = self.hold_of(self.other, self.start + timedelta(hours=1), self.end)
+        with self.hold_store(self.consumed([None], [own]), self.consumed([theirs])) as (consume, restore):
+            with self.assertRaises(RuntimeError), HoldClaim(self.user.id) as claim:
+                self.assertEqual(claim.take(self.space.id, [(self.start, self.end)]), {})
+                raise RuntimeError
+            hold = HoldClaim(self.user.id).take(self.space.id, [(self.start, self.end)])[0]
+
+        self.assertEqual(consume.call_args_list[0].kwargs['args'][1:], [
+            self.user.id, 0, to_micros(self.start), to_micros(self.end)
+        ])
+        restore.assert_called_once()
+        self.assertEqual(restore.call_args.kwargs['args'], [own[0].encode(), str(own[1]).encode()])
+        self.assertEqual(hold.user_id, self.other.id)
+        self.assertEqual(hold.start, self.start + timedelta(hours=1))
+
+    def test_claim_fails_open_without_redis(self):
+        """Test bookings are not blocked when no hold store is configured"""
+        with self.settings(BOOKING_HOLD_REDIS_URL=None):
+            self.assertEqual(HoldClaim(self.user.id).take(self.space.id, [(self.start, self.end)]), {})
+
+    def test_booking_honours_and_consumes_holds(self):
+        """Test a slot held by someone else cannot be booked and booking takes your own hold"""
+        data = self.booking_data(self.start, self.end)
+        own = self.hold_of(self.user, self.start, self.end)
+        theirs = self.hold_of(self.other, self.start, self.end)
+        with self.hold_store(self.consumed([theirs]), self.consumed([None], [own])) as (consume, restore), \
+                mock.patch('apps.notifications.tasks.send_queued_emails.delay'):
+            response = self.client.post(reverse('book-event'), data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+            self.assertFalse(Event.objects.exists())
+
+            response = self.client.post(reverse('book-event'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(consume.call_count, 2)
+        restore.assert_not_called()
+
+    def test_batch_and_series_honour_holds(self):
+        """Test batch items and series occurrences held by someone else are conflicts"""
+        theirs = self.hold_of(self.other, self.end, self.end + timedelta(hours=2))
+        item = self.booking_data(self.start, self.end)
+        later = dict(item, start_datetime=self.end.isoformat(), end_datetime=(self.end + timedelta(hours=2)).isoformat())
+        with self.hold_store(self.consumed([None, theirs])) as (consume, _):
+            response = self.client.post(reverse('book-event-batch'), {'events': [item, later]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'conflict'])
+        self.assertIn('held_until', response.data['results'][1])
+        self.assertEqual(consume.call_args.kwargs['args'][2], 1)
+
+        series = dict(
+            item, start_datetime=(self.start + timedelta(days=1)).isoformat(),
+            end_datetime=(self.end + timedelta(days=1)).isoformat(), frequency='daily',
+            until=(self.start + timedelta(days=3)).date().isoformat()
+        )
+        held_first = self.consumed([theirs, None, None])
+        with self.hold_store(held_first, self.consumed([theirs, None, None])) as (consume, _):
+            response = self.client.post(reverse('event-series'), series, format='json')
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+            self.assertEqual(consume.call_args.kwargs['args'][2], 0)
+            self.assertIn('held_until', response.data['conflicts'][0])
+
+            response = self.client.post(reverse('event-series'), dict(series, skip_conflicts=True), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['skipped']), 1)
+        self.assertEqual(EventSeries.objects.get().occurrences.count(), 2)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Exclusion constraints require PostgreSQL')
+class EventOverlapConstraintTestCase(BookingTestMixin, TestCase):
+
+    def test_overlapping_active_events_rejected(self):
+        """Test the database rejects overlapping pending/confirmed events"""
+        self.create_event(self.start, self.start + timedelta(hours=2), 'confirmed')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.create_event(self.start + timedelta(hours=1), self.start + timedelta(hours=3), 'pending')
+
+    def test_overlap_with_inactive_event_allowed(self):
+        """Test cancelled events do not hold the slot"""
+        self.create_event(self.start, self.start + timedelta(hours=2), 'cancelled')
+
+        self.create_event(self.start + timedelta(hours=1), self.start + timedelta(hours=3), 'pending')
+
+        self.assertEqual(Event.objects.count(), 2)
+
+
+class UpdateSpaceStatusTaskTestCase(BookingTestMixin, TestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        # The sweep queues ETA tasks for events coming within the horizon
+        for task in (start_event, finish_event):
+            patcher = mock.patch.object(task, 'apply_async')
+            self.addCleanup(patcher.stop)
+            patcher.start()
+        # Every test starts as if update_space_status never ran
+        cache.delete(TRANSITIONS_SCHEDULED_UNTIL_KEY)
+        self.addCleanup(cache.delete, TRANSITIONS_SCHEDULED_UNTIL_KEY)
+
+    def create_space(self, name):
+        return Space.objects.create(
+            name=name,
+            location="Building A, Floor 1",
+            capacity=50,
+            price_per_hour='100.00',
+            status='booked'
+        )
+
+    def test_completes_events_and_reconciles_spaces(self):
+        """Test ended events complete and space status follows in-progress events"""
+        idle_space = self.create_space('Idle Room')
+        busy_space = self.create_space('Busy Room')
+        stale_space = self.create_space('Stale Room')
+        stale_space.status = 'free'
+        stale_space.save()
+        self.create_events(['confirmed'] * 3, self.now - timedelta(days=2), idle_space)
+        self.create_events(['confirmed'], self.now + timedelta(days=1), idle_space)
+        self.create_events(['confirmed'], self.now - timedelta(days=2), busy_space)
+        self.create_events(['confirmed'], self.now - timedelta(minutes=30), busy_space)
+        self.create_events(['confirmed'], self.now - timedelta(minutes=30), stale_space)
+
+        update_space_status()
+
+        self.assertEqual(Event.objects.filter(status='completed').count(), 4)
+        self.assertEqual(Event.objects.filter(status='confirmed').count(), 3)
+        idle_space.refresh_from_db()
+        busy_space.refresh_from_db()
+        stale_space.refresh_from_db()
+        self.assertEqual(idle_space.status, 'free')
+        self.assertEqual(busy_space.status, 'booked')
+        self.assertEqual(stale_space.status, 'booked')
+
+    def test_query_count_is_independent_of_backlog(self):
+        """Test the sweep issues the same number of queries for 1 or 50 events"""
+        small_space = self.create_space('Small Backlog')
+        self.create_events(['confirmed'], self.now - timedelta(days=10), small_space)
+        with CaptureQueriesContext(connection) as small:
+            update_space_status()
+
+        for i in range(5):
+            self.create_events(['confirmed'] * 10, self.now - timedelta(days=5), self.create_space(f'Room {i}'))
+        with CaptureQueriesContext(connection) as large:
+            update_space_status()
+
+        self.assertEqual(Event.objects.filter(status='completed').count(), 51)
+        self.assertEqual(len(small), len(large))
+
+    def test_schedules_transitions_since_the_previous_sweep(self):
+        """Test the sweep queues the transitions between where the last run stopped and the horizon"""
+        space = self.create_space('Upcoming Room')
+        horizon = timedelta(seconds=settings.EVENT_TRANSITION_HORIZON)
+        # The previous run was three hours ago, as if two beat runs were missed
+        cache.set(TRANSITIONS_SCHEDULED_UNTIL_KEY, self.now + horizon - timedelta(hours=3))
+        # Ends within the missed window, started before it
+        self.create_events(['confirmed'], self.now + horizon - timedelta(hours=3, minutes=30), space)
+        # Starts within the missed window, ends beyond the horizon
+        self.create_events(['confirmed'], self.now + horizon - timedelta(minutes=30), space)
+        # Beyond the horizon
+        self.create_events(['confirmed'], self.now + horizon + timedelta(hours=3), space)
+        ending, upcoming, later = Event.objects.filter(space=space).order_by('start_datetime')
+
+        result = update_space_status()
+
+        self.assertIn('scheduled 2 events', result)
+        start_event.apply_async.assert_called_once_with(
+            (upcoming.id,), eta=upcoming.start_datetime,
+            task_id=transition_task_ids(upcoming.id, upcoming.start_datetime, upcoming.end_datetime)[0]
+        )
+        finish_event.apply_async.assert_called_once_with(
+            (ending.id,), eta=ending.end_datetime,
+            task_id=transition_task_ids(ending.id, ending.start_datetime, ending.end_datetime)[1]
+        )
+
+        # The next run picks up where this one stopped
+        self.assertIn('scheduled 0 events', update_space_status())
+        self.assertEqual(start_event.apply_async.call_count, 1)
+
+    def test_first_sweep_covers_the_whole_horizon(self):
+        """Test without a previous run every transition up to the horizon is queued"""
+        space = self.create_space('Upcoming Room')
+        self.create_events(['confirmed', 'pending'], self.now + timedelta(hours=2), space)
+
+        self.assertIn('scheduled 1 events', update_space_status())
+        start_event.apply_async.assert_called_once()
+        finish_event.apply_async.assert_called_once()
+
+
+class EventListingPaginationTestCase(BookingTestMixin, APITestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        statuses = ['confirmed', 'confirmed', 'pending', 'confirmed', 'cancelled']
+        # Two events share a start time to exercise the id tiebreaker
+        starts = [0, 0, 2, 4, 6]
+        self.events = [
+            self.create_event(*self.hours(hour, hour + 1), event_status, name=f'Event {i}')
+            for i, (hour, event_status) in enumerate(zip(starts, statuses))
+        ]
+        self.client.force_authenticate(user=self.user)
+
+    def collect_pages(self, url):
+        names = []
+        responses = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['data']), 2)
+            names.extend(event['event_name'] for event in response.data['data'])
+            responses.append(response)
+            url = response.data['next']
+        return names, responses
+
+    def test_upcoming_events_follow_cursor(self):
+        """Test upcoming events page through in (start_datetime, id) order"""
+        names, (first, last) = self.collect_pages(reverse('upcoming-events') + '?page_size=2')
+
+        self.assertEqual(names, ['Event 0', 'Event 1', 'Event 3'])
+        self.assertEqual(first.data['count'], 3)
+        self.assertNotIn('count', last.data)
+
+    def test_my_events_counts_by_status(self):
+        """Test my events pages through everything and aggregates statuses on the first page"""
+        names, (first, *rest) = self.collect_pages(reverse('my-events') + '?page_size=2')
+
+        self.assertEqual(names, [f'Event {i}' for i in range(5)])
+        self.assertEqual(first.data['count'], 5)
+        self.assertEqual(
+            first.data['events_by_status'],
+            {'confirmed': 3, 'pending': 1, 'cancelled': 1}
+        )
+        self.assertTrue(all('events_by_status' not in response.data for response in rest))
+
+    def test_my_events_query_count(self):
+        """Test the first page costs one aggregate and one range query, later pages only the range query"""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('my-events') + '?page_size=2')
+        with self.assertNumQueries(1):
+            self.client.get(response.data['next'])
+
+    def test_upcoming_events_query_count(self):
+        """Test only the first upcoming page counts the events"""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('upcoming-events') + '?page_size=2')
+        with self.assertNumQueries(1):
+            self.client.get(response.data['next'])
+
+    def test_page_size_is_bounded(self):
+        """Test page_size is clamped to [1, max_page_size]"""
+        paginator = StartTimeCursorPagination()
+        too_small = self.client.get(reverse('my-events') + '?page_size=0')
+
+        self.assertEqual(len(too_small.data['data']), 1)
+        self.assertIsNotNone(too_small.data['next'])
+        request = too_small.wsgi_request
+        request.query_params = {'page_size': '100000'}
+        self.assertEqual(paginator.get_page_size(request), paginator.max_page_size)
+
+    def test_invalid_cursor(self):
+        """Test a garbled cursor returns 404"""
+        response = self.client.get(reverse('my-events') + '?cursor=not-a-cursor')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class EventTransitionTaskTestCase(BookingTestMixin, APITestCase):
+
+    def test_start_event_books_space(self):
+        """Test the start task books the space of an in-progress event"""
+        event = self.create_event(self.now, self.now + timedelta(hours=1))
+
+        start_event(event.id)
+
+        self.space.refresh_from_db()
+        self.assertEqual(self.space.status, 'booked')
+
+    def test_start_event_ignores_rescheduled_event(self):
+        """Test a stale start task is a no-op once the event moved later"""
+        event = self.create_event(self.now + timedelta(days=1), self.now + timedelta(days=1, hours=1))
+
+        start_event(event.id)
+
+        self.space.refresh_from_db()
+        self.assertEqual(self.space.status, 'free')
+
+    def test_finish_event_completes_and_frees_space(self):
+        """Test the end task completes the event and frees the space"""
+        event = self.create_event(self.now - timedelta(hours=1), self.now)
+        self.space.status = 'booked'
+        self.space.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            finish_event(event.id)
+
+        event.refresh_from_db()
+        self.space.refresh_from_db()
+        self.assertEqual(event.status, 'completed')
+        self.assertEqual(self.space.status, 'free')
+
+    def test_finish_event_ignores_cancelled_event(self):
+        """Test a stale end task leaves cancelled events alone"""
+        event = self.create_event(self.now - timedelta(hours=1), self.now, 'cancelled')
+
+        finish_event(event.id)
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'cancelled')
+
+    def test_nothing_to_reject_on_postgresql(self):
+        """Test overlap rejection is skipped where the exclusion constraint already applies"""
+        event = self.create_event(*self.hours(0, 2))
+
+        with mock.patch.object(connection, 'vendor', 'postgresql'), self.assertNumQueries(0):
+            self.assertEqual(reject_overlapping_pending([event]), [])
+
+    def test_approve_schedules_transitions(self):
+        """Test approving an event schedules ETA tasks at its start and end"""
+        start = self.now + timedelta(hours=2)
+        event = self.create_event(start, start + timedelta(hours=1), 'pending')
+        self.client.force_authenticate(user=self.admin_user)
+
+        with mock.patch('apps.bookings.tasks.start_event.apply_async') as start_task, \
+                mock.patch('apps.bookings.tasks.finish_event.apply_async') as finish_task, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('approve-event', args=[event.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        start_task_id, end_task_id = transition_task_ids(
+            event.id, event.start_datetime, event.end_datetime
+        )
+        start_task.assert_called_once_with(
+            (event.id,), eta=event.start_datetime, task_id=start_task_id
+        )
+        finish_task.assert_called_once_with(
+            (event.id,), eta=event.end_datetime, task_id=end_task_id
+        )
+
+    def test_approve_leaves_distant_transitions_to_the_sweep(self):
+        """Test approving an event beyond the ETA horizon queues no tasks yet"""
+        start = self.now + timedelta(days=90)
+        event = self.create_event(start, start + timedelta(hours=1), 'pending')
+        self.client.force_authenticate(user=self.admin_user)
+
+        with mock.patch('apps.bookings.tasks.start_event.apply_async') as start_task, \
+                mock.patch('apps.bookings.tasks.finish_event.apply_async') as finish_task, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('approve-event', args=[event.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        start_task.assert_not_called()
+        finish_task.assert_not_called()
+
+    @skipUnless(connection.vendor != 'postgresql', 'The exclusion constraint keeps overlapping events out')
+    def test_approve_rejects_overlapping_pending_events(self):
+        """Test approving an event rejects the pending events overlapping it in one batch"""
+        event = self.create_event(*self.hours(0, 2), 'pending')
+        overlapping = [
+            self.create_event(*self.hours(1, 3), 'pending'),
+            self.create_event(*self.hours(-1, 0.5), 'pending'),
+        ]
+        adjacent = self.create_event(*self.hours(2, 3), 'cancelled')
+        later = self.create_event(*self.hours(4, 5), 'pending')
+        self.client.force_authenticate(user=self.admin_user)
+
+        with mock.patch('apps.bookings.tasks.schedule_event_transitions'), \
+                mock.patch('apps.bookings.tasks.send_rejection_notifications.delay') as notify, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('approve-event', args=[event.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rejected_ids = sorted(e.id for e in overlapping)
+        self.assertEqual(sorted(response.data['rejected_event_ids']), rejected_ids)
+        self.assertEqual(
+            sorted(Event.objects.filter(status='rejected').values_list('id', flat=True)), rejected_ids
+        )
+        self.assertEqual(Event.objects.get(id=adjacent.id).status, 'cancelled')
+        self.assertEqual(Event.objects.get(id=later.id).status, 'pending')
+        notify.assert_called_once()
+        self.assertEqual(sorted(notify.call_args[0][0]), rejected_ids)
+
+
+class BookEventBatchViewTestCase(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.organizer = User.objects.create_user(
+            email='space-organizer@example.com',
+            first_name='Space',
+            last_name='Organizer',
+            password='testpass123'
+        )
+        cls.space.organizer = cls.organizer
+        cls.space.save()
+        cls.hall = Space.objects.create(
+            name="Test Hall",
+            location="Building B",
+            capacity=200,
+            price_per_hour='300.00'
+        )
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.url = reverse('book-event-batch')
+        self.client.force_authenticate(user=self.user)
+
+    def test_batch_reports_per_item_results(self):
+        """Test valid events are created and conflicts/invalid items are reported per item"""
+        self.create_event(*self.hours(0, 2), space=self.hall, name='Existing')
+        events = [
+            self.booking_data(*self.hours(0, 2), 'First'),
+            # Overlaps the first item of the batch
+            self.booking_data(*self.hours(1, 3), 'Second'),
+            # Back to back with the first item
+            self.booking_data(*self.hours(2, 4), 'Third'),
+            # Overlaps an existing booking
+            self.booking_data(*self.hours(1, 3), 'Fourth', space=self.hall),
+            dict(self.booking_data(*self.hours(0, 2), 'Fifth'), space=9999),
+        ]
+
+        response = self.client.post(self.url, {'events': events}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['created', 'conflict', 'created', 'conflict', 'invalid']
+        )
+        self.assertEqual(response.data['results'][3]['details']['booked_event'], 'Existing')
+        self.assertEqual(
+            set(Event.objects.filter(status='pending').values_list('event_name', flat=True)),
+            {'First', 'Third'}
+        )
+
+    def test_batch_query_count_is_independent_of_size(self):
+        """Test validating and inserting a batch does not query per item"""
+        def run(count):
+            events = [
+                self.booking_data(*self.hours(2 * i, 2 * i + 2), f'Event {i}')
+                for i in range(count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, {'events': events}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            Event.objects.all().delete()
+            OutboxEmail.objects.all().delete()
+            return len(queries)
+
+        self.assertEqual(run(2), run(10))
+
+    def test_batch_queues_one_digest_per_recipient(self):
+        """Test each recipient gets a single email covering their events"""
+        events = [
+            self.booking_data(*self.hours(0, 2), 'First'),
+            self.booking_data(*self.hours(3, 5), 'Second'),
+            self.booking_data(*self.hours(0, 2), 'Third', space=self.hall),
+        ]
+
+        with self.settings(ADMIN_EMAIL='admin@example.com'):
+            self.client.post(self.url, {'events': events}, format='json')
+
+        digests = {
+            email.recipients[0]: email.subject for email in OutboxEmail.objects.all()
+        }
+        self.assertEqual(OutboxEmail.objects.count(), 3)
+        self.assertEqual(digests['organizer@example.com'], '3 Event Bookings Submitted')
+        self.assertEqual(digests['admin@example.com'], '3 Event Bookings Submitted')
+        self.assertEqual(digests['space-organizer@example.com'], '2 Event Bookings Submitted')
+
+    def test_batch_all_conflicting(self):
+        """Test a batch with nothing to create returns 409"""
+        self.create_event(*self.hours(0, 2), 'pending', name='Existing')
+
+        response = self.client.post(
+            self.url, {'events': [self.booking_data(*self.hours(0, 2))]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Event.objects.count(), 1)
+
+    def test_batch_size_is_bounded(self):
+        """Test empty and oversized batches are rejected"""
+        response = self.client.post(self.url, {'events': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        events = [self.booking_data(*self.hours(2 * i, 2 * i + 2)) for i in range(51)]
+        response = self.client.post(self.url, {'events': events}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Event.objects.count(), 0)
+
+
+class EventSeriesTestCase(BookingTestMixin, APITestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.url = reverse('event-series')
+        # Next Tuesday, 10:00 local time
+        today = timezone.localdate()
+        tuesday = today + timedelta(days=(1 - today.weekday()) % 7 or 7)
+        self.start = timezone.make_aware(datetime.combine(tuesday, time(10)))
+        self.client.force_authenticate(user=self.user)
+
+    def series_data(self, **overrides):
+        return {
+            **self.booking_data(*self.hours(0, 1), 'Weekly Sync'),
+            'frequency': 'weekly',
+            'until': (self.start.date() + timedelta(weeks=25)).isoformat(),
+            **overrides
+        }
+
+    def test_expand_weekly_occurrences(self):
+        """Test weekly expansion honours weekdays, interval and the until date"""
+        days = occurrence_days(date(2026, 1, 6), 'weekly', date(2026, 1, 31), interval=2, weekdays=[1, 3])
+
+        self.assertEqual(days, [date(2026, 1, 6), date(2026, 1, 8), date(2026, 1, 20), date(2026, 1, 22)])
+
+    def test_book_weekly_series(self):
+        """Test a six month weekly series creates one pending event per week"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.series_data(), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        series = EventSeries.objects.get(id=response.data['series_id'])
+        occurrences = list(series.occurrences.order_by('start_datetime'))
+        self.assertEqual(len(occurrences), 26)
+        self.assertTrue(all(event.status == 'pending' for event in occurrences))
+        self.assertTrue(all(
+            timezone.localtime(event.start_datetime).weekday() == 1 and
+            timezone.localtime(event.start_datetime).hour == 10
+            for event in occurrences
+        ))
+        # Conflict check and insert do not scale with the number of occurrences
+        self.assertLess(len(queries), 26)
+
+    def test_series_conflicts(self):
+        """Test conflicting occurrences reject the series unless skip_conflicts is set"""
+        self.create_event(
+            self.start + timedelta(weeks=3, minutes=30), self.start + timedelta(weeks=3, hours=2),
+            'pending', name='Existing'
+        )
+
+        response = self.client.post(self.url, self.series_data(), format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(len(response.data['conflicts']), 1)
+        self.assertFalse(EventSeries.objects.exists())
+
+        response = self.client.post(self.url, self.series_data(skip_conflicts=True), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['skipped']), 1)
+        self.assertEqual(Event.objects.filter(series__isnull=False).count(), 25)
+
+    def test_series_span_is_bounded(self):
+        """Test a series may not run for more than a year"""
+        until = (self.start.date() + timedelta(days=400)).isoformat()
+
+        response = self.client.post(self.url, self.series_data(until=until), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_edit_and_cancel_series(self):
+        """Test editing and cancelling touch every remaining occurrence in one statement"""
+        response = self.client.post(self.url, self.series_data(), format='json')
+        detail_url = reverse('event-series-detail', args=[response.data['series_id']])
+
+        with self.assertNumQueries(2):
+            response = self.client.patch(detail_url, {'event_name': 'Renamed Sync'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Event.objects.filter(event_name='Renamed Sync').count(), 26)
+
+        response = self.client.delete(detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Event.objects.filter(status='cancelled').count(), 26)
+
+    def test_series_belongs_to_owner(self):
+        """Test other users cannot edit a series"""
+        response = self.client.post(self.url, self.series_data(), format='json')
+        self.client.force_authenticate(user=self.other)
+
+        response = self.client.delete(reverse('event-series-detail', args=[response.data['series_id']]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Event.objects.filter(status='pending').count(), 26)
+
+
+class BulkConfirmEventsTestCase(BookingTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.rooms = [
+            cls.space,
+            Space.objects.create(
+                name="Test Hall",
+                location="Building B",
+                capacity=200,
+                price_per_hour='300.00'
+            )
+        ]
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.url = reverse('admin:bookings_event_changelist')
+        self.client.force_login(self.admin_user)
+
+    def create_selection(self, specs):
+        # bulk_create bypasses the overlap check, as concurrent bookings on
+        # a database without the exclusion constraint would
+        return [
+            self.create_event(*self.hours(offset, offset + 2), event_status, space, name)
+            for name, space, offset, event_status in specs
+        ]
+
+    def confirm(self, events):
+        return self.client.post(self.url, {
+            'action': 'mark_as_confirmed',
+            '_selected_action': [event.id for event in events]
+        })
+
+    @skipUnless(connection.vendor != 'postgresql', 'The exclusion constraint keeps overlapping events out')
+    def test_conflicts_resolved_in_memory(self):
+        """Test conflicts with confirmed events and among the selection are both caught"""
+        room_a, room_b = self.rooms
+        self.create_selection([('Existing', room_a, 0, 'confirmed')])
+        selected = self.create_selection([
+            ('Clashes with existing', room_a, 1, 'pending'),
+            ('Later in room A', room_a, 4, 'pending'),
+            ('First in room B', room_b, 0, 'pending'),
+            ('Clashes with first in room B', room_b, 1, 'pending'),
+        ])
+
+        with mock.patch('apps.bookings.admin.send_approval_notifications.delay') as notify, \
+                mock.patch('apps.bookings.tasks.send_rejection_notifications.delay') as notify_rejected, \
+                mock.patch('apps.bookings.tasks.schedule_event_transitions') as schedule, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.confirm(selected)
+
+        confirmed = set(Event.objects.filter(status='confirmed').values_list('event_name', flat=True))
+        self.assertEqual(confirmed, {'Existing', 'Later in room A', 'First in room B'})
+        # Only the loser to an event confirmed here is rejected
+        self.assertEqual(Event.objects.get(id=selected[3].id).status, 'rejected')
+        self.assertEqual(Event.objects.get(id=selected[0].id).status, 'pending')
+        notify_rejected.assert_called_once_with([selected[3].id])
+        notify.assert_called_once()
+        self.assertEqual(sorted(notify.call_args[0][0]), sorted([selected[1].id, selected[2].id]))
+        self.assertEqual(schedule.call_count, 2)
+
+    def test_only_applied_confirmations_are_notified(self):
+        """Test events the transition did not confirm get no approval email"""
+        selected = self.create_selection([('Pending', self.rooms[0], 0, 'pending')])
+
+        with mock.patch('apps.bookings.admin.transition', return_value=[]), \
+                mock.patch('apps.bookings.admin.send_approval_notifications.delay') as notify, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.confirm(selected)
+
+        notify.assert_not_called()
+
+    def test_query_count_is_independent_of_selection(self):
+        """Test confirming many events costs the same queries as confirming a few"""
+        def run(count):
+            events = self.create_selection([
+                (f'Event {i}', self.rooms[i % 2], 3 * i, 'pending') for i in range(count)
+            ])
+            with mock.patch('apps.bookings.admin.send_approval_notifications.delay'), \
+                    CaptureQueriesContext(connection) as queries:
+                self.confirm(events)
+            self.assertEqual(Event.objects.filter(status='confirmed').count(), count)
+            Event.objects.all().delete()
+            return len(queries)
+
+        self.assertEqual(run(3), run(30))
+
+    def test_send_approval_notifications(self):
+        """Test the background batch queues one approval email per event"""
+        events = self.create_selection([
+            ('First', self.rooms[0], 0, 'confirmed'),
+            ('Second', self.rooms[1], 0, 'confirmed'),
+        ])
+
+        send_approval_notifications([event.id for event in events])
+
+        self.assertEqual(OutboxEmail.objects.filter(subject__startswith='Booking Approved').count(), 2)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_send_rejection_notifications(self):
+        """Test the background batch queues rejection emails only for events still rejected"""
+        events = self.create_selection([
+            ('First', self.rooms[0], 0, 'rejected'),
+            ('Second', self.rooms[1], 0, 'rejected'),
+            ('Third', self.rooms[1], 3, 'pending'),
+        ])
+
+        send_rejection_notifications([event.id for event in events])
+
+        self.assertEqual(OutboxEmail.objects.filter(subject__startswith='Booking Not Approved').count(), 2)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class EventTransitionServiceTestCase(BookingTestMixin, TestCase):
+
+    def test_invalid_transition(self):
+        """Test transitions outside the lifecycle are refused"""
+        with self.assertRaises(InvalidTransition):
+            transition(Event.objects.all(), 'pending', from_statuses='completed')
+
+    def serialization_failure(self, *args):
+        # What Django raises for psycopg2's SerializationFailure
+        cause = Exception('tuple to be locked was already moved to another partition due to concurrent update')
+        cause.pgcode = '40001'
+        error = OperationalError(*cause.args)
+        error.__cause__ = cause
+        raise error
+
+    def test_serialization_failure_retried(self):
+        """Test a transition that lost its row to another partition starts over and sees the new status"""
+        event, = self.create_events(['confirmed'])
+        attempts = []
+
+        def completed_concurrently(*args):
+            attempts.append(args)
+            if len(attempts) == 1:
+                self.serialization_failure()
+            # The transaction that moved the row has committed by now
+            Event.objects.filter(id=event.id).update(status='completed')
+            return apply_transition(*args)
+
+        with mock.patch('apps.bookings.transitions.apply_transition', side_effect=completed_concurrently):
+            self.assertEqual(transition(Event.objects.filter(id=event.id), 'cancelled'), [])
+
+        self.assertEqual(len(attempts), 2)
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'completed')
+
+    def test_retries_are_bounded(self):
+        """Test serialization failures are retried a fixed number of times and other errors not at all"""
+        event, = self.create_events(['confirmed'])
+        with mock.patch('apps.bookings.transitions.apply_transition',
+                        side_effect=self.serialization_failure) as attempt:
+            with self.assertRaises(OperationalError):
+                transition(Event.objects.filter(id=event.id), 'cancelled')
+        self.assertEqual(attempt.call_count, SERIALIZATION_ATTEMPTS)
+
+        with mock.patch('apps.bookings.transitions.apply_transition',
+                        side_effect=OperationalError('database is locked')) as attempt:
+            with self.assertRaises(OperationalError):
+                transition(Event.objects.filter(id=event.id), 'cancelled')
+        self.assertEqual(attempt.call_count, 1)
+
+    def test_only_matching_statuses_move(self):
+        """Test the UPDATE only touches rows still in an allowed source status"""
+        self.create_events(['pending', 'confirmed', 'completed', 'rejected'])
+
+        cancelled = transition(Event.objects.all(), 'cancelled')
+
+        self.assertEqual(sorted(event.status for event in cancelled), ['confirmed', 'pending'])
+        self.assertEqual(
+            sorted(Event.objects.values_list('status', flat=True)),
+            ['cancelled', 'cancelled', 'completed', 'rejected']
+        )
+
+    def test_one_signal_and_fixed_queries_per_batch(self):
+        """Test a batch costs the same queries and sends one signal whatever its size"""
+        received = []
+
+        def receiver(sender, events, to_status, **kwargs):
+            received.append((len(events), to_status))
+
+        status_changed.connect(receiver, sender=Event)
+        self.addCleanup(status_changed.disconnect, receiver, sender=Event)
+
+        small = self.create_events(['pending'] * 2)
+        with CaptureQueriesContext(connection) as small_queries:
+            transition(Event.objects.filter(id__in=[e.id for e in small]), 'rejected')
+        large = self.create_events(['pending'] * 40)
+        with CaptureQueriesContext(connection) as large_queries:
+            transition(Event.objects.filter(id__in=[e.id for e in large]), 'rejected')
+
+        self.assertEqual(received, [(2, 'rejected'), (40, 'rejected')])
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_admin_change_form_uses_transitions(self):
+        """Test status edits in the admin go through the lifecycle rules"""
+        self.client.force_login(self.admin_user)
+        event = self.create_events(['pending'])[0]
+        url = reverse('admin:bookings_event_change', args=[event.id])
+        local_start = timezone.localtime(event.start_datetime)
+        local_end = timezone.localtime(event.end_datetime)
+
+        def post(new_status):
+            return self.client.post(url, {
+                'event_name': event.event_name,
+                'start_datetime_0': local_start.strftime('%Y-%m-%d'),
+                'start_datetime_1': local_start.strftime('%H:%M:%S'),
+                'end_datetime_0': local_end.strftime('%Y-%m-%d'),
+                'end_datetime_1': local_end.strftime('%H:%M:%S'),
+                'organizer_name': event.organizer_name,
+                'organizer_email': event.organizer_email,
+                'event_type': event.event_type,
+                'status': new_status,
+                'user': self.user.id,
+                'space': self.space.id,
+            })
+
+        post('completed')
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'pending')
+
+        with mock.patch('apps.bookings.tasks.schedule_event_transitions') as schedule, \
+                mock.patch('apps.notifications.tasks.send_queued_emails.delay'), \
+                self.captureOnCommitCallbacks(execute=True):
+            post('confirmed')
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'confirmed')
+        schedule.assert_called_once()
+        self.assertTrue(OutboxEmail.objects.filter(subject__startswith='Booking Approved').exists())
+
+    def test_cancelling_confirmed_events_revokes_transitions(self):
+        """Test cancelling confirmed events revokes their scheduled tasks after commit"""
+        events = self.create_events(['confirmed', 'confirmed', 'pending'])
+
+        with mock.patch('apps.bookings.signals.revoke_event_transitions') as revoke, \
+                self.captureOnCommitCallbacks(execute=True):
+            transition(Event.objects.all(), 'cancelled')
+
+        self.assertEqual(
+            sorted(call.args[0] for call in revoke.call_args_list),
+            [events[0].id, events[1].id]
+        )
+
+
+class EventSaveTestCase(BookingTestMixin, TestCase):
+
+    def load_event(self, start, event_status='confirmed'):
+        event = self.create_event(start, start + timedelta(hours=1), event_status)
+        return Event.objects.get(pk=event.pk)
+
+    def test_status_save_skips_time_validation(self):
+        """Test a status-only save of a started event is one UPDATE and no validation"""
+        event = self.load_event(self.now - timedelta(hours=2))
+        event.status = 'completed'
+
+        with self.assertNumQueries(1):
+            event.save(update_fields=['status'])
+
+        event.event_name = 'Renamed'
+        event.save()
+        self.assertEqual(event.changed_fields(), set())
+
+    def test_changed_times_are_validated(self):
+        """Test moving an event into the past is still rejected"""
+        event = self.load_event(self.start)
+        event.start_datetime = self.now - timedelta(hours=1)
+
+        self.assertEqual(event.changed_fields(), {'start_datetime'})
+        with self.assertRaises(ValidationError):
+            event.save()
+
+    def test_admin_status_only_save_costs_one_update(self):
+        """Test a status-only edit in the admin issues a single UPDATE on the event"""
+        event = self.load_event(self.start)
+        self.client.force_login(self.admin_user)
+        local_start = timezone.localtime(event.start_datetime)
+        local_end = timezone.localtime(event.end_datetime)
+        data = {
+            'event_name': event.event_name,
+            'start_datetime_0': local_start.strftime('%Y-%m-%d'),
+            'start_datetime_1': local_start.strftime('%H:%M:%S.%f'),
+            'end_datetime_0': local_end.strftime('%Y-%m-%d'),
+            'end_datetime_1': local_end.strftime('%H:%M:%S.%f'),
+            'organizer_name': event.organizer_name,
+            'organizer_email': event.organizer_email,
+            'event_type': event.event_type,
+            'status': 'cancelled',
+            'user': self.user.id,
+            'space': self.space.id,
+        }
+        table = Event._meta.db_table
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('admin:bookings_event_change', args=[event.id]), data)
+
+        updates = [q['sql'] for q in queries if q['sql'].startswith(f'UPDATE "{table}"')]
+        fetches = [
+            q['sql'] for q in queries
+            if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql']
+        ]
+        self.assertEqual(len(updates), 1)
+        # The change view's own fetch, the transition's row lock and the
+        # occupancy rebuild of the day the cancelled event leaves
+        self.assertEqual(len(fetches), 3)
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'cancelled')
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_status_change_lost_to_race_notifies_nobody(self):
+        """Test no approval or rejection email is sent when the transition did not apply"""
+        event = self.load_event(self.start, 'pending')
+        self.client.force_login(self.admin_user)
+        local_start = timezone.localtime(event.start_datetime)
+        local_end = timezone.localtime(event.end_datetime)
+        data = {
+            'event_name': event.event_name,
+            'start_datetime_0': local_start.strftime('%Y-%m-%d'),
+            'start_datetime_1': local_start.strftime('%H:%M:%S.%f'),
+            'end_datetime_0': local_end.strftime('%Y-%m-%d'),
+            'end_datetime_1': local_end.strftime('%H:%M:%S.%f'),
+            'organizer_name': event.organizer_name,
+            'organizer_email': event.organizer_email,
+            'event_type': event.event_type,
+            'user': self.user.id,
+            'space': self.space.id,
+        }
+
+        for new_status in ('confirmed', 'rejected'):
+            # transition() finds the row already moved on by someone else
+            with mock.patch('apps.bookings.admin.transition', return_value=[]), \
+                    mock.patch('apps.bookings.admin.send_booking_approved_notification') as approved, \
+                    mock.patch('apps.bookings.admin.send_booking_rejected_notification') as rejected:
+                response = self.client.post(
+                    reverse('admin:bookings_event_change', args=[event.id]), dict(data, status=new_status), follow=True
+                )
+            approved.assert_not_called()
+            rejected.assert_not_called()
+            self.assertContains(response, 'no notification was sent')
+
+    def test_stale_save_raises(self):
+        """Test saving a copy read before another save raises StaleVersion and writes nothing"""
+        event = self.load_event(self.start)
+        stale = Event.objects.get(pk=event.pk)
+        event.event_name = 'First'
+        event.save()
+        self.assertEqual(event.version, 2)
+
+        stale.event_name = 'Second'
+        with self.assertRaises(StaleVersion), transaction.atomic():
+            stale.save()
+
+        # Only the savepoint around the save is rolled back
+        self.assertFalse(transaction.get_rollback())
+        event.refresh_from_db()
+        self.assertEqual(event.event_name, 'First')
+        self.assertEqual(event.version, 2)
+
+    def test_stale_save_marks_enclosing_block(self):
+        """Test a stale save without its own savepoint leaves the enclosing block for rollback"""
+        event = self.load_event(self.start)
+        stale = Event.objects.get(pk=event.pk)
+        event.save()
+
+        with transaction.atomic():
+            with self.assertRaises(StaleVersion):
+                stale.save()
+            self.assertTrue(transaction.get_rollback())
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_refuses_stale_form(self):
+        """Test an admin form rendered from an old version does not overwrite a newer edit"""
+        event = self.load_event(self.start)
+        Event.objects.filter(pk=event.pk).update(event_name='Edited elsewhere', version=2)
+        self.client.force_login(self.admin_user)
+        local_start = timezone.localtime(event.start_datetime)
+        local_end = timezone.localtime(event.end_datetime)
+        data = {
+            'event_name': 'Stale edit',
+            'start_datetime_0': local_start.strftime('%Y-%m-%d'),
+            'start_datetime_1': local_start.strftime('%H:%M:%S.%f'),
+            'end_datetime_0': local_end.strftime('%Y-%m-%d'),
+            'end_datetime_1': local_end.strftime('%H:%M:%S.%f'),
+            'organizer_name': event.organizer_name,
+            'organizer_email': event.organizer_email,
+            'event_type': event.event_type,
+            'status': event.status,
+            'user': self.user.id,
+            'space': self.space.id,
+            'loaded_version': 1,
+        }
+
+        response = self.client.post(reverse('admin:bookings_event_change', args=[event.id]), data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'changed by someone else')
+        event.refresh_from_db()
+        self.assertEqual(event.event_name, 'Edited elsewhere')
+
+
+class SpaceIntervalIndexTestCase(BookingTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.spaces = [cls.space] + [
+            Space.objects.create(
+                name=f"Room {i}",
+                location="Building A",
+                capacity=20,
+                price_per_hour='50.00'
+            )
+            for i in range(1, 3)
+        ]
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.cache = SpaceIntervalCache()
+
+    @contextmanager
+    def live(self):
+        """As in a process subscribed to invalidations, outside any transaction"""
+        with override_settings(INTERVAL_INDEX_REDIS_URL='redis://localhost:6379/1'), \
+                mock.patch.object(self.cache, '_listener', mock.Mock()), \
+                mock.patch.object(self.cache, '_subscribed') as subscribed, \
+                mock.patch('apps.bookings.space_index.connection') as index_connection:
+            subscribed.is_set.return_value = True
+            index_connection.in_atomic_block = False
+            yield
+
+    def test_overlap_queries(self):
+        """Test lookups handle containment, back-to-back and inactive events, live or not"""
+        space = self.spaces[0]
+        self.create_event(*self.hours(0, 10), space=space)
+        self.create_event(*self.hours(2, 3), 'pending', space)
+        self.create_event(*self.hours(12, 13), space=space)
+        self.create_event(*self.hours(20, 21), 'cancelled', space)
+
+        for mode in (nullcontext, self.live):
+            with mode():
+                self.assertIsNotNone(self.cache.find_overlap(space.id, *self.hours(8, 11)))
+                self.assertIsNone(self.cache.find_overlap(space.id, *self.hours(10, 12)))
+                self.assertIsNone(self.cache.find_overlap(space.id, *self.hours(20, 21)))
+                self.assertEqual(self.cache.between(space.id, *self.hours(9, 12.5)), [
+                    self.hours(0, 10), self.hours(12, 13)
+                ])
+
+    def test_not_live_without_channel_or_in_transaction(self):
+        """Test nothing is cached without an invalidation channel or inside a transaction"""
+        self.assertFalse(self.cache.is_live())
+        with override_settings(INTERVAL_INDEX_REDIS_URL='redis://localhost:6379/1'), \
+                mock.patch.object(self.cache, '_listener', mock.Mock()), \
+                mock.patch.object(self.cache, '_subscribed') as subscribed:
+            subscribed.is_set.return_value = True
+            # Every test runs inside TestCase's transaction
+            self.assertFalse(self.cache.is_live())
+            with self.assertNumQueries(2):
+                self.cache.get(self.spaces[0].id)
+                self.cache.get(self.spaces[0].id)
+        with self.live():
+            self.assertTrue(self.cache.is_live())
+
+    def test_lookups_match_a_linear_scan(self):
+        """Test bisected lookups over overlapping, incrementally added intervals agree with a full scan"""
+        rng = random.Random(7)
+        index, intervals = IntervalIndex(), []
+        for item in range(300):
+            start = rng.randrange(0, 2000)
+            interval = self.hours(start / 10, (start + rng.randrange(1, 60)) / 10)
+            index.add(self.spaces[0].id, *interval, item)
+            intervals.append(interval)
+
+            start = rng.randrange(0, 2000)
+            query = self.hours(start / 10, (start + rng.randrange(1, 30)) / 10)
+            found = index.find_overlap(self.spaces[0].id, *query)
+            overlapping = [i for i, (other_start, other_end) in enumerate(intervals)
+                           if other_start < query[1] and other_end > query[0]]
+            if overlapping:
+                self.assertIn(found, overlapping)
+            else:
+                self.assertIsNone(found)
+        self.assertIsNone(index.find_overlap(self.spaces[1].id, *self.hours(0, 200)))
+
+    def test_answers_without_sql_once_loaded(self):
+        """Test cold spaces load in one query and warm lookups issue none"""
+        self.create_event(*self.hours(0, 2), space=self.spaces[1])
+
+        with self.live():
+            with self.assertNumQueries(1):
+                self.cache.get_many([space.id for space in self.spaces])
+            with self.assertNumQueries(0):
+                self.assertIsNotNone(self.cache.find_overlap(self.spaces[1].id, *self.hours(1, 3)))
+                self.assertIsNone(self.cache.find_overlap(self.spaces[0].id, *self.hours(1, 3)))
+
+    @override_settings(INTERVAL_INDEX_MAX_SPACES=2)
+    def test_least_recently_used_spaces_are_evicted(self):
+        """Test the index holds at most INTERVAL_INDEX_MAX_SPACES spaces"""
+        with self.live():
+            for space in self.spaces:
+                self.cache.get(space.id)
+            with self.assertNumQueries(0):
+                self.cache.get(self.spaces[2].id)
+            with self.assertNumQueries(1):
+                self.cache.get(self.spaces[0].id)
+
+    @override_settings(INTERVAL_INDEX_REDIS_URL='redis://localhost:6379/1')
+    def test_invalidation_is_published(self):
+        """Test invalidations are broadcast and nothing is cached until subscribed"""
+        with mock.patch('apps.bookings.space_index.threading.Thread'), \
+                mock.patch('apps.bookings.space_index.redis.Redis.from_url') as from_url:
+            with self.assertNumQueries(2):
+                self.cache.get(self.spaces[0].id)
+                self.cache.get(self.spaces[0].id)
+
+            self.cache.invalidate([self.spaces[1].id, self.spaces[0].id])
+
+        from_url.return_value.publish.assert_called_once_with(
+            'bookings:interval-index', json.dumps(sorted([self.spaces[0].id, self.spaces[1].id]))
+        )
+
+    @override_settings(INTERVAL_INDEX_REDIS_URL='redis://localhost:6379/1')
+    def test_range_queries_until_subscribed(self):
+        """Test lookups fall back to one range query each, without loading whole spaces"""
+        space = self.spaces[0]
+        self.create_event(*self.hours(0, 10), space=space)
+        self.create_event(*self.hours(12, 13), space=space)
+        with mock.patch('apps.bookings.space_index.threading.Thread'), \
+                mock.patch.object(self.cache, '_load') as load:
+            self.assertFalse(self.cache.is_live())
+            with self.assertNumQueries(2):
+                self.assertIsNotNone(self.cache.find_overlap(space.id, *self.hours(8, 11)))
+                self.assertEqual(self.cache.between(space.id, *self.hours(9, 12.5)), [
+                    self.hours(0, 10), self.hours(12, 13)
+                ])
+        load.assert_not_called()
+
+
+class OccupancyCalendarTestCase(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.spaces = [cls.space, Space.objects.create(
+            name="Test Hall",
+            location="Building B",
+            capacity=200,
+            price_per_hour='100.00'
+        )]
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.day = date(2030, 1, 7)
+        self.url = reverse('occupancy-calendar')
+
+    def bitmap(self, space, day=None):
+        return occupancy_grid([space.id], day or self.day, 1)[space.id][0]
+
+    def test_event_masks(self):
+        """Test partly covered slots count and events are split at local midnight"""
+        self.assertEqual(event_masks(self.at(9, 10), self.at(10)), {self.day: slot_mask(36, 40)})
+        self.assertEqual(event_masks(self.at(23, 30), self.at(0, 15, days=1)), {
+            self.day: slot_mask(94, 96),
+            self.day + timedelta(days=1): slot_mask(0, 1),
+        })
+
+    def test_bitmaps_follow_status_changes(self):
+        """Test confirming sets slots and cancelling clears only the slots no other event holds"""
+        first = self.book(self.at(9), self.at(10, 5))
+        second = self.book(self.at(10, 5), self.at(11))
+        self.assertFalse(SpaceOccupancy.objects.exists())
+
+        transition(Event.objects.filter(id__in=[first.id, second.id]), 'confirmed')
+        self.assertEqual(self.bitmap(self.spaces[0]), slot_mask(36, 44))
+
+        transition(Event.objects.filter(id=first.id), 'cancelled')
+        self.assertEqual(self.bitmap(self.spaces[0]), slot_mask(40, 44))
+
+        transition(Event.objects.filter(id=second.id), 'completed')
+        self.assertEqual(self.bitmap(self.spaces[0]), slot_mask(40, 44))
+
+        second.refresh_from_db()
+        second.delete()
+        self.assertFalse(SpaceOccupancy.objects.exists())
+
+    def test_bitmaps_follow_moved_events(self):
+        """Test saving a confirmed event in another space or time redraws both days"""
+        event = self.book(self.at(9), self.at(10), 'confirmed')
+        event.space = self.spaces[1]
+        event.start_datetime, event.end_datetime = self.at(9, days=1), self.at(10, days=1)
+        event.save()
+
+        self.assertEqual(self.bitmap(self.spaces[0]), 0)
+        self.assertEqual(self.bitmap(self.spaces[1], self.day + timedelta(days=1)), slot_mask(36, 40))
+
+    def test_calendar_grid(self):
+        """Test the calendar returns every space and day from one bitmap query"""
+        self.book(self.at(12), self.at(18), 'confirmed', space=self.spaces[1])
+        self.client.force_authenticate(user=self.admin_user)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'from': '2030-01-06', 'days': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['slot_minutes'], 15)
+        room = response.data['results'][1]
+        self.assertEqual(room['space'], self.spaces[1].id)
+        self.assertEqual([cell['occupied_slots'] for cell in room['days']], [0, 24, 0])
+        self.assertEqual(room['days'][1]['occupancy'], 0.25)
+        self.assertEqual(room['days'][1]['slots'], slot_mask(48, 72).to_bytes(12, 'little').hex())
+
+        response = self.client.get(self.url, {'spaces': str(self.spaces[0].id), 'days': 40})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'spaces': str(self.spaces[0].id), 'from': '2030-02-30'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_calendar_requires_admin(self):
+        """Test regular users cannot read the calendar"""
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_rebuild_command(self):
+        """Test rebuild_occupancy draws events that bypassed the signals and clears stale days"""
+        self.create_event(self.at(8), self.at(9))
+        SpaceOccupancy.objects.create(space=self.spaces[1], day=self.day, slots=bytes([255] * 12))
+
+        call_command('rebuild_occupancy', stdout=mock.MagicMock())
+
+        self.assertEqual(self.bitmap(self.spaces[0]), slot_mask(32, 36))
+        self.assertFalse(SpaceOccupancy.objects.filter(space=self.spaces[1]).exists())
+
+
+class EventDetailViewTestCase(BookingTestMixin, APITestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.event = self.book(*self.hours(0, 1))
+        self.url = reverse('event-detail', args=[self.event.id])
+        self.client.force_authenticate(user=self.user)
+
+    def test_get_returns_version_etag(self):
+        """Test reading an event exposes its version as the ETag"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"1"')
+        self.assertEqual(response.data['version'], 1)
+
+    def test_patch_with_current_etag(self):
+        """Test an update naming the current version succeeds and returns the next ETag"""
+        response = self.client.patch(
+            self.url, {'event_name': 'Planning'}, format='json', HTTP_IF_MATCH='"1"'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"2"')
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.event_name, 'Planning')
+        self.assertEqual(self.event.version, 2)
+
+    def test_patch_with_stale_etag(self):
+        """Test an update naming an old version gets 412 and changes nothing"""
+        transition(Event.objects.filter(id=self.event.id), 'cancelled')
+
+        response = self.client.patch(
+            self.url, {'event_name': 'Planning'}, format='json', HTTP_IF_MATCH='"1"'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response['ETag'], '"2"')
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.event_name, 'Team Meeting')
+
+    def test_patch_lost_race(self):
+        """Test a write that loses the race after the If-Match check gets 412"""
+        def check_then_other_writer(request, event):
+            error = check_if_match(request, event)
+            Event.objects.filter(id=event.id).update(version=F('version') + 1)
+            return error
+
+        with mock.patch('apps.bookings.views.check_if_match', check_then_other_writer):
+            response = self.client.patch(
+                self.url, {'event_name': 'Planning'}, format='json', HTTP_IF_MATCH='"1"'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response['ETag'], '"2"')
+
+    def test_other_users_event(self):
+        """Test another user's event is not found"""
+        self.client.force_authenticate(user=self.other)
+
+        response = self.client.patch(self.url, {'event_name': 'Planning'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class WaitlistTestCase(BookingTestMixin, APITestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.booked = self.create_event(*self.hours(0, 4))
+        self.client.force_authenticate(user=self.user)
+
+    def wait(self, name, start_hour, end_hour):
+        start, end = self.hours(start_hour, end_hour)
+        return WaitlistEntry.objects.create(
+            event_name=name,
+            start_datetime=start,
+            end_datetime=end,
+            organizer_name='Test Organizer',
+            organizer_email='organizer@example.com',
+            user=self.user,
+            space=self.space
+        )
+
+    def test_join_waitlist(self):
+        """Test a taken slot can be waited for and a free one must be booked"""
+        start, end = self.hours(1, 2)
+        data = self.booking_data(start, end, 'Planning')
+        response = self.client.post(reverse('waitlist'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['data']['status'], 'waiting')
+
+        start, end = self.hours(5, 6)
+        data.update(start_datetime=start.isoformat(), end_datetime=end.isoformat())
+        response = self.client.post(reverse('waitlist'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('waitlist'))
+        self.assertEqual(len(response.data), 1)
+
+    def test_cancellation_promotes_earliest_fitting_entries(self):
+        """Test a cancellation promotes the earliest entries that fit, first come first served"""
+        self.create_event(*self.hours(3, 5))
+        first = self.wait('First', 0, 2)
+        clashes_with_first = self.wait('Clashes with first', 1, 2)
+        still_taken = self.wait('Still taken', 3, 4)
+        second = self.wait('Second', 2, 3)
+        elsewhere = self.wait('Outside the freed range', 6, 7)
+
+        transition(Event.objects.filter(id=self.booked.id), 'cancelled')
+
+        promoted = WaitlistEntry.objects.filter(status='promoted')
+        self.assertEqual({entry.id for entry in promoted}, {first.id, second.id})
+        for entry in promoted:
+            self.assertEqual(entry.event.status, 'pending')
+            self.assertEqual(entry.event.start_datetime, entry.start_datetime)
+        self.assertEqual(
+            set(WaitlistEntry.objects.filter(status='waiting').values_list('id', flat=True)),
+            {clashes_with_first.id, still_taken.id, elsewhere.id}
+        )
+        self.assertEqual(OutboxEmail.objects.filter(subject__startswith='Waitlist Slot Available').count(), 2)
+
+    def test_promotion_queries_do_not_grow_with_waitlist(self):
+        """Test promotion costs the same queries for a short and a long waitlist"""
+        def run(count):
+            for i in range(count):
+                self.wait(f'Entry {i}', 0, 1)
+            with CaptureQueriesContext(connection) as queries:
+                promote_waitlist([self.booked])
+            Event.objects.exclude(id=self.booked.id).delete()
+            WaitlistEntry.objects.all().delete()
+            return len(queries)
+
+        Event.objects.filter(id=self.booked.id).update(status='cancelled')
+        self.assertEqual(run(2), run(20))
+
+    def test_withdraw(self):
+        """Test withdrawn entries are no longer promoted"""
+        entry = self.wait('Planning', 1, 2)
+
+        response = self.client.delete(reverse('waitlist-entry', args=[entry.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.delete(reverse('waitlist-entry', args=[entry.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        transition(Event.objects.filter(id=self.booked.id), 'cancelled')
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'withdrawn')
+        self.assertIsNone(entry.event)
+
+
+class EventArchiveTestCase(BookingTestMixin, APITestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        settings_override = override_settings(EVENT_ARCHIVE_DIR=self.archive_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        # Old enough to archive; the mixin helpers book from self.start
+        self.old = self.start = self.now - timedelta(days=400)
+        self.cutoff = self.now - timedelta(days=365)
+
+    def test_archive_moves_old_closed_events(self):
+        """Test old completed and cancelled events are written to a file, then deleted"""
+        completed, cancelled, rejected = self.create_events(['completed', 'cancelled', 'rejected'])
+        recent, = self.create_events(['completed'], start=timezone.now() - timedelta(days=10))
+        entry = WaitlistEntry.objects.create(
+            event_name='Waiting', start_datetime=completed.start_datetime,
+            end_datetime=completed.end_datetime, organizer_name='Admin User',
+            organizer_email='admin@example.com', user=self.admin_user, space=self.space,
+            status='promoted', event=cancelled
+        )
+        refresh_occupancy(event_days(self.space.id, completed.start_datetime, completed.end_datetime))
+
+        paths, archived = archive_events(self.cutoff)
+
+        self.assertEqual(archived, 2)
+        self.assertEqual(len(paths), 1)
+        with gzip.open(paths[0], 'rt') as archived_file:
+            records = [json.loads(line) for line in archived_file]
+        self.assertEqual([record['id'] for record in records], [completed.id, cancelled.id])
+        self.assertEqual(records[0]['space_id'], self.space.id)
+        self.assertEqual(
+            set(Event.objects.values_list('id', flat=True)), {rejected.id, recent.id}
+        )
+        self.assertFalse(SpaceOccupancy.objects.filter(space=self.space).exists())
+        entry.refresh_from_db()
+        self.assertIsNone(entry.event_id)
+
+    def test_files_split_and_read_back_once(self):
+        """Test large runs are split into files and a re-archived id is read once"""
+        events = self.create_events(['completed'] * 5)
+
+        paths, archived = archive_events(self.cutoff, batch_size=2, rows_per_file=3)
+        self.assertEqual((len(paths), archived), (2, 5))
+        # As if a run had died between writing a file and deleting its rows
+        shutil.copy(paths[0], paths[0].replace(paths[0].rsplit('-', 1)[1], 'abc123.ndjson.gz'))
+
+        records = list(read_archive(self.old - timedelta(days=1), self.cutoff))
+
+        self.assertEqual(sorted(record['id'] for record in records), [event.id for event in events])
+
+    def test_archive_endpoint(self):
+        """Test admins can page through the archive for a range of days"""
+        self.create_events(['completed', 'cancelled', 'completed'])
+        archive_events(self.cutoff)
+        self.client.force_authenticate(user=self.admin_user)
+        day = timezone.localdate(self.old)
+        url = reverse('event-archive')
+
+        response = self.client.get(url, {'from': day, 'to': day + timedelta(days=1), 'limit': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(url, {'from': day, 'to': day + timedelta(days=1), 'status': 'completed'})
+        self.assertEqual([record['status'] for record in response.data['results']], ['completed', 'completed'])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(url, {'from': day - timedelta(days=30), 'to': day - timedelta(days=1)})
+        self.assertEqual(response.data['results'], [])
+
+    def test_archive_endpoint_uses_local_days(self):
+        """Test the archive endpoint's days run from local midnight, like the other reports"""
+        day = timezone.localdate(self.old)
+        # 00:30 local time falls on the previous day in UTC
+        early, = self.create_events(['completed'], start=day_bounds(day)[0] + timedelta(minutes=30))
+        archive_events(self.cutoff)
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse('event-archive')
+
+        response = self.client.get(url, {'from': day, 'to': day})
+        self.assertEqual([record['id'] for record in response.data['results']], [early.id])
+
+        response = self.client.get(url, {'from': day - timedelta(days=1), 'to': day - timedelta(days=1)})
+        self.assertEqual(response.data['results'], [])
+
+    def test_archive_endpoint_validation(self):
+        """Test the archive endpoint needs an admin and a valid range"""
+        url = reverse('event-archive')
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(url, {'from': '2025-02-01', 'to': '2025-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_management_command(self):
+        """Test the archive_events command honours --days"""
+        self.create_events(['completed'])
+
+        call_command('archive_events', days=500, stdout=StringIO())
+        self.assertEqual(Event.objects.count(), 1)
+
+        call_command('archive_events', stdout=StringIO())
+        self.assertEqual(Event.objects.count(), 0)
+
+
+class SpaceUsageTestCase(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.spaces = [cls.space, Space.objects.create(
+            name="Test Hall",
+            location="Building B",
+            capacity=200,
+            price_per_hour='100.00'
+        )]
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.day = date(2030, 1, 7)
+        self.url = reverse('space-usage-report')
+
+    def usage(self):
+        rows = SpaceUsage.objects.filter(space=self.spaces[0]).values_list('day', 'booked_seconds', 'revenue')
+        return {day: seconds for day, seconds, _ in rows}, {day: revenue for day, _, revenue in rows}
+
+    def test_usage_follows_status_changes(self):
+        """Test confirming adds booked time and revenue per local day and cancelling takes it away"""
+        morning = self.book(self.at(9), self.at(10, 30))
+        night = self.book(self.at(23), self.at(1, days=1))
+        self.assertFalse(SpaceUsage.objects.exists())
+
+        transition(Event.objects.filter(id__in=[morning.id, night.id]), 'confirmed')
+        next_day = self.day + timedelta(days=1)
+        self.assertEqual(self.usage(), (
+            {self.day: 9000, next_day: 3600},
+            {self.day: Decimal('250.00'), next_day: Decimal('100.00')},
+        ))
+
+        transition(Event.objects.filter(id=morning.id), 'completed')
+        transition(Event.objects.filter(id=night.id), 'cancelled')
+        self.assertEqual(self.usage(), ({self.day: 5400}, {self.day: Decimal('150.00')}))
+
+    def test_archiving_keeps_usage(self):
+        """Test archived events leave their rollups behind"""
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir)
+        day = timezone.localdate() - timedelta(days=400)
+        self.create_event(self.at(9, day=day), self.at(11, day=day), 'completed')
+        refresh_occupancy(event_days(self.spaces[0].id, self.at(9, day=day), self.at(11, day=day)))
+
+        with override_settings(EVENT_ARCHIVE_DIR=archive_dir):
+            archive_events(timezone.now() - timedelta(days=365))
+
+        self.assertFalse(Event.objects.exists())
+        self.assertFalse(SpaceOccupancy.objects.exists())
+        self.assertEqual(self.usage(), ({day: 7200}, {day: Decimal('200.00')}))
+
+    def test_reconcile_repairs_drift(self):
+        """Test the nightly task rewrites wrong and stale rollups inside its window only"""
+        today = timezone.localdate()
+        self.create_event(self.at(10, day=today + timedelta(days=2)), self.at(12, day=today + timedelta(days=2)))
+        old = today - timedelta(days=100)
+        SpaceUsage.objects.bulk_create([
+            SpaceUsage(space=self.spaces[0], day=today + timedelta(days=3), booked_seconds=60, revenue='1.00'),
+            SpaceUsage(space=self.spaces[0], day=old, booked_seconds=60, revenue='1.00'),
+        ])
+
+        reconcile_space_usage()
+
+        self.assertEqual(self.usage(), (
+            {today + timedelta(days=2): 7200, old: 60},
+            {today + timedelta(days=2): Decimal('200.00'), old: Decimal('1.00')},
+        ))
+        self.assertTrue(SpaceOccupancy.objects.filter(day=today + timedelta(days=2)).exists())
+
+    @override_settings(SPACE_OPEN_HOURS_PER_DAY=12)
+    def test_report_groups_rollups(self):
+        """Test the report sums daily rollups into weeks or months clipped to the range"""
+        SpaceUsage.objects.bulk_create([
+            SpaceUsage(space=self.spaces[0], day=date(2030, 1, 30), booked_seconds=7200, revenue='100.00'),
+            SpaceUsage(space=self.spaces[0], day=date(2030, 2, 1), booked_seconds=3600, revenue='50.00'),
+            SpaceUsage(space=self.spaces[0], day=date(2030, 2, 4), booked_seconds=3600, revenue='50.00'),
+        ])
+        self.client.force_authenticate(user=self.admin_user)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'from': '2030-01-28', 'to': '2030-02-10'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['period'], 'month')
+        room, empty = response.data['results']
+        self.assertEqual(room['periods'], [
+            {'start': date(2030, 1, 1), 'booked_hours': 2.0, 'open_hours': 48,
+             'utilization': 0.0417, 'revenue': '100.00'},
+            {'start': date(2030, 2, 1), 'booked_hours': 2.0, 'open_hours': 120,
+             'utilization': 0.0167, 'revenue': '100.00'},
+        ])
+        self.assertEqual([cell['revenue'] for cell in empty['periods']], ['0.00', '0.00'])
+
+        response = self.client.get(self.url, {
+            'period': 'week', 'from': '2030-01-28', 'to': '2030-02-10', 'spaces': str(self.spaces[0].id)
+        })
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(
+            [(cell['start'], cell['booked_hours'], cell['revenue']) for cell in response.data['results'][0]['periods']],
+            [(date(2030, 1, 28), 3.0, '150.00'), (date(2030, 2, 4), 1.0, '50.00')]
+        )
+
+    def test_report_validation(self):
+        """Test the report is admin only and rejects bad parameters"""
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin_user)
+        for params in (
+            {'period': 'year'},
+            {'from': '2030-02-01', 'to': '2030-01-01'},
+            {'from': '2028-01-01', 'to': '2030-01-01'},
+            {'from': '2030-02-30'},
+            {'spaces': 'a,b'},
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class EventPartitionHelpersTestCase(TestCase):
+
+    def test_month_arithmetic(self):
+        """Test months are taken in UTC and roll over year ends"""
+        local = datetime(2027, 1, 1, 1, 30, tzinfo=timezone.get_fixed_timezone(180))
+        month = partitions.month_start(local)
+
+        self.assertEqual(month, datetime(2026, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.add_months(month, 1), datetime(2027, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.add_months(month, -12), datetime(2025, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.partition_name(month), 'bookings_event_closed_2026_12')
+
+    @skipUnless(connection.vendor != 'postgresql', 'Events are partitioned on PostgreSQL')
+    def test_task_skips_unpartitioned_database(self):
+        """Test the beat job does nothing where events are not partitioned"""
+        self.assertEqual(manage_event_partitions(), 'Events are not partitioned; nothing to do')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Table partitioning requires PostgreSQL')
+class EventPartitionManagementTestCase(BookingTestMixin, TestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.month = partitions.add_months(partitions.month_start(timezone.now()), -6)
+
+    def partition_of(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM bookings_event WHERE id = %s', [event.id])
+            return cursor.fetchone()[0]
+
+    def test_history_moved_out_of_default_partition(self):
+        """Test closed events are split into their month's partition, active ones stay put"""
+        start = self.month + timedelta(days=3, hours=10)
+        completed, pending = self.create_events(['completed', 'pending'], start)
+        self.assertEqual(self.partition_of(completed), partitions.DEFAULT_PARTITION)
+
+        created = partitions.ensure_partitions(months_ahead=1)
+
+        self.assertIn(partitions.partition_name(self.month), created)
+        self.assertEqual(self.partition_of(completed), partitions.partition_name(self.month))
+        self.assertEqual(self.partition_of(pending), 'bookings_event_active')
+        self.assertEqual(partitions.ensure_partitions(months_ahead=1), [])
+
+    def test_detach_old_partitions(self):
+        """Test partitions past the retention age leave the events table"""
+        partitions.create_month_partition(self.month)
+
+        detached = partitions.detach_old_partitions(after_months=3)
+
+        self.assertEqual(detached, [partitions.partition_name(self.month)])
+        self.assertNotIn(self.month, partitions.month_partitions())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Table partitioning requires PostgreSQL')
+class EventPartitionMigrationTestCase(TransactionTestCase):
+
+    def partitioned_tables(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT c.relname FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid
+                WHERE pg_table_is_visible(c.oid) ORDER BY c.relname
+            """)
+            return [row[0] for row in cursor.fetchall()]
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('bookings', target)])
+
+    def test_migration_reverses(self):
+        """Test the events table can be unpartitioned and partitioned again with its rows"""
+        user = User.objects.create_user(
+            email='organizer@example.com', first_name='Test', last_name='Organizer', password='testpass123'
+        )
+        space = Space.objects.create(
+            name="Test Conference Room", location="Building A, Floor 1", capacity=50, price_per_hour='100.00'
+        )
+        start = timezone.now() + timedelta(days=1)
+        event_ids = [event.id for event in Event.objects.bulk_create([
+            Event(
+                event_name=f'Event {i}', start_datetime=start + timedelta(hours=2 * i),
+                end_datetime=start + timedelta(hours=2 * i + 1), organizer_name='Test Organizer',
+                organizer_email='organizer@example.com', status=event_status, user=user, space=space
+            )
+            for i, event_status in enumerate(['pending', 'completed'])
+        ])]
+        latest = MigrationLoader(connection).graph.leaf_nodes('bookings')[0][1]
+
+        self.migrate('0007_event_version')
+        self.assertEqual(self.partitioned_tables(), [])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id FROM bookings_event ORDER BY id')
+            self.assertEqual([row[0] for row in cursor.fetchall()], event_ids)
+
+        self.migrate(latest)
+        self.assertEqual(self.partitioned_tables(), ['bookings_event', 'bookings_event_closed'])
+        self.assertEqual(list(Event.objects.order_by('id').values_list('id', flat=True)), event_ids)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Event.objects.bulk_create([Event(
+                event_name='Overlap', start_datetime=start, end_datetime=start + timedelta(hours=1),
+                organizer_name='Test Organizer', organizer_email='organizer@example.com',
+                status='confirmed', user=user, space=space
+            )])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Planner assertions target PostgreSQL')
+class EventIndexUsageTestCase(TestCase):
+    """
+    Seed a production-sized events table and check the hot queries are
+    planned as index scans rather than sequential scans.
+    """
+    SEED_ROWS = 1_000_000
+    SEED_SPACES = 1000
+    SEED_USERS = 100
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([
+            User(
+                email=f'user{i}@example.com',
+                first_name='Seed',
+                last_name=f'User{i}'
+            )
+            for i in range(cls.SEED_USERS)
+        ])
+        Space.objects.bulk_create([
+            Space(name=f'Space {i}', location='Seed', capacity=10, price_per_hour='10.00')
+            for i in range(cls.SEED_SPACES)
+        ])
+        cls.user = User.objects.order_by('id').first()
+        cls.space = Space.objects.order_by('id').first()
+        first_space_id = cls.space.id
+        first_user_id = cls.user.id
+
+        # One-hour events two hours apart per space, so active rows never
+        # trip the overlap constraint. Roughly the last 4% start in the future
+        # and 15% are pending/confirmed, the rest are historical.
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO bookings_event (
+                    event_name, start_datetime, end_datetime, organizer_name,
+                    organizer_email, event_type, attendance, created_at,
+                    updated_at, status, user_id, space_id
+                )
+                SELECT
+                    'Seed ' || g,
+                    slot,
+                    slot + interval '1 hour',
+                    'Seed Organizer',
+                    'seed@example.com',
+                    'meeting',
+                    10,
+                    now(),
+                    now(),
+                    CASE
+                        WHEN g %% 20 = 0 THEN 'pending'
+                        WHEN g %% 20 IN (1, 2) THEN 'confirmed'
+                        WHEN g %% 20 = 3 THEN 'cancelled'
+                        ELSE 'completed'
+                    END,
+                    %s + g %% %s,
+                    %s + g %% %s
+                FROM (
+                    SELECT g, now() - interval '80 days'
+                        + (g / %s) * interval '2 hours' AS slot
+                    FROM generate_series(0, %s - 1) AS g
+                ) AS seed
+            """, [
+                first_user_id, cls.SEED_USERS,
+                first_space_id, cls.SEED_SPACES,
+                cls.SEED_SPACES, cls.SEED_ROWS,
+            ])
+            cursor.execute('ANALYZE bookings_event')
+
+    def partition_indexes(self, index_names):
+        """The indexes PostgreSQL built on the partitions for index_names"""
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                WITH RECURSIVE tree(oid) AS (
+                    SELECT oid FROM pg_class WHERE relname = ANY(%s)
+                    UNION ALL
+                    SELECT i.inhrelid FROM pg_inherits i JOIN tree ON i.inhparent = tree.oid
+                )
+                SELECT relname FROM pg_class WHERE oid IN (SELECT oid FROM tree)
+            """, [list(index_names)])
+            return {row[0] for row in cursor.fetchall()}
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan on bookings_event', plan)
+        # On the partitioned table the plan names the partitions' indexes
+        index_names = self.partition_indexes(index_names) | set(index_names)
+        self.assertTrue(
+            any(name in plan for name in index_names),
+            f'Expected one of {sorted(index_names)} in plan:\n{plan}'
+        )
+
+    def test_active_queries_pruned_to_active_partition(self):
+        """Test conflict checks and the upcoming listing only read the active partition"""
+        start = timezone.now() + timedelta(days=1)
+        for queryset in (
+            Event.objects.overlapping(self.space, start, start + timedelta(hours=1)),
+            Event.objects.filter(status='confirmed', start_datetime__gt=timezone.now()),
+        ):
+            plan = queryset.explain()
+            self.assertIn('bookings_event_active', plan)
+            self.assertNotIn('bookings_event_closed', plan)
+
+    def test_conflict_check_uses_index(self):
+        """Test overlap checks use the partial range index"""
+        start = timezone.now() + timedelta(days=1)
+        queryset = Event.objects.overlapping(self.space, start, start + timedelta(hours=1))
+        # The exclusion constraint's GiST index is an equally good plan
+        self.assertUsesIndex(queryset, 'event_active_space_range_idx', 'bookings_event_no_overlap')
+
+    def test_upcoming_events_uses_index(self):
+        """Test the upcoming events listing uses (status, start_datetime)"""
+        queryset = Event.objects.filter(
+            status='confirmed',
+            start_datetime__gt=timezone.now()
+        ).order_by('start_datetime')
+        self.assertUsesIndex(queryset, 'event_status_start_idx')
+
+    def test_ended_events_uses_index(self):
+        """Test the completion sweep uses (status, end_datetime)"""
+        queryset = Event.objects.filter(
+            status='confirmed',
+            end_datetime__lt=timezone.now() - timedelta(days=60)
+        )
+        self.assertUsesIndex(queryset, 'event_status_end_idx')
+
+    def test_my_events_uses_index(self):
+        """Test the my-events listing uses (user, start_datetime)"""
+        queryset = Event.objects.filter(user=self.user).order_by('start_datetime')
+        self.assertUsesIndex(queryset, 'event_user_start_idx')
@@ -0,0 +1,103 @@
+from collections import namedtuple
+
+from django.db import OperationalError, transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Event
+
+# Every status change goes through transition(), so this table is the only
+# place the event lifecycle is defined.
+ALLOWED_TRANSITIONS = {
+    'pending': ('confirmed', 'cancelled', 'rejected'),
+    'confirmed': ('cancelled', 'completed'),
+    'cancelled': ('rejected',),
+    'completed': (),
+    'rejected': (),
+}
+
+# Sent once per transition() call with sender=Event, the new status and the
+# transitioned events as they were before the change
+status_changed = Signal()
+
+UPDATE_CHUNK_SIZE = 5000
+
+# On PostgreSQL closing an event moves its row to another partition of the
+# events table (see migration 0008_event_partitioning). A transaction that
+# was waiting to lock or update the row then fails with a serialization
+# failure instead of finding it changed, so transition() starts over, at
+# most this many times in all, and sees the row's new status.
+SERIALIZATION_ATTEMPTS = 3
+SERIALIZATION_FAILURE = '40001'
+
+TransitionedEvent = namedtuple(
+    'TransitionedEvent',
+    ['id', 'status', 'space_id', 'user_id', 'start_datetime', 'end_datetime']
+)
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def can_transition(from_status, to_status):
+    return to_status in ALLOWED_TRANSITIONS.get(from_status, ())
+
+
+def sources(to_status):
+    """Statuses an event may move to to_status from"""
+    return [status for status, targets in ALLOWED_TRANSITIONS.items() if to_status in targets]
+
+
+def transition(queryset, to_status, from_statuses=None, **updates):
+    """
+    Move every event in queryset whose status is one of from_statuses
+    (default: every status allowed to reach to_status) to to_status.
+
+    The matching rows are locked, then changed with one conditional
+    UPDATE ... WHERE status IN (from_statuses) (per 5000 rows), so a row
+    changed by someone else in the meantime is left alone. Serialization
+    failures are retried. Returns the transitioned events as they were
+    before the change.
+    """
+    if from_statuses is None:
+        from_statuses = sources(to_status)
+    elif isinstance(from_statuses, str):
+        from_statuses = [from_statuses]
+    invalid = [status for status in from_statuses if not can_transition(status, to_status)]
+    if invalid:
+        raise InvalidTransition(f"Events cannot move from {', '.join(invalid)} to {to_status}")
+
+    for attempt in range(1, SERIALIZATION_ATTEMPTS + 1):
+        try:
+            # A savepoint when called inside a transaction, so only this
+            # attempt is rolled back
+            with transaction.atomic():
+                return apply_transition(queryset, to_status, from_statuses, updates)
+        except OperationalError as error:
+            if not is_serialization_failure(error) or attempt == SERIALIZATION_ATTEMPTS:
+                raise
+
+
+def is_serialization_failure(error):
+    return getattr(error.__cause__, 'pgcode', None) == SERIALIZATION_FAILURE
+
+
+def apply_transition(queryset, to_status, from_statuses, updates):
+    rows = queryset.filter(
+        status__in=from_statuses
+    ).select_for_update().order_by('id').values_list(*TransitionedEvent._fields)
+    events = [TransitionedEvent(*row) for row in rows]
+    if not events:
+        return []
+    now = timezone.now()
+    ids = [event.id for event in events]
+    # Chunked only to stay under database parameter limits
+    for offset in range(0, len(ids), UPDATE_CHUNK_SIZE):
+        Event.objects.filter(
+            id__in=ids[offset:offset + UPDATE_CHUNK_SIZE],
+            status__in=from_statuses
+        ).update(status=to_status, updated_at=now, version=F('version') + 1, **updates)
+    status_changed.send(sender=Event, events=events, to_status=to_status)
+    return events
@@ -1,16 +1,36 @@
 from django.urls import path
 from .views import (
     BookEventView, 
+    BookEventBatchView,
+    BookingHoldView,
+    EventSeriesView,
+    EventSeriesDetailView,
     ListUpcomingEventsView, 
     ListMyEventsView, 
     ApproveEventView,
-    CheckEventStatusView
+    EventDetailView,
+    CheckEventStatusView,
+    OccupancyCalendarView,
+    EventArchiveView,
+    SpaceUsageReportView,
+    WaitlistView,
+    WaitlistEntryDetailView
 )
 
 urlpatterns = [
     path('book/', BookEventView.as_view(), name='book-event'),
+    path('hold/', BookingHoldView.as_view(), name='booking-hold'),
+    path('book/batch/', BookEventBatchView.as_view(), name='book-event-batch'),
+    path('series/', EventSeriesView.as_view(), name='event-series'),
+    path('series/<int:series_id>/', EventSeriesDetailView.as_view(), name='event-series-detail'),
+    path('waitlist/', WaitlistView.as_view(), name='waitlist'),
+    path('waitlist/<int:entry_id>/', WaitlistEntryDetailView.as_view(), name='waitlist-entry'),
     path('upcoming/', ListUpcomingEventsView.as_view(), name='upcoming-events'),
     path('my-events/', ListMyEventsView.as_view(), name='my-events'),
+    path('events/<int:event_id>/', EventDetailView.as_view(), name='event-detail'),
     path('approve/<int:event_id>/', ApproveEventView.as_view(), name='approve-event'),
     path('check-status/', CheckEventStatusView.as_view(), name='check-event-status'),
+    path('calendar/', OccupancyCalendarView.as_view(), name='occupancy-calendar'),
+    path('archive/', EventArchiveView.as_view(), name='event-archive'),
+    path('reports/usage/', SpaceUsageReportView.as_view(), name='space-usage-report'),
 ]
\ No newline at end of file
@@ -1,5 +1,12 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.shortcuts import render, get_object_or_404
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework.generics import CreateAPIView, ListAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -7,17 +14,35 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from django.db import transaction
-from django.core.mail import send_mail, EmailMultiAlternatives
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
 from django.template.loader import render_to_string
 from django.conf import settings
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.utils.urls import replace_query_param
 
-from .models import Event, Booking
-from .serializers import EventSerializer, EventListSerializer, BookingSerializer
-from .tasks import update_space_on_approval
+from .models import Event, EventSeries, Booking, SpaceUsage, WaitlistEntry, is_overlap_violation
+from .archive import ARCHIVE_STATUSES, read_archive
+from .availability import invalidate_availability_on_commit
+from .space_index import space_intervals
+from .idempotency import IDEMPOTENCY_KEY_PARAMETER, idempotent
+from .holds import HoldClaim, HoldsUnavailable, place_hold
+from .conflicts import load_active_intervals, load_space_intervals
+from .serializers import (
+    EventSerializer, EventListSerializer, BookingSerializer, BatchEventItemSerializer,
+    EventSeriesSerializer, EventSeriesUpdateSerializer, EventUpdateSerializer, WaitlistEntrySerializer,
+    BookingHoldSerializer
+)
+from .pagination import OccupancyCalendarPagination, SpaceUsageReportPagination, StartTimeCursorPagination
+from .occupancy import CENT, SECONDS_PER_HOUR, SLOT, SLOTS_PER_DAY, day_bounds, occupancy_grid, to_bytes
+from .transitions import transition
+from .tasks import reject_overlapping_pending
+from apps.core.versioning import StaleVersion, check_if_match, precondition_failed
 from apps.spaces.models import Space
+from apps.notifications.tasks import queue_email
+from apps.notifications.views import queue_booking_batch_notifications
 
 class BookEventView(CreateAPIView):
     """
@@ -30,6 +55,7 @@ class BookEventView(CreateAPIView):
     @swagger_auto_schema(
         operation_summary='Book a new event',
         operation_description='Create a new event booking and automatically update space status',
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             required=['event_name', 'start_datetime', 'end_datetime', 'organizer_name', 'organizer_email', 'event_type', 'space'],
@@ -60,11 +86,12 @@ class BookEventView(CreateAPIView):
             )
         }
     )
+    @idempotent
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         
         if serializer.is_valid():
-            with transaction.atomic():
+            with HoldClaim(request.user.id) as holds, transaction.atomic():
                 space = serializer.validated_data['space']
                 start_time = serializer.validated_data['start_datetime']
                 end_time = serializer.validated_data['end_datetime']
@@ -76,33 +103,48 @@ class BookEventView(CreateAPIView):
                         'error': f'Space "{space.name}" is currently {space.status}'
                     }, status=status.HTTP_409_CONFLICT)
                 
-                # Check for any conflicting bookings (both pending and confirmed events)
-                conflicting_events = Event.objects.filter(
-                    space=space,
-                    status__in=['pending', 'confirmed'],  # Check both pending and confirmed events
-                    start_datetime__lt=end_time,
-                    end_datetime__gt=start_time
-                )
-                
-                if conflicting_events.exists():
-                    # Get the conflicting event details
-                    conflict = conflicting_events.first()
+                # Answer obvious conflicts from the in-process interval index,
+                # or one indexed query while the index is not live
+                conflict_id = space_intervals.find_overlap(space.id, start_time, end_time)
+                if conflict_id is not None:
+                    conflict = Event.objects.active().filter(id=conflict_id).first()
+                    if conflict is not None:
+                        return self.conflict_response(conflict)
+                    # The index was stale; fall through to the database
+                    space_intervals.discard([space.id])
+
+                # On PostgreSQL the bookings_event_no_overlap exclusion constraint
+                # rejects overlapping pending/confirmed events, so we insert
+                # optimistically. SQLite has no such constraint: check first.
+                if connection.vendor != 'postgresql':
+                    conflict = Event.objects.overlapping(space, start_time, end_time).first()
+                    if conflict is not None:
+                        return self.conflict_response(conflict)
+
+                # Another user may be filling in the form for this slot. Our
+                # own hold is taken in the same step and put back if the
+                # booking does not commit.
+                hold = holds.take(space.id, [(start_time, end_time)]).get(0)
+                if hold is not None:
                     return Response({
-                        'message': 'Space already booked for this time',
-                        'details': {
-                            'booked_event': conflict.event_name,
-                            'from': conflict.start_datetime.strftime('%Y-%m-%d %H:%M'),
-                            'to': conflict.end_datetime.strftime('%Y-%m-%d %H:%M'),
-                            'status': conflict.status
-                        }
+                        'message': 'This time is being held by another user',
+                        'held_until': hold.expires_at
                     }, status=status.HTTP_409_CONFLICT)
                 
                 # Create the event with pending status (requires admin approval)
-                event = serializer.save(
-                    user=request.user,
-                    status='pending'  # Always start as pending
-                )
-                
+                try:
+                    with transaction.atomic():
+                        event = serializer.save(
+                            user=request.user,
+                            status='pending'  # Always start as pending
+                        )
+                except IntegrityError as exc:
+                    if not is_overlap_violation(exc):
+                        raise
+                    holds.restore()
+                    conflict = Event.objects.overlapping(space, start_time, end_time).first()
+                    return self.conflict_response(conflict)
+
                 # Space remains 'free' until event is approved by admin
                 # (No space status change here)
 
@@ -121,15 +163,14 @@ class BookEventView(CreateAPIView):
                 
                 # User email
                 user_email = request.user.email
-                user_name = request.user.get_full_name() if hasattr(request.user, 'get_full_name') and callable(request.user.get_full_name) else request.user.username
+                # User.get_full_name is a property on our custom user model
+                user_name = request.user.get_full_name or request.user.email
                 
                 # Organizer email (assuming space.organizer.email exists)
                 organizer_email = getattr(space.organizer, 'email', None)
                 
                 # Admin email (from settings)
                 admin_email = getattr(settings, 'ADMIN_EMAIL', None)
-
-                recipient_list = [email for email in [user_email, organizer_email, admin_email] if email]
                 
                 # HTML version for the user
                 context = {
@@ -142,27 +183,12 @@ class BookEventView(CreateAPIView):
                 }
                 html_message = render_to_string('emails/booking_submitted.html', context)
                 
-                # Send to user with HTML
-                if user_email:
-                    email_message = EmailMultiAlternatives(
-                        subject=subject,
-                        body=message,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        to=[user_email]
-                    )
-                    email_message.attach_alternative(html_message, "text/html")
-                    email_message.send(fail_silently=True)
+                # Written to the outbox in this transaction and delivered by
+                # Celery after commit, so SMTP latency never holds the booking
+                queue_email(subject, message, [user_email], html_body=html_message)
                 
                 # Send to others (organizer, admin) without HTML template
-                other_recipients = [email for email in [organizer_email, admin_email] if email]
-                if other_recipients:
-                    send_mail(
-                        subject,
-                        message,
-                        settings.DEFAULT_FROM_EMAIL,
-                        other_recipients,
-                        fail_silently=True
-                    )
+                queue_email(subject, message, [organizer_email, admin_email])
                 # --- End Email Notification ---
 
                 return Response({
@@ -178,11 +204,496 @@ class BookEventView(CreateAPIView):
             'errors': serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
+    def conflict_response(self, conflict):
+        """Build the 409 payload describing the event that holds the slot"""
+        response = {'message': 'Space already booked for this time'}
+        # The conflicting row may have been cancelled since the insert failed
+        if conflict is not None:
+            response['details'] = {
+                'booked_event': conflict.event_name,
+                'from': conflict.start_datetime.strftime('%Y-%m-%d %H:%M'),
+                'to': conflict.end_datetime.strftime('%Y-%m-%d %H:%M'),
+                'status': conflict.status
+            }
+        return Response(response, status=status.HTTP_409_CONFLICT)
+
+class BookingHoldView(APIView):
+    """
+    Hold a time slot while the booking form is filled in
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary='Hold a time slot',
+        operation_description=(
+            'Reserve a space and time range for a few minutes. Other users cannot book '
+            'an overlapping range until the hold expires or you book it.'
+        ),
+        request_body=BookingHoldSerializer,
+        responses={
+            201: openapi.Response(description='Slot held'),
+            400: openapi.Response(description='Bad request - validation errors'),
+            409: openapi.Response(description='Conflict - slot booked or held by another user'),
+            503: openapi.Response(description='Holds are unavailable')
+        }
+    )
+    def post(self, request):
+        serializer = BookingHoldSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'message': 'Failed to hold slot',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        space = serializer.validated_data['space']
+        start_time = serializer.validated_data['start_datetime']
+        end_time = serializer.validated_data['end_datetime']
+        if Event.objects.overlapping(space, start_time, end_time).exists():
+            return Response({
+                'message': 'Space already booked for this time'
+            }, status=status.HTTP_409_CONFLICT)
+
+        try:
+            hold, clash = place_hold(space.id, request.user.id, start_time, end_time)
+        except HoldsUnavailable as exc:
+            return Response({'message': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        if clash is not None:
+            return Response({
+                'message': 'This time is being held by another user',
+                'held_until': clash.expires_at
+            }, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'message': 'Slot held',
+            'hold_id': hold.id,
+            'space': space.id,
+            'start_datetime': start_time,
+            'end_datetime': end_time,
+            'expires_at': hold.expires_at
+        }, status=status.HTTP_201_CREATED)
+
+class BookEventBatchView(APIView):
+    """
+    Book several events, across one or more spaces, in one request
+    """
+    permission_classes = [IsAuthenticated]
+    max_batch_size = 50
+
+    @swagger_auto_schema(
+        operation_summary='Book a batch of events',
+        operation_description=(
+            'Validate and create up to 50 events in one transaction. Events that conflict '
+            'with existing bookings or with earlier events in the same batch are skipped and '
+            'reported per item. Each recipient gets a single digest email.'
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['events'],
+            properties={
+                'events': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_OBJECT, description='Same fields as /book/'),
+                    description='Events to book'
+                )
+            }
+        ),
+        responses={
+            201: openapi.Response(description='At least one event was booked; see per-item results'),
+            400: openapi.Response(description='Bad request - no event could be validated'),
+            409: openapi.Response(description='Conflict - every valid event conflicted')
+        }
+    )
+    def post(self, request, *args, **kwargs):
+        items = request.data.get('events') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({
+                'message': 'Failed to book events',
+                'errors': {'events': ['A non-empty list of events is required.']}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_batch_size:
+            return Response({
+                'message': 'Failed to book events',
+                'errors': {'events': [f'At most {self.max_batch_size} events can be booked at once.']}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # One query for every space referenced by the batch
+        space_ids = set()
+        for item in items:
+            try:
+                space_ids.add(int(item.get('space')))
+            except (AttributeError, TypeError, ValueError):
+                pass
+        spaces = Space.objects.select_related('organizer').in_bulk(space_ids)
+
+        results = [None] * len(items)
+        candidates = []
+        for index, item in enumerate(items):
+            serializer = BatchEventItemSerializer(data=item, context={'spaces': spaces})
+            if not serializer.is_valid():
+                results[index] = {'index': index, 'status': 'invalid', 'errors': serializer.errors}
+                continue
+            event = Event(user=request.user, status='pending', **serializer.validated_data)
+            try:
+                event.clean()
+            except DjangoValidationError as exc:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': exc.messages}
+                continue
+            if event.space.status != 'free':
+                results[index] = {
+                    'index': index,
+                    'status': 'conflict',
+                    'error': f'Space "{event.space.name}" is currently {event.space.status}'
+                }
+                continue
+            candidates.append((index, event))
+
+        holds = HoldClaim(request.user.id)
+        try:
+            with holds, transaction.atomic():
+                # Existing bookings for the union of the batch's ranges, in one query
+                booked = load_active_intervals(
+                    (event.space_id, event.start_datetime, event.end_datetime)
+                    for _, event in candidates
+                )
+                accepted = []
+                for index, event in candidates:
+                    conflict = booked.find_overlap(event.space_id, event.start_datetime, event.end_datetime)
+                    if conflict is not None:
+                        results[index] = {
+                            'index': index,
+                            'status': 'conflict',
+                            'details': self.conflict_details(conflict)
+                        }
+                        continue
+                    # Later items in the batch must not overlap this one
+                    booked.add(event.space_id, event.start_datetime, event.end_datetime, event)
+                    accepted.append((index, event))
+
+                # Items held by another user are conflicts too; one hold
+                # check (and take of our own holds) per space
+                by_space = defaultdict(list)
+                for index, event in accepted:
+                    by_space[event.space_id].append((index, event))
+                held = set()
+                for space_id, space_items in by_space.items():
+                    clashes = holds.take(
+                        space_id, [(event.start_datetime, event.end_datetime) for _, event in space_items],
+                        partial=True
+                    )
+                    for position, hold in clashes.items():
+                        index = space_items[position][0]
+                        held.add(index)
+                        results[index] = {
+                            'index': index,
+                            'status': 'conflict',
+                            'error': 'This time is being held by another user',
+                            'held_until': hold.expires_at
+                        }
+                accepted = [(index, event) for index, event in accepted if index not in held]
+
+                created = Event.objects.bulk_create([event for _, event in accepted])
+                for (index, _), event in zip(accepted, created):
+                    results[index] = {
+                        'index': index,
+                        'status': 'created',
+                        'event_id': event.id,
+                        'event_name': event.event_name
+                    }
+
+                if created:
+                    # bulk_create skips the post_save signal
+                    invalidate_availability_on_commit({event.space_id for event in created})
+                    queue_booking_batch_notifications(created, request.user)
+        except IntegrityError as exc:
+            if not is_overlap_violation(exc):
+                raise
+            return Response({
+                'message': 'A conflicting booking was made while processing the batch, please retry'
+            }, status=status.HTTP_409_CONFLICT)
+
+        created_count = sum(1 for result in results if result['status'] == 'created')
+        if created_count:
+            response_status = status.HTTP_201_CREATED
+        elif any(result['status'] == 'conflict' for result in results):
+            response_status = status.HTTP_409_CONFLICT
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'message': f'Booked {created_count} of {len(items)} events',
+            'results': results
+        }, status=response_status)
+
+    def conflict_details(self, conflict):
+        return {
+            'booked_event': conflict.event_name,
+            'from': conflict.start_datetime.strftime('%Y-%m-%d %H:%M'),
+            'to': conflict.end_datetime.strftime('%Y-%m-%d %H:%M'),
+            'status': conflict.status
+        }
+
+class EventSeriesView(APIView):
+    """
+    Book a recurring series of events
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary='Book a recurring series',
+        operation_description=(
+            'Book a daily or weekly series, e.g. every Tuesday 10:00-11:00 until a given date. '
+            'All occurrences are checked against existing bookings at once. By default the '
+            'series is rejected if any occurrence conflicts; with skip_conflicts the free '
+            'occurrences are booked and the conflicting ones reported.'
+        ),
+        request_body=EventSeriesSerializer,
+        responses={
+            201: openapi.Response(description='Series booked successfully'),
+            400: openapi.Response(description='Bad request - validation errors'),
+            409: openapi.Response(description='Conflict - some occurrences are already booked')
+        }
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = EventSeriesSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'message': 'Failed to book series',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        space = data['space']
+        occurrences = data['occurrences']
+        event_fields = {
+            field: data.get(field)
+            for field in ('event_name', 'organizer_name', 'organizer_email', 'event_type', 'attendance')
+        }
+
+        holds = HoldClaim(request.user.id)
+        try:
+            with holds, transaction.atomic():
+                # Every booking in the series' span, with one range query
+                booked = load_space_intervals(space.id, occurrences[0][0], occurrences[-1][1])
+                free, conflicts = [], []
+                for start, end in occurrences:
+                    conflict = booked.find_overlap(space.id, start, end)
+                    if conflict is None:
+                        free.append((start, end))
+                    else:
+                        conflicts.append({
+                            'start': start.strftime('%Y-%m-%d %H:%M'),
+                            'end': end.strftime('%Y-%m-%d %H:%M'),
+                            'booked_event': conflict.event_name,
+                            'status': conflict.status
+                        })
+
+                if not free or (conflicts and not data['skip_conflicts']):
+                    return Response({
+                        'message': 'Some occurrences of the series are already booked',
+                        'conflicts': conflicts
+                    }, status=status.HTTP_409_CONFLICT)
+
+                # Occurrences another user is holding conflict too. Without
+                # skip_conflicts nothing is taken unless every one is free.
+                clashes = holds.take(space.id, free, partial=data['skip_conflicts'])
+                for position, hold in clashes.items():
+                    start, end = free[position]
+                    conflicts.append({
+                        'start': start.strftime('%Y-%m-%d %H:%M'),
+                        'end': end.strftime('%Y-%m-%d %H:%M'),
+                        'held_until': hold.expires_at
+                    })
+                conflicts.sort(key=lambda conflict: conflict['start'])
+                free = [occurrence for position, occurrence in enumerate(free) if position not in clashes]
+                if not free or (clashes and not data['skip_conflicts']):
+                    return Response({
+                        'message': 'Some occurrences of the series are already booked',
+                        'conflicts': conflicts
+                    }, status=status.HTTP_409_CONFLICT)
+
+                series = EventSeries.objects.create(
+                    frequency=data['frequency'],
+                    interval=data['interval'],
+                    weekdays=data.get('weekdays', []),
+                    until=data['until'],
+                    user=request.user,
+                    space=space
+                )
+                created = Event.objects.bulk_create([
+                    Event(
+                        start_datetime=start,
+                        end_datetime=end,
+                        status='pending',
+                        user=request.user,
+                        space=space,
+                        series=series,
+                        **event_fields
+                    )
+                    for start, end in free
+                ])
+                # bulk_create skips the post_save signal
+                invalidate_availability_on_commit([space.id])
+                queue_booking_batch_notifications(created, request.user)
+        except IntegrityError as exc:
+            if not is_overlap_violation(exc):
+                raise
+            return Response({
+                'message': 'A conflicting booking was made while booking the series, please retry'
+            }, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'message': f'Booked {len(created)} of {len(occurrences)} occurrences',
+            'series_id': series.id,
+            'space': space.name,
+            'first_start': created[0].start_datetime.strftime('%Y-%m-%d %H:%M'),
+            'last_start': created[-1].start_datetime.strftime('%Y-%m-%d %H:%M'),
+            'skipped': conflicts,
+            'status': 'pending'
+        }, status=status.HTTP_201_CREATED)
+
+
+class EventSeriesDetailView(APIView):
+    """
+    Edit or cancel the remaining occurrences of a recurring series
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_series(self, request, series_id):
+        queryset = EventSeries.objects.all()
+        if not request.user.is_staff:
+            queryset = queryset.filter(user=request.user)
+        return get_object_or_404(queryset, id=series_id)
+
+    def remaining_occurrences(self, series):
+        """Active occurrences that have not started yet"""
+        return Event.objects.filter(
+            series=series,
+            start_datetime__gt=timezone.now()
+        ).active()
+
+    @swagger_auto_schema(
+        operation_summary='Edit a recurring series',
+        operation_description='Update the details of every occurrence that has not started yet',
+        request_body=EventSeriesUpdateSerializer,
+        responses={
+            200: openapi.Response(description='Series updated'),
+            400: openapi.Response(description='Bad request - validation errors'),
+            404: openapi.Response(description='Series not found')
+        }
+    )
+    def patch(self, request, series_id):
+        series = self.get_series(request, series_id)
+        serializer = EventSeriesUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'message': 'Failed to update series',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        updated = self.remaining_occurrences(series).update(
+            updated_at=timezone.now(),
+            version=F('version') + 1,
+            **serializer.validated_data
+        )
+        return Response({
+            'message': f'Updated {updated} upcoming occurrences',
+            'series_id': series.id
+        }, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_summary='Cancel a recurring series',
+        operation_description='Cancel every occurrence that has not started yet',
+        responses={
+            200: openapi.Response(description='Series cancelled'),
+            404: openapi.Response(description='Series not found')
+        }
+    )
+    def delete(self, request, series_id):
+        series = self.get_series(request, series_id)
+
+        cancelled = transition(self.remaining_occurrences(series), 'cancelled')
+
+        return Response({
+            'message': f'Cancelled {len(cancelled)} upcoming occurrences',
+            'series_id': series.id
+        }, status=status.HTTP_200_OK)
+
+
+class WaitlistView(ListAPIView):
+    """
+    Join the waitlist for a taken slot, or list your waitlist entries
+    """
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(user=self.request.user).select_related('space')
+
+    @swagger_auto_schema(
+        operation_summary='Join a waitlist',
+        operation_description=(
+            'Wait for a slot that is currently taken. When an event there is cancelled, '
+            'the earliest waiting requests that fit become pending bookings.'
+        ),
+        request_body=WaitlistEntrySerializer,
+        responses={
+            201: openapi.Response(description='Added to the waitlist', schema=WaitlistEntrySerializer),
+            400: openapi.Response(description='Bad request - validation errors or the slot is free')
+        }
+    )
+    def post(self, request):
+        serializer = WaitlistEntrySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'message': 'Failed to join the waitlist',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        if not Event.objects.overlapping(data['space'], data['start_datetime'], data['end_datetime']).exists():
+            return Response({
+                'message': 'The slot is free; book it instead'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        entry = serializer.save(user=request.user)
+        return Response({
+            'message': 'Added to the waitlist',
+            'data': WaitlistEntrySerializer(entry).data
+        }, status=status.HTTP_201_CREATED)
+
+
+class WaitlistEntryDetailView(APIView):
+    """
+    Leave a waitlist
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary='Leave a waitlist',
+        responses={
+            200: openapi.Response(description='Entry withdrawn'),
+            404: openapi.Response(description='No waiting entry found')
+        }
+    )
+    def delete(self, request, entry_id):
+        withdrawn = WaitlistEntry.objects.filter(
+            id=entry_id, user=request.user, status='waiting'
+        ).update(status='withdrawn')
+        if not withdrawn:
+            return Response({
+                'message': 'Waiting entry not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'message': 'Removed from the waitlist',
+            'entry_id': entry_id
+        }, status=status.HTTP_200_OK)
+
+
 class ListUpcomingEventsView(ListAPIView):
     """
     List all upcoming events
     """
     serializer_class = EventListSerializer
+    pagination_class = StartTimeCursorPagination
 
     def get_queryset(self):
         """Get all upcoming events (confirmed and in the future)"""
@@ -194,7 +705,7 @@ class ListUpcomingEventsView(ListAPIView):
 
     @swagger_auto_schema(
         operation_summary='List upcoming confirmed events',
-        operation_description='Get a list of all upcoming confirmed events ordered by start date (nearest first)',
+        operation_description='Get a page of upcoming confirmed events ordered by start date (nearest first). Follow `next` to fetch the following page. The total `count` is only returned on the first page (no `cursor`).',
         manual_parameters=[
             openapi.Parameter(
                 'event_type',
@@ -203,6 +714,18 @@ class ListUpcomingEventsView(ListAPIView):
                 type=openapi.TYPE_STRING,
                 enum=['meeting', 'conference', 'webinar', 'workshop']
             ),
+            openapi.Parameter(
+                'cursor',
+                openapi.IN_QUERY,
+                description='Opaque cursor taken from the previous page\'s `next` link',
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'page_size',
+                openapi.IN_QUERY,
+                description='Events per page (default 20, max 100)',
+                type=openapi.TYPE_INTEGER
+            ),
         ],
         responses={
             200: openapi.Response(
@@ -219,11 +742,22 @@ class ListUpcomingEventsView(ListAPIView):
         if event_type_filter:
             queryset = queryset.filter(event_type=event_type_filter)
         
-        serializer = self.get_serializer(queryset, many=True)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
         
+        # The total is only counted for the first page; following pages
+        # stay a single index range scan
+        if request.query_params.get(self.paginator.cursor_query_param):
+            return Response({
+                'message': f'Found {len(page)} more upcoming events',
+                'next': self.paginator.get_next_link(),
+                'data': serializer.data
+            })
+        count = queryset.count()
         return Response({
-            'message': f'Found {queryset.count()} upcoming events',
-            'count': queryset.count(),
+            'message': f'Found {count} upcoming events',
+            'count': count,
+            'next': self.paginator.get_next_link(),
             'data': serializer.data
         })
 
@@ -233,6 +767,7 @@ class ListMyEventsView(ListAPIView):
     """
     serializer_class = EventListSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = StartTimeCursorPagination
 
     def get_queryset(self):
         """
@@ -244,7 +779,21 @@ class ListMyEventsView(ListAPIView):
 
     @swagger_auto_schema(
         operation_summary='List all my events',
-        operation_description='Get a list of all events created by the current user regardless of status',
+        operation_description='Get a page of events created by the current user regardless of status. Follow `next` to fetch the following page. `count` and `events_by_status` are only returned on the first page (no `cursor`).',
+        manual_parameters=[
+            openapi.Parameter(
+                'cursor',
+                openapi.IN_QUERY,
+                description='Opaque cursor taken from the previous page\'s `next` link',
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'page_size',
+                openapi.IN_QUERY,
+                description='Events per page (default 20, max 100)',
+                type=openapi.TYPE_INTEGER
+            ),
+        ],
         responses={
             200: openapi.Response(
                 description='User events retrieved successfully',
@@ -254,23 +803,101 @@ class ListMyEventsView(ListAPIView):
     )
     def get(self, request, *args, **kwargs):
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
         
-        # Group events by status
-        events_by_status = {}
-        for event in queryset:
-            status_key = event.status
-            if status_key not in events_by_status:
-                events_by_status[status_key] = 0
-            events_by_status[status_key] += 1
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        
+        # The totals are only aggregated for the first page
+        if request.query_params.get(self.paginator.cursor_query_param):
+            return Response({
+                'message': f'Found {len(page)} more events for user {request.user.email}',
+                'next': self.paginator.get_next_link(),
+                'data': serializer.data
+            }, status=status.HTTP_200_OK)
+        
+        # Group events by status in one aggregate query
+        events_by_status = dict(
+            queryset.order_by().values_list('status').annotate(total=Count('id'))
+        )
+        count = sum(events_by_status.values())
         
         return Response({
-            'message': f'Found {queryset.count()} events for user {request.user.email}',
-            'count': queryset.count(),
+            'message': f'Found {count} events for user {request.user.email}',
+            'count': count,
             'events_by_status': events_by_status,
+            'next': self.paginator.get_next_link(),
             'data': serializer.data
         }, status=status.HTTP_200_OK)
         
+class EventDetailView(APIView):
+    """
+    Read or edit one event. Responses carry the event's version as an
+    ETag; edits sent with If-Match are refused with 412 once someone else
+    has changed the event.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_event(self, request, event_id):
+        queryset = Event.objects.select_related('space')
+        if not request.user.is_staff:
+            queryset = queryset.filter(user=request.user)
+        return get_object_or_404(queryset, id=event_id)
+
+    def versioned_response(self, event):
+        response = Response(EventSerializer(event).data, status=status.HTTP_200_OK)
+        response['ETag'] = event.etag
+        return response
+
+    @swagger_auto_schema(
+        operation_summary='Get an event',
+        responses={
+            200: EventSerializer,
+            404: openapi.Response(description='Event not found')
+        }
+    )
+    def get(self, request, event_id):
+        return self.versioned_response(self.get_event(request, event_id))
+
+    @swagger_auto_schema(
+        operation_summary='Edit an event',
+        operation_description='Update the details of an event. Send the ETag from a previous read as '
+                              'If-Match to refuse the update if the event changed since.',
+        manual_parameters=[
+            openapi.Parameter('If-Match', openapi.IN_HEADER, type=openapi.TYPE_STRING,
+                              description='ETag of the version being updated')
+        ],
+        request_body=EventUpdateSerializer,
+        responses={
+            200: EventSerializer,
+            400: openapi.Response(description='Bad request - validation errors'),
+            404: openapi.Response(description='Event not found'),
+            412: openapi.Response(description='The event was changed since it was read')
+        }
+    )
+    def patch(self, request, event_id):
+        event = self.get_event(request, event_id)
+        error = check_if_match(request, event)
+        if error:
+            return error
+        serializer = EventUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'message': 'Failed to update event',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        for field, value in serializer.validated_data.items():
+            setattr(event, field, value)
+        try:
+            # UPDATE ... WHERE version = <read>; no row lock is taken
+            with transaction.atomic():
+                event.save(update_fields=[*serializer.validated_data, 'updated_at'])
+        except StaleVersion:
+            event.refresh_from_db(fields=['version'])
+            return precondition_failed(event)
+        return self.versioned_response(event)
+
+
 class ApproveEventView(APIView):
     """
     Approve a pending event
@@ -279,7 +906,7 @@ class ApproveEventView(APIView):
     
     @swagger_auto_schema(
         operation_summary='Approve an event',
-        operation_description='Change the status of a pending event to confirmed',
+        operation_description='Change the status of a pending event to confirmed and reject the pending events overlapping it',
         manual_parameters=[
             openapi.Parameter(
                 'event_id',
@@ -303,25 +930,28 @@ class ApproveEventView(APIView):
     )
     def post(self, request, event_id):
         try:
-            event = Event.objects.get(id=event_id)
+            event = Event.objects.select_related('space').get(id=event_id)
             
-            if event.status != 'pending':
-                return Response({
-                    'message': f'Event cannot be approved. Current status: {event.status}'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Update event status
-            event.status = 'confirmed'
-            event.save()
-            
-            # Trigger Celery task to update space status
-            update_space_on_approval.delay(event.id)
+            with transaction.atomic():
+                # Conditional on the event still being pending; the status_changed
+                # receiver schedules the space to be booked at the event start
+                approved = transition(
+                    Event.objects.filter(id=event.id), 'confirmed', from_statuses='pending'
+                )
+                if not approved:
+                    event.refresh_from_db(fields=['status'])
+                    return Response({
+                        'message': f'Event cannot be approved. Current status: {event.status}'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                # Pending requests for the same slot can no longer be granted
+                rejected = reject_overlapping_pending(approved)
             
             return Response({
                 'message': f'Event "{event.event_name}" has been approved successfully',
                 'event_id': event.id,
                 'space': event.space.name,
-                'note': 'Space status will be updated shortly'
+                'rejected_event_ids': [rejected_event.id for rejected_event in rejected],
+                'note': 'Space will be marked as booked when the event starts'
             }, status=status.HTTP_200_OK)
             
         except Event.DoesNotExist:
@@ -346,22 +976,297 @@ class CheckEventStatusView(APIView):
         }
     )
     def post(self, request):
-        # Find all confirmed events that have ended
-        ended_events = Event.objects.filter(
-            status='confirmed',
-            end_datetime__lt=timezone.now()
-        )
-        
-        count = 0
-        for event in ended_events:
-            event.status = 'completed'
-            event.save()  # This will trigger the signal to update space status
-            count += 1
+        # Complete all confirmed events that have ended in one batch
+        count = len(transition(
+            Event.objects.filter(end_datetime__lt=timezone.now()),
+            'completed',
+            from_statuses='confirmed'
+        ))
         
         return Response({
             'message': f'Checked event status. Marked {count} events as completed.',
         }, status=status.HTTP_200_OK)
 
+MAX_CALENDAR_DAYS = 31
+
+
+class OccupancyCalendarView(ListAPIView):
+    """
+    Occupancy grid of spaces x days, read from the per-day slot bitmaps
+    """
+    permission_classes = [IsAdminUser]
+    pagination_class = OccupancyCalendarPagination
+
+    def get_queryset(self):
+        queryset = Space.objects.order_by('name', 'id')
+        if self.space_ids is not None:
+            queryset = queryset.filter(id__in=self.space_ids)
+        return queryset.only('id', 'name')
+
+    def list(self, request, *args, **kwargs):
+        spaces = self.paginate_queryset(self.get_queryset())
+        grid = occupancy_grid([space.id for space in spaces], self.first_day, self.days)
+        dates = [self.first_day + timedelta(days=offset) for offset in range(self.days)]
+        results = []
+        for space in spaces:
+            cells = []
+            for day, bits in zip(dates, grid[space.id]):
+                occupied = bits.bit_count()
+                cells.append({
+                    'date': day,
+                    'occupied_slots': occupied,
+                    'occupancy': round(occupied / SLOTS_PER_DAY, 4),
+                    'slots': to_bytes(bits).hex(),
+                })
+            results.append({'space': space.id, 'name': space.name, 'days': cells})
+
+        response = self.get_paginated_response(results)
+        response.data['from'] = dates[0]
+        response.data['to'] = dates[-1]
+        response.data['slot_minutes'] = SLOT // timedelta(minutes=1)
+        return response
+
+    @swagger_auto_schema(
+        operation_summary='Occupancy calendar',
+        operation_description=(
+            'Confirmed and completed bookings per space and day, in 15-minute slots. '
+            '`slots` is the day\'s bitmap as hex: slot i (0 = 00:00-00:15 local time) '
+            'is bit i % 8 of byte i // 8.'
+        ),
+        manual_parameters=[
+            openapi.Parameter('from', openapi.IN_QUERY, type=openapi.TYPE_STRING, format='date',
+                              description='First day (YYYY-MM-DD, default today)'),
+            openapi.Parameter('days', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description=f'Number of days (1-{MAX_CALENDAR_DAYS}, default 7)'),
+            openapi.Parameter('spaces', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description='Comma-separated space ids (default all spaces)'),
+        ],
+        responses={200: 'Occupancy grid', 400: 'Invalid parameters'}
+    )
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            self.first_day = parse_date(params['from']) if params.get('from') else timezone.localdate()
+        except ValueError:
+            self.first_day = None
+        if self.first_day is None:
+            return Response({"error": "'from' must be a date (YYYY-MM-DD)"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            self.days = int(params.get('days', 7))
+        except ValueError:
+            self.days = 0
+        if not 1 <= self.days <= MAX_CALENDAR_DAYS:
+            return Response({"error": f"'days' must be between 1 and {MAX_CALENDAR_DAYS}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        self.space_ids = None
+        if params.get('spaces'):
+            try:
+                self.space_ids = [int(space_id) for space_id in params['spaces'].split(',')]
+            except ValueError:
+                return Response({"error": "'spaces' must be comma-separated ids"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        return self.list(request, *args, **kwargs)
+
+
+USAGE_PERIODS = ('day', 'week', 'month')
+MAX_USAGE_REPORT_DAYS = 731
+
+
+def period_start(day, period):
+    """First day of the day/week (Monday)/month containing day"""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start, period):
+    if period == 'week':
+        return start + timedelta(weeks=1)
+    if period == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+class SpaceUsageReportView(ListAPIView):
+    """
+    Utilization and revenue per space by day, week or month, read only
+    from the SpaceUsage rollups
+    """
+    permission_classes = [IsAdminUser]
+    pagination_class = SpaceUsageReportPagination
+
+    def get_queryset(self):
+        queryset = Space.objects.order_by('name', 'id')
+        if self.space_ids is not None:
+            queryset = queryset.filter(id__in=self.space_ids)
+        return queryset.only('id', 'name')
+
+    def list(self, request, *args, **kwargs):
+        spaces = self.paginate_queryset(self.get_queryset())
+        truncate = {'day': F('day'), 'week': TruncWeek('day'), 'month': TruncMonth('day')}[self.period]
+        totals = {
+            (row['space_id'], row['period']): row
+            for row in SpaceUsage.objects.filter(
+                space_id__in=[space.id for space in spaces],
+                day__range=(self.first_day, self.last_day)
+            ).annotate(period=truncate).values('space_id', 'period').annotate(
+                booked_seconds=Sum('booked_seconds'), revenue=Sum('revenue')
+            )
+        }
+
+        # Open hours only count the part of a period inside the range
+        open_hours_per_day = getattr(settings, 'SPACE_OPEN_HOURS_PER_DAY', 24)
+        periods = []
+        start = period_start(self.first_day, self.period)
+        while start <= self.last_day:
+            end = next_period(start, self.period)
+            days = (min(end, self.last_day + timedelta(days=1)) - max(start, self.first_day)).days
+            periods.append((start, days * open_hours_per_day))
+            start = end
+
+        results = []
+        for space in spaces:
+            cells = []
+            for start, open_hours in periods:
+                row = totals.get((space.id, start), {})
+                booked_hours = (row.get('booked_seconds') or 0) / SECONDS_PER_HOUR
+                cells.append({
+                    'start': start,
+                    'booked_hours': round(booked_hours, 2),
+                    'open_hours': open_hours,
+                    'utilization': round(booked_hours / open_hours, 4) if open_hours else 0,
+                    'revenue': str(Decimal(row.get('revenue') or 0).quantize(CENT)),
+                })
+            results.append({'space': space.id, 'name': space.name, 'periods': cells})
+
+        response = self.get_paginated_response(results)
+        response.data['from'] = self.first_day
+        response.data['to'] = self.last_day
+        response.data['period'] = self.period
+        return response
+
+    @swagger_auto_schema(
+        operation_summary='Space utilization and revenue',
+        operation_description=(
+            'Booked hours, utilization (booked / open hours) and revenue (price per hour x booked '
+            'time) of confirmed and completed events per space, by day, week or month.'
+        ),
+        manual_parameters=[
+            openapi.Parameter('period', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=[*USAGE_PERIODS],
+                              description='Grouping (default month)'),
+            openapi.Parameter('from', openapi.IN_QUERY, type=openapi.TYPE_STRING, format='date',
+                              description='First day (YYYY-MM-DD, default the start of the last 12 months)'),
+            openapi.Parameter('to', openapi.IN_QUERY, type=openapi.TYPE_STRING, format='date',
+                              description=f'Last day, inclusive (YYYY-MM-DD, default today, '
+                                          f'at most {MAX_USAGE_REPORT_DAYS} days after from)'),
+            openapi.Parameter('spaces', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description='Comma-separated space ids (default all spaces)'),
+        ],
+        responses={200: 'Usage per space and period', 400: 'Invalid parameters'}
+    )
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        self.period = params.get('period', 'month')
+        if self.period not in USAGE_PERIODS:
+            return Response({"error": f"'period' must be one of {', '.join(USAGE_PERIODS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        today = timezone.localdate()
+        try:
+            self.first_day = parse_date(params['from']) if params.get('from') else \
+                (today.replace(day=1) - timedelta(days=335)).replace(day=1)
+            self.last_day = parse_date(params['to']) if params.get('to') else today
+        except ValueError:
+            self.first_day = self.last_day = None
+        if self.first_day is None or self.last_day is None:
+            return Response({"error": "'from' and 'to' must be dates (YYYY-MM-DD)"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= (self.last_day - self.first_day).days < MAX_USAGE_REPORT_DAYS:
+            return Response({"error": f"'to' must be on or after 'from' and within {MAX_USAGE_REPORT_DAYS} days"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        self.space_ids = None
+        if params.get('spaces'):
+            try:
+                self.space_ids = [int(space_id) for space_id in params['spaces'].split(',')]
+            except ValueError:
+                return Response({"error": "'spaces' must be comma-separated ids"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        return self.list(request, *args, **kwargs)
+
+
+MAX_ARCHIVE_PAGE_SIZE = 1000
+
+
+class EventArchiveView(APIView):
+    """
+    Read-only scan of the archived events, for historical reporting
+    """
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary='Archived events',
+        operation_description=(
+            'Completed and cancelled events that were moved out of the database, read from the '
+            'archive files. Only the files covering the requested days are opened, and the scan '
+            'stops once the page is full.'
+        ),
+        manual_parameters=[
+            openapi.Parameter('from', openapi.IN_QUERY, type=openapi.TYPE_STRING, format='date',
+                              required=True, description='First start day (YYYY-MM-DD, local time)'),
+            openapi.Parameter('to', openapi.IN_QUERY, type=openapi.TYPE_STRING, format='date',
+                              required=True, description='Last start day, inclusive (YYYY-MM-DD, local time)'),
+            openapi.Parameter('space', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='Only events in this space'),
+            openapi.Parameter('status', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=list(ARCHIVE_STATUSES), description='Only events in this status'),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description=f'Events per page (default 100, max {MAX_ARCHIVE_PAGE_SIZE})'),
+            openapi.Parameter('offset', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='Matching events to skip'),
+        ],
+        responses={200: 'Archived events', 400: 'Invalid parameters'}
+    )
+    def get(self, request):
+        params = request.query_params
+        try:
+            first_day = parse_date(params.get('from', ''))
+            last_day = parse_date(params.get('to', ''))
+        except ValueError:
+            first_day = last_day = None
+        if first_day is None or last_day is None:
+            return Response({"error": "'from' and 'to' must be dates (YYYY-MM-DD)"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if last_day < first_day:
+            return Response({"error": "'to' cannot be before 'from'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            space_id = int(params['space']) if params.get('space') else None
+            limit = min(max(int(params.get('limit', 100)), 1), MAX_ARCHIVE_PAGE_SIZE)
+            offset = max(int(params.get('offset', 0)), 0)
+        except ValueError:
+            return Response({"error": "'space', 'limit' and 'offset' must be numbers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        event_status = params.get('status')
+        if event_status and event_status not in ARCHIVE_STATUSES:
+            return Response({"error": f"'status' must be one of {', '.join(ARCHIVE_STATUSES)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        start = day_bounds(first_day)[0]
+        end = day_bounds(last_day)[1]
+        records = read_archive(start, end, space_id, [event_status] if event_status else None)
+        # One extra record tells us whether there is a next page
+        page = list(islice(records, offset, offset + limit + 1))
+        next_link = None
+        if len(page) > limit:
+            next_link = replace_query_param(request.build_absolute_uri(), 'offset', offset + limit)
+        return Response({
+            'from': first_day,
+            'to': last_day,
+            'next': next_link,
+            'results': page[:limit]
+        }, status=status.HTTP_200_OK)
+
+
 class BookingViewSet(viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
@@ -370,6 +1275,7 @@ class BookingViewSet(viewsets.ModelViewSet):
     @swagger_auto_schema(
         operation_summary="Create a new booking",
         operation_description="Create a new booking for an event space",
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             required=['event_name', 'start_datetime', 'end_datetime', 'organizer_name', 
@@ -392,6 +1298,7 @@ class BookingViewSet(viewsets.ModelViewSet):
             403: "Permission Denied"
         }
     )
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
@@ -0,0 +1,112 @@
+import logging
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.spaces.models import Space
+from apps.notifications.views import send_waitlist_promoted_notification
+from .availability import invalidate_availability_on_commit
+from .conflicts import load_active_intervals
+from .models import Event, WaitlistEntry, is_overlap_violation
+
+logger = logging.getLogger(__name__)
+
+# First key of the two-int advisory lock, so space ids do not collide with
+# other users of pg_advisory_xact_lock
+WAITLIST_LOCK_NAMESPACE = 72601
+
+
+def lock_spaces(space_ids):
+    """
+    Serialise waitlist promotion per space until the transaction ends. On
+    PostgreSQL this takes transaction-level advisory locks, which touch no
+    rows; elsewhere it falls back to locking the space rows.
+    """
+    space_ids = sorted(set(space_ids))
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            # One at a time in id order, so two promotions cannot deadlock
+            for space_id in space_ids:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [WAITLIST_LOCK_NAMESPACE, space_id])
+    else:
+        list(Space.objects.filter(id__in=space_ids).select_for_update().order_by('id').values_list('id'))
+
+
+def promote_waitlist(freed):
+    """
+    Turn the earliest waiting entries that fit into the slots freed by the
+    given events into pending events, in the caller's transaction.
+
+    The waiting entries touching any freed range, and the active events
+    they could clash with, are read with one query each and resolved in
+    memory, first come first served. Returns the promoted entries.
+    """
+    if not freed:
+        return []
+    with transaction.atomic():
+        lock_spaces(event.space_id for event in freed)
+        entries = list(WaitlistEntry.objects.filter(
+            reduce(or_, (
+                Q(space_id=event.space_id, start_datetime__lt=event.end_datetime,
+                  end_datetime__gt=event.start_datetime)
+                for event in freed
+            )),
+            status='waiting',
+            start_datetime__gt=timezone.now()
+        ).select_for_update(of=('self',)).select_related('space', 'user').order_by('created_at', 'id'))
+        if not entries:
+            return []
+
+        booked = load_active_intervals(
+            (entry.space_id, entry.start_datetime, entry.end_datetime) for entry in entries
+        )
+        promoted = []
+        for entry in entries:
+            if booked.find_overlap(entry.space_id, entry.start_datetime, entry.end_datetime):
+                continue
+            booked.add(entry.space_id, entry.start_datetime, entry.end_datetime, entry)
+            promoted.append(entry)
+        if not promoted:
+            return []
+
+        events = [
+            Event(
+                event_name=entry.event_name,
+                start_datetime=entry.start_datetime,
+                end_datetime=entry.end_datetime,
+                organizer_name=entry.organizer_name,
+                organizer_email=entry.organizer_email,
+                event_type=entry.event_type,
+                attendance=entry.attendance,
+                user=entry.user,
+                space=entry.space,
+                status='pending'
+            )
+            for entry in promoted
+        ]
+        try:
+            # Savepoint: a booking that slipped in through another path must
+            # not roll back the cancellation that freed the slot
+            with transaction.atomic():
+                Event.objects.bulk_create(events)
+        except IntegrityError as exc:
+            if not is_overlap_violation(exc):
+                raise
+            logger.warning('Waitlist promotion lost a race for spaces %s', sorted({e.space_id for e in events}))
+            return []
+
+        now = timezone.now()
+        for entry, event in zip(promoted, events):
+            entry.status = 'promoted'
+            entry.event = event
+            entry.promoted_at = now
+        WaitlistEntry.objects.bulk_update(promoted, ['status', 'event', 'promoted_at'])
+
+        # bulk_create skips the post_save receivers
+        invalidate_availability_on_commit({event.space_id for event in events})
+        for event in events:
+            send_waitlist_promoted_notification(event, event.user)
+    return promoted
@@ -0,0 +1,114 @@
+from django import forms
+from django.db import models
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class StaleVersion(Exception):
+    """The row was changed by someone else since it was read"""
+
+
+class VersionedModel(models.Model):
+    """
+    Optimistic concurrency: every UPDATE of a saved instance is
+    UPDATE ... SET version = version + 1 WHERE id = ... AND version = <read>.
+    A writer holding an old copy gets StaleVersion instead of silently
+    overwriting the newer row, and no row lock is held in between.
+
+    Queryset .update() calls bypass save(), so they must bump version
+    themselves with F('version') + 1.
+
+    StaleVersion is raised from save(), which marks an enclosing atomic
+    block for rollback. Callers that keep using the transaction afterwards
+    wrap the save in their own transaction.atomic() savepoint.
+    """
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def etag(self):
+        return f'"{self.version}"'
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = self.version
+        version_field = self._meta.get_field('version')
+        values = [value for value in values if value[0] is not version_field]
+        values.append((version_field, None, expected + 1))
+        updated = super()._do_update(
+            base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update
+        )
+        if updated:
+            self.version = expected + 1
+        elif base_qs.filter(pk=pk_val).exists():
+            raise StaleVersion(
+                f'{self._meta.verbose_name} {pk_val} was changed since version {expected} was read'
+            )
+        return updated
+
+
+def parse_if_match(request):
+    """
+    The version a client's If-Match header names, None if it sent none, or
+    False if the header is not a version ETag
+    """
+    header = request.headers.get('If-Match')
+    if not header:
+        return None
+    value = header.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        return False
+
+
+def check_if_match(request, instance):
+    """
+    A 400/412 response if the request's If-Match header does not name the
+    instance's current version, else None. Requests without the header go
+    ahead; their write is still conditional on the version read here.
+    """
+    expected = parse_if_match(request)
+    if expected is False:
+        return Response({
+            'message': 'If-Match must be an ETag returned by this API'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if expected is not None and expected != instance.version:
+        return precondition_failed(instance)
+    return None
+
+
+def precondition_failed(instance):
+    response = Response({
+        'message': f'This {instance._meta.verbose_name} was changed by someone else; reload it and try again',
+        'version': instance.version
+    }, status=status.HTTP_412_PRECONDITION_FAILED)
+    response['ETag'] = instance.etag
+    return response
+
+
+class VersionedModelForm(forms.ModelForm):
+    """
+    Admin form that carries the version the page was rendered from, so a
+    save over someone else's newer edit is refused instead of lost
+    """
+    # Not named version: ModelForms refuse fields named after non-editable ones
+    loaded_version = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['loaded_version'].initial = self.instance.version
+
+    def clean(self):
+        cleaned_data = super().clean()
+        version = cleaned_data.get('loaded_version')
+        if self.instance.pk and version is not None and version != self.instance.version:
+            raise forms.ValidationError(
+                f'This {self.instance._meta.verbose_name} was changed by someone else '
+                'since you opened it. Reload the page to see their changes.'
+            )
+        return cleaned_data
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import OutboxEmail
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'attempts', 'available_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject', 'recipients', 'last_error']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'sent_at', 'attempts', 'last_error']
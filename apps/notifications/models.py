@@ -1,3 +1,42 @@
 from django.db import models
 
-# Create your models here.
+
+class OutboxEmail(models.Model):
+    """
+    Email written in the same transaction as the change that triggered it
+    and delivered later by the send_queued_emails Celery task.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(help_text="List of recipient email addresses")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(
+        help_text="Earliest time the next delivery attempt may run"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['available_at']
+        indexes = [
+            # send_queued_emails claims due rows in available_at order
+            models.Index(
+                fields=['available_at'],
+                condition=models.Q(status__in=['pending', 'sending']),
+                name='outbox_due_idx'
+            ),
+        ]
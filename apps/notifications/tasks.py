@@ -0,0 +1,151 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+# A claimed email whose worker died is retried once its lease runs out
+SEND_LEASE = timedelta(minutes=5)
+
+
+def publish_drain():
+    """
+    Publish the send task once per commit. Every email of a transaction
+    registers this callback and they run back to back after the commit, so
+    only the first one publishes; queue_email re-arms it for the next
+    transaction.
+    """
+    connection = transaction.get_connection()
+    if not getattr(connection, 'outbox_drain_published', False):
+        connection.outbox_drain_published = True
+        send_queued_emails.delay()
+
+
+def queue_email(subject, body, recipients, html_body='', from_email=None):
+    """
+    Write an email to the outbox in the current transaction. The send task
+    is only published once that transaction commits, so a rolled back
+    booking never sends mail and a slow SMTP server never holds row locks.
+    One drain covers every email of the transaction, so it is published
+    once however many are queued.
+    """
+    recipients = [email for email in recipients if email]
+    if not recipients:
+        return None
+    email = OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=recipients,
+        available_at=timezone.now()
+    )
+    # Registered for every email so the drain survives the rollback of a
+    # savepoint that queued an earlier one; publish_drain dedupes the calls
+    transaction.get_connection().outbox_drain_published = False
+    transaction.on_commit(publish_drain)
+    return email
+
+
+def retry_delay(attempts):
+    """Exponential backoff: 1, 2, 4, 8... minutes"""
+    return timedelta(minutes=2 ** (attempts - 1))
+
+
+def claim_due_emails(now):
+    """
+    Lease up to BATCH_SIZE due emails to this worker. Claiming counts as an
+    attempt, so an email whose worker keeps dying while sending it (lease
+    expired) is given up after MAX_ATTEMPTS like one that keeps failing.
+    """
+    with transaction.atomic():
+        due = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True).filter(
+                status__in=['pending', 'sending'],
+                available_at__lte=now
+            ).order_by('available_at')[:BATCH_SIZE]
+        )
+        exhausted = [email.id for email in due if email.attempts >= MAX_ATTEMPTS]
+        if exhausted:
+            OutboxEmail.objects.filter(id__in=exhausted).update(
+                status='failed',
+                last_error='Send lease expired'
+            )
+        due = [email for email in due if email.id not in exhausted]
+        OutboxEmail.objects.filter(id__in=[email.id for email in due]).update(
+            status='sending',
+            available_at=now + SEND_LEASE,
+            attempts=F('attempts') + 1
+        )
+    for email in due:
+        email.attempts += 1
+    return due
+
+
+def record_failure(email, exc):
+    """Schedule a retry with backoff, or give up after MAX_ATTEMPTS"""
+    email.last_error = str(exc)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.status = 'pending'
+        email.available_at = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=['last_error', 'status', 'available_at'])
+
+
+@shared_task
+def send_queued_emails():
+    """
+    Deliver due outbox emails in batches over one SMTP connection
+    """
+    due = claim_due_emails(timezone.now())
+    if not due:
+        return "No queued emails to send"
+
+    sent = []
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        for email in due:
+            record_failure(email, exc)
+        return f"Could not connect to the mail server, {len(due)} emails requeued"
+
+    try:
+        for email in due:
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.recipients,
+                connection=connection
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, "text/html")
+            try:
+                message.send()
+            except Exception as exc:
+                record_failure(email, exc)
+            else:
+                sent.append(email.id)
+    finally:
+        connection.close()
+
+    OutboxEmail.objects.filter(id__in=sent).update(
+        status='sent',
+        sent_at=timezone.now(),
+        last_error=''
+    )
+
+    # A full batch means there may be more waiting
+    if len(due) == BATCH_SIZE:
+        send_queued_emails.delay()
+
+    return f"Sent {len(sent)} emails, {len(due) - len(sent)} failed"
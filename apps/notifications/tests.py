@@ -1,3 +1,169 @@
-from django.test import TestCase
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.db import DatabaseError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.backends.email_backend import EmailBackend, connection_pool
+from .models import OutboxEmail
+from .tasks import MAX_ATTEMPTS, queue_email, send_queued_emails
+
+
+class OutboxTestCase(TestCase):
+
+    def test_queue_email_publishes_on_commit(self):
+        """Test queued emails are stored and the send task only runs after commit"""
+        with mock.patch('apps.notifications.tasks.send_queued_emails.delay') as delay, \
+                self.captureOnCommitCallbacks() as callbacks:
+            queue_email('Subject', 'Body', ['user@example.com', None], html_body='<p>Body</p>')
+            delay.assert_not_called()
+
+        self.assertEqual(len(callbacks), 1)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.recipients, ['user@example.com'])
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_one_drain_per_transaction(self):
+        """Test several emails queued in one transaction publish a single send task"""
+        with mock.patch('apps.notifications.tasks.send_queued_emails.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                queue_email(f'Subject {i}', 'Body', [f'user{i}@example.com'])
+
+        delay.assert_called_once_with()
+        self.assertEqual(OutboxEmail.objects.count(), 3)
+
+    def test_drain_per_commit(self):
+        """Test each transaction publishes its own drain, even after a rolled back savepoint"""
+        with mock.patch('apps.notifications.tasks.send_queued_emails.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                queue_email('First', 'Body', ['user@example.com'])
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        queue_email('Rolled back', 'Body', ['user@example.com'])
+                        raise DatabaseError
+                except DatabaseError:
+                    pass
+                queue_email('Second', 'Body', ['user@example.com'])
+
+        self.assertEqual(delay.call_count, 2)
+        self.assertEqual(list(OutboxEmail.objects.order_by('id').values_list('subject', flat=True)), ['First', 'Second'])
+
+    def test_queue_email_without_recipients(self):
+        """Test nothing is queued when every recipient is empty"""
+        self.assertIsNone(queue_email('Subject', 'Body', [None, '']))
+        self.assertEqual(OutboxEmail.objects.count(), 0)
+
+    def test_send_queued_emails(self):
+        """Test due emails are delivered in one batch and marked as sent"""
+        for i in range(3):
+            queue_email(f'Subject {i}', 'Body', [f'user{i}@example.com'], html_body='<p>Body</p>')
+
+        send_queued_emails()
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives, [('<p>Body</p>', 'text/html')])
+        self.assertEqual(OutboxEmail.objects.filter(status='sent').count(), 3)
+
+    def test_failed_email_backs_off_then_gives_up(self):
+        """Test failures are retried with backoff and marked failed after MAX_ATTEMPTS"""
+        queue_email('Subject', 'Body', ['user@example.com'])
+
+        with mock.patch(
+            'apps.notifications.tasks.EmailMultiAlternatives.send',
+            side_effect=SMTPException('Connection unexpectedly closed')
+        ):
+            send_queued_emails()
+            email = OutboxEmail.objects.get()
+            self.assertEqual(email.status, 'pending')
+            self.assertEqual(email.attempts, 1)
+            self.assertGreater(email.available_at, timezone.now())
+            self.assertIn('Connection unexpectedly closed', email.last_error)
+
+            for attempt in range(MAX_ATTEMPTS - 1):
+                OutboxEmail.objects.update(available_at=timezone.now())
+                send_queued_emails()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'failed')
+        self.assertEqual(email.attempts, MAX_ATTEMPTS)
+
+    def test_expired_lease_counts_as_attempt(self):
+        """Test an email whose worker keeps dying mid-send is given up after MAX_ATTEMPTS"""
+        email = queue_email('Subject', 'Body', ['user@example.com'])
+
+        # The worker dies after claiming the email, every time
+        with mock.patch('apps.notifications.tasks.get_connection', side_effect=SystemExit):
+            for attempt in range(MAX_ATTEMPTS):
+                with self.assertRaises(SystemExit):
+                    send_queued_emails()
+                email.refresh_from_db()
+                self.assertEqual(email.status, 'sending')
+                self.assertEqual(email.attempts, attempt + 1)
+                OutboxEmail.objects.update(available_at=timezone.now())
+
+        send_queued_emails()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'failed')
+        self.assertEqual(email.attempts, MAX_ATTEMPTS)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+@override_settings(EMAIL_POOL_SIZE=2, EMAIL_POOL_IDLE_TIMEOUT=60, EMAIL_POOL_MAX_MESSAGES=3)
+class PooledEmailBackendTestCase(TestCase):
+
+    def setUp(self):
+        """Patch out the network and start from an empty pool"""
+        connection_pool.clear()
+        self.addCleanup(connection_pool.clear)
+        patcher = mock.patch('smtplib.SMTP')
+        self.smtp_class = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.smtp_class.return_value.noop.return_value = (250, b'OK')
+
+    def send(self, count=1):
+        backend = EmailBackend(host='localhost', port=25, username='', password='', use_tls=False)
+        messages = [
+            EmailMessage('Subject', 'Body', 'from@example.com', ['to@example.com'])
+            for _ in range(count)
+        ]
+        return backend.send_messages(messages)
+
+    def test_sessions_are_reused(self):
+        """Test consecutive sends share one SMTP session"""
+        self.send()
+        self.send()
+
+        self.assertEqual(self.smtp_class.call_count, 1)
+        self.assertEqual(self.smtp_class.return_value.sendmail.call_count, 2)
+        self.smtp_class.return_value.quit.assert_not_called()
+
+    def test_dead_session_is_replaced(self):
+        """Test a session failing its NOOP health check is dropped"""
+        self.send()
+        self.smtp_class.return_value.noop.return_value = (421, b'Closing')
+
+        self.send()
+
+        self.assertEqual(self.smtp_class.call_count, 2)
+
+    def test_session_rotates_after_max_messages(self):
+        """Test a session is retired after EMAIL_POOL_MAX_MESSAGES"""
+        self.assertEqual(self.send(count=5), 5)
+
+        self.assertEqual(self.smtp_class.call_count, 2)
+        self.smtp_class.return_value.quit.assert_called_once()
+
+    @override_settings(EMAIL_POOL_SIZE=0)
+    def test_pooling_disabled(self):
+        """Test EMAIL_POOL_SIZE = 0 opens a session per send"""
+        self.send()
+        self.send()
+
+        self.assertEqual(self.smtp_class.call_count, 2)
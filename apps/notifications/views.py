@@ -8,6 +8,7 @@ import json
 
 from apps.bookings.models import Event # Booking model
 from apps.authentication.models import User # User model
+from .tasks import queue_email
 
 def send_booking_notifications(event, spaces, user):
     # Organizer email
@@ -155,15 +156,8 @@ def send_booking_approved_notification(event, spaces, user):
     }
     html_message = render_to_string('emails/booking_approved.html', context)
     
-    # Send email
-    email = EmailMultiAlternatives(
-        subject,
-        message_plain,
-        settings.DEFAULT_FROM_EMAIL,
-        [user_email]
-    )
-    email.attach_alternative(html_message, "text/html")
-    email.send()
+    # Delivered from the outbox after commit
+    queue_email(subject, message_plain, [user_email], html_body=html_message)
 
 def send_booking_rejected_notification(event, spaces, user):
     user_email = user.email 
@@ -188,14 +182,64 @@ def send_booking_rejected_notification(event, spaces, user):
     }
     html_message = render_to_string('emails/booking_rejected.html', context)
     
-    # Send email
-    email = EmailMultiAlternatives(
-        subject,
-        message_plain,
-        settings.DEFAULT_FROM_EMAIL,
-        [user_email]
+    # Delivered from the outbox after commit
+    queue_email(subject, message_plain, [user_email], html_body=html_message)
+
+
+def send_waitlist_promoted_notification(event, user):
+    first_name = user.first_name or user.email
+    subject = f"Waitlist Slot Available: {event.event_name}"
+
+    # Plain text version (fallback)
+    message_plain = (
+        f"Dear {first_name},\n\n"
+        f"The slot you were waiting for in {event.space.name} has opened up.\n"
+        f"Your booking for event '{event.event_name}' has been created and is pending approval.\n\n"
+        "Regards,\nSmartSpace Team"
     )
-    email.attach_alternative(html_message, "text/html")
-    email.send()
 
+    # HTML version
+    context = {
+        'subject': subject,
+        'first_name': first_name,
+        'event': event,
+    }
+    html_message = render_to_string('emails/waitlist_promoted.html', context)
 
+    # Delivered from the outbox after commit
+    queue_email(subject, message_plain, [user.email], html_body=html_message)
+
+
+def queue_booking_batch_notifications(events, user):
+    """
+    Queue one digest per recipient for a batch of submitted events: the
+    booking user and the admin see every event, each space organizer sees
+    the events in their spaces.
+    """
+    user_name = user.get_full_name or user.email
+    admin_email = getattr(settings, 'ADMIN_EMAIL', None)
+
+    digests = {}
+    names = {admin_email: 'Admin'}
+    for event in events:
+        organizer = event.space.organizer
+        if organizer is not None:
+            names.setdefault(organizer.email, organizer.get_full_name)
+        for email in (user.email, getattr(organizer, 'email', None), admin_email):
+            if email and event not in digests.setdefault(email, []):
+                digests[email].append(event)
+    names[user.email] = user_name
+
+    for email, recipient_events in digests.items():
+        subject = f"{len(recipient_events)} Event Bookings Submitted"
+        message_plain = "The following events have been submitted and are pending approval:\n\n" + "\n".join(
+            f"- {event.event_name}: {event.space.name}, {event.start_datetime} - {event.end_datetime}"
+            for event in recipient_events
+        )
+        context = {
+            'subject': subject,
+            'user_name': names.get(email, email),
+            'events': recipient_events,
+        }
+        html_message = render_to_string('emails/booking_batch_submitted.html', context)
+        queue_email(subject, message_plain, [email], html_body=html_message)
@@ -1,9 +1,12 @@
 # Register your models here.
 from django.contrib import admin
+from django.db import transaction
+from apps.core.versioning import StaleVersion, VersionedModelForm
 from .models import Space
 
 @admin.register(Space)
 class SpaceAdmin(admin.ModelAdmin):
+    form = VersionedModelForm
     list_display = ['name', 'location', 'capacity', 'status', 'created_at', 'price_per_hour']
     list_filter = ['status', 'created_at', 'capacity']
     search_fields = ['name', 'location', 'description']
@@ -13,7 +16,7 @@ class SpaceAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('name', 'location', 'capacity', 'status', 'price_per_hour')
+            'fields': ('name', 'location', 'capacity', 'status', 'price_per_hour', 'loaded_version')
         }),
         ('Images', {
             'fields': ('image1', 'image2', 'image3', 'image4', 'image5'),
@@ -28,3 +31,15 @@ class SpaceAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+    def save_model(self, request, obj, form, change):
+        try:
+            # A savepoint, so the admin's transaction survives a stale save
+            with transaction.atomic():
+                super().save_model(request, obj, form, change)
+        except StaleVersion:
+            self.message_user(
+                request,
+                'The space was changed by someone else; your changes were not saved.',
+                level='ERROR'
+            )
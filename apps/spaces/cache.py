@@ -0,0 +1,50 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+
+# Every cached catalogue payload is keyed by the current version, so bumping
+# the version invalidates all of them at once; old entries simply expire.
+VERSION_KEY = 'spaces:catalogue:version'
+MODIFIED_KEY = 'spaces:catalogue:modified'
+PAYLOAD_TIMEOUT = 60 * 60
+
+
+def _fresh_version():
+    # Time based, so a version lost to eviction never reuses an old number
+    return int(time.time() * 1000)
+
+
+def catalogue_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _fresh_version(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def catalogue_last_modified():
+    timestamp = cache.get(MODIFIED_KEY)
+    if timestamp is None:
+        cache.add(MODIFIED_KEY, time.time(), None)
+        timestamp = cache.get(MODIFIED_KEY)
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+def bump_catalogue_version():
+    """Invalidate every cached spaces payload"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _fresh_version(), None)
+    cache.set(MODIFIED_KEY, time.time(), None)
+
+
+def cached_payload(name, build):
+    """Return the payload cached under name for this version, building it on a miss"""
+    key = f'spaces:catalogue:{catalogue_version()}:{name}'
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, PAYLOAD_TIMEOUT)
+    return payload
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Space',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('location', models.CharField(max_length=255)),
+                ('capacity', models.IntegerField()),
+                ('status', models.CharField(choices=[('booked', 'Booked'), ('free', 'Free')], default='free', max_length=20)),
+                ('image1', models.ImageField(blank=True, null=True, upload_to='spaces/images/')),
+                ('image2', models.ImageField(blank=True, null=True, upload_to='spaces/images/')),
+                ('image3', models.ImageField(blank=True, null=True, upload_to='spaces/images/')),
+                ('image4', models.ImageField(blank=True, null=True, upload_to='spaces/images/')),
+                ('image5', models.ImageField(blank=True, null=True, upload_to='spaces/images/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('equipment', models.TextField(blank=True, null=True)),
+                ('features', models.TextField(blank=True, null=True)),
+                ('price_per_hour', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('organizer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='organized_spaces', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-17 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spaces', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='space',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -1,8 +1,9 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from apps.core.versioning import VersionedModel
 
 # Create your models here.
-class Space(models.Model):
+class Space(VersionedModel):
     STATUS_CHOICES = [
         ('booked', 'Booked'),
         ('free', 'Free'),
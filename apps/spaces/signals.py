@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalogue_version
+from .models import Space
+
+
+@receiver(post_save, sender=Space)
+@receiver(post_delete, sender=Space)
+def invalidate_catalogue(sender, **kwargs):
+    # After commit, so a concurrent reader can't cache the old row under the new version
+    transaction.on_commit(bump_catalogue_version)
@@ -1,7 +1,15 @@
-from django.test import TestCase
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
+from django.utils import timezone
+from apps.authentication.models import User
+from apps.bookings.models import Event
+from apps.bookings.space_index import space_intervals
 from .models import Space
 
 class SpaceViewTestCase(APITestCase):
@@ -61,3 +69,303 @@ class SpaceViewTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['name'], 'Test Conference Room')
+
+
+class SpaceCatalogueCacheTestCase(APITestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.list_url = reverse('list-spaces')
+        self.space = Space.objects.create(
+            name="Test Conference Room",
+            location="Building A, Floor 1",
+            capacity=50,
+            price_per_hour='100.00'
+        )
+        self.detail_url = reverse('space-detail', args=[self.space.pk])
+
+    def test_list_served_from_cache(self):
+        """Test a repeated listing does not touch the database"""
+        self.client.get(self.list_url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['name'], 'Test Conference Room')
+
+    def test_etag_not_modified(self):
+        """Test a matching If-None-Match returns 304"""
+        response = self.client.get(self.detail_url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_save_invalidates_cache(self):
+        """Test saving a space bumps the version and refreshes payloads"""
+        etag = self.client.get(self.detail_url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.space.name = 'Renamed Room'
+            self.space.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Renamed Room')
+
+    def test_missing_space(self):
+        """Test an unknown id returns 404"""
+        response = self.client.get(reverse('space-detail', args=[self.space.pk + 1]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SpaceUpdateTestCase(APITestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            first_name='Admin',
+            last_name='User',
+            password='testpass123'
+        )
+        self.space = Space.objects.create(
+            name="Test Conference Room",
+            location="Building A, Floor 1",
+            capacity=50,
+            price_per_hour='100.00'
+        )
+        self.url = reverse('space-detail', args=[self.space.pk])
+        self.client.force_authenticate(user=self.admin)
+
+    def test_etag_is_version(self):
+        """Test the detail ETag is the version a client sends back as If-Match"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response['ETag'], '"1"')
+        self.assertEqual(response.data['version'], 1)
+
+    def test_update_with_current_etag(self):
+        """Test an update naming the current version succeeds and returns the next ETag"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, {'capacity': 80}, format='json', HTTP_IF_MATCH='"1"')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"2"')
+        self.assertEqual(self.client.get(self.url).data['capacity'], 80)
+
+    def test_update_with_stale_etag(self):
+        """Test an update naming an old version gets 412 and changes nothing"""
+        self.space.name = 'Renamed Room'
+        self.space.save()
+
+        response = self.client.patch(self.url, {'capacity': 80}, format='json', HTTP_IF_MATCH='"1"')
+
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response['ETag'], '"2"')
+        self.space.refresh_from_db()
+        self.assertEqual(self.space.capacity, 50)
+
+    def test_invalid_if_match(self):
+        """Test an If-Match that is not a version ETag is rejected"""
+        response = self.client.patch(self.url, {'capacity': 80}, format='json', HTTP_IF_MATCH='*')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_requires_staff(self):
+        """Test non-staff users cannot update spaces"""
+        user = User.objects.create_user(
+            email='user@example.com',
+            first_name='Test',
+            last_name='User',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=user)
+
+        response = self.client.patch(self.url, {'capacity': 80}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SpaceAvailabilityTestCase(APITestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        # Space ids are reused between tests; start from an empty index
+        space_intervals.clear()
+        self.user = User.objects.create_user(
+            email='organizer@example.com',
+            first_name='Test',
+            last_name='Organizer',
+            password='testpass123'
+        )
+        self.space = Space.objects.create(
+            name="Test Conference Room",
+            location="Building A, Floor 1",
+            capacity=50,
+            price_per_hour='100.00'
+        )
+        self.url = reverse('space-availability', args=[self.space.pk])
+        self.day = timezone.make_aware(
+            datetime.combine(timezone.localdate() + timedelta(days=2), time.min)
+        )
+
+    def create_event(self, start_hour, end_hour, event_status='confirmed'):
+        return Event.objects.create(
+            event_name='Team Meeting',
+            start_datetime=self.day + timedelta(hours=start_hour),
+            end_datetime=self.day + timedelta(hours=end_hour),
+            organizer_name='Test Organizer',
+            organizer_email='organizer@example.com',
+            status=event_status,
+            user=self.user,
+            space=self.space
+        )
+
+    def get_slots(self, from_hour, to_hour, min_duration=0):
+        response = self.client.get(self.url, {
+            'from': (self.day + timedelta(hours=from_hour)).isoformat(),
+            'to': (self.day + timedelta(hours=to_hour)).isoformat(),
+            'min_duration': min_duration,
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            ((slot['start'] - self.day).total_seconds() / 3600,
+             (slot['end'] - self.day).total_seconds() / 3600)
+            for slot in response.data['free_slots']
+        ]
+
+    def test_gaps_between_events(self):
+        """Test free slots are the gaps between active events"""
+        self.create_event(9, 10)
+        self.create_event(9.5, 11, 'pending')
+        self.create_event(12, 13, 'cancelled')
+        self.create_event(14, 15)
+
+        self.assertEqual(self.get_slots(8, 18), [(8, 9), (11, 14), (15, 18)])
+        self.assertEqual(self.get_slots(8, 18, min_duration=120), [(11, 14), (15, 18)])
+
+    def test_window_spanning_days(self):
+        """Test events crossing midnight block both days once"""
+        self.create_event(22, 26)
+
+        self.assertEqual(self.get_slots(20, 30), [(20, 22), (26, 30)])
+
+    def test_cached_until_events_change(self):
+        """Test repeat lookups skip the event query while the index is live, until an event changes"""
+        with mock.patch.object(space_intervals, 'is_live', return_value=True):
+            self.get_slots(8, 18)
+            with self.assertNumQueries(1):
+                self.get_slots(8, 18)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_event(9, 10)
+
+        self.assertEqual(self.get_slots(8, 18), [(8, 9), (10, 18)])
+
+    @override_settings(INTERVAL_INDEX_REDIS_URL=None)
+    def test_follows_changes_without_channel(self):
+        """Test without an invalidation channel changes made by other processes show up at once"""
+        # Outside a transaction, as in a web worker
+        with mock.patch('apps.bookings.space_index.connection') as index_connection, \
+                mock.patch.object(space_intervals, '_load') as load:
+            index_connection.in_atomic_block = False
+            self.assertEqual(self.get_slots(8, 18), [(8, 18)])
+
+            # As a Celery task would, without invalidating this process
+            event = self.create_event(9, 10, 'pending')
+            self.assertEqual(self.get_slots(8, 18), [(8, 9), (10, 18)])
+            Event.objects.filter(pk=event.pk).update(status='rejected')
+            self.assertEqual(self.get_slots(8, 18), [(8, 18)])
+
+        load.assert_not_called()
+
+    def test_invalid_window(self):
+        """Test a reversed or missing window returns 400"""
+        response = self.client.get(self.url, {'from': self.day.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(self.url, {
+            'from': self.day.isoformat(),
+            'to': (self.day - timedelta(hours=1)).isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SearchFreeSpacesTestCase(APITestCase):
+
+    def setUp(self):
+        """Set up test data"""
+        space_intervals.clear()
+        self.url = reverse('search-spaces')
+        self.user = User.objects.create_user(
+            email='organizer@example.com',
+            first_name='Test',
+            last_name='Organizer',
+            password='testpass123'
+        )
+        self.small = Space.objects.create(name="Small Room", location="A", capacity=10, price_per_hour='20.00')
+        self.large = Space.objects.create(name="Large Hall", location="B", capacity=200, price_per_hour='300.00')
+        self.medium = Space.objects.create(name="Medium Room", location="C", capacity=50, price_per_hour='80.00')
+        self.start = timezone.now() + timedelta(days=1)
+
+    def book(self, space, event_status='confirmed'):
+        Event.objects.create(
+            event_name='Team Meeting',
+            start_datetime=self.start + timedelta(minutes=30),
+            end_datetime=self.start + timedelta(hours=3),
+            organizer_name='Test Organizer',
+            organizer_email='organizer@example.com',
+            status=event_status,
+            user=self.user,
+            space=space
+        )
+
+    def search(self, **params):
+        params.setdefault('from', self.start.isoformat())
+        params.setdefault('to', (self.start + timedelta(hours=2)).isoformat())
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [space['name'] for space in response.data['results']]
+
+    def test_excludes_booked_and_small_spaces(self):
+        """Test spaces with an overlapping event or too few seats are excluded"""
+        self.book(self.medium, 'pending')
+        self.book(self.small, 'cancelled')
+
+        self.assertEqual(self.search(capacity=5), ['Small Room', 'Large Hall'])
+        self.assertEqual(self.search(capacity=20), ['Large Hall'])
+
+    def test_ordering(self):
+        """Test results can be ordered by capacity or price"""
+        self.assertEqual(self.search(ordering='-capacity'), ['Large Hall', 'Medium Room', 'Small Room'])
+        self.assertEqual(self.search(ordering='price_per_hour'), ['Small Room', 'Medium Room', 'Large Hall'])
+
+    def test_queries_per_page(self):
+        """Test a page costs a count and one page fetch, both anti-joins, and never loads the index"""
+        self.book(self.medium)
+
+        with mock.patch.object(space_intervals, '_load') as load, self.assertNumQueries(2):
+            self.assertEqual(self.search(capacity=20), ['Large Hall'])
+        load.assert_not_called()
+
+    def test_search_follows_event_changes(self):
+        """Test a booking made after a search is reflected in the next one"""
+        self.assertEqual(self.search(capacity=20), ['Medium Room', 'Large Hall'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(self.large)
+
+        self.assertEqual(self.search(capacity=20), ['Medium Room'])
+
+    def test_invalid_window(self):
+        """Test a missing window returns 400"""
+        response = self.client.get(self.url, {'capacity': 10})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
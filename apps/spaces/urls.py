@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import list_spaces, space_detail
+from .views import list_spaces, space_detail, space_availability, SearchFreeSpacesView
 
 urlpatterns = [
     path('', list_spaces, name='list-spaces'),
+    path('search/', SearchFreeSpacesView.as_view(), name='search-spaces'),
     path('<int:pk>/', space_detail, name='space-detail'),
+    path('<int:pk>/availability/', space_availability, name='space-availability'),
 ]
\ No newline at end of file
@@ -1,5 +1,8 @@
+from datetime import timedelta
+
 from django.shortcuts import render
-from rest_framework.generics import CreateAPIView
+from rest_framework.generics import CreateAPIView, ListAPIView
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
@@ -7,9 +10,20 @@ from rest_framework import permissions
 from rest_framework.permissions import AllowAny
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition
+from apps.bookings.availability import busy_intervals, free_slots
+from apps.bookings.models import Event
+from apps.core.versioning import StaleVersion, check_if_match, precondition_failed
+from .cache import cached_payload, catalogue_last_modified, catalogue_version
 from .models import Space
 from .serializers import SpaceSerializer
 
+MAX_AVAILABILITY_DAYS = 31
+
 class CreateSpaceView(CreateAPIView):
     """
     Create a new space
@@ -63,33 +77,217 @@ class CreateSpaceView(CreateAPIView):
             'errors': serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
+def catalogue_etag(request, *args, **kwargs):
+    return f'W/"spaces-{catalogue_version()}"'
+
+def space_etag(request, pk):
+    # The row version, so the ETag a client reads is the one If-Match expects
+    data = space_detail_payload(pk)
+    return f'"{data["version"]}"' if data else None
+
+def catalogue_modified(request, *args, **kwargs):
+    return catalogue_last_modified()
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@condition(etag_func=catalogue_etag, last_modified_func=catalogue_modified)
 def list_spaces(request):
     """
     List all available spaces
     """
-    spaces = Space.objects.all()
-    serializer = SpaceSerializer(spaces, many=True)
-    return Response(serializer.data)
+    # Serialized once per catalogue version; Space changes bump the version
+    data = cached_payload(
+        'list',
+        lambda: list(SpaceSerializer(Space.objects.all(), many=True).data)
+    )
+    return Response(data)
+
+def space_detail_payload(pk):
+    def build():
+        space = Space.objects.filter(pk=pk).first()
+        # Cache misses too, so unknown ids don't hit the database every time
+        return dict(SpaceSerializer(space).data) if space else {}
+
+    return cached_payload(f'detail:{pk}', build)
 
 @swagger_auto_schema(
     method='get',
     operation_description="Retrieve details of a space by its ID.",
     responses={200: SpaceSerializer(), 404: 'Not Found'}
 )
-@api_view(['GET'])
+@swagger_auto_schema(
+    method='patch',
+    operation_description="Update a space. Send the ETag from a previous read as If-Match to "
+                          "refuse the update if someone else changed the space since.",
+    manual_parameters=[
+        openapi.Parameter('If-Match', openapi.IN_HEADER, type=openapi.TYPE_STRING,
+                          description='ETag of the version being updated'),
+    ],
+    request_body=SpaceSerializer,
+    responses={200: SpaceSerializer(), 400: 'Bad request - validation errors', 403: 'Forbidden',
+               404: 'Not Found', 412: 'The space was changed since it was read'}
+)
+@api_view(['GET', 'PATCH'])
 @permission_classes([permissions.AllowAny])
 def space_detail(request, pk):
     """
-    Retrieve details of a space by its ID.
+    Retrieve or update a space by its ID.
     """
+    if request.method == 'PATCH':
+        return update_space(request, pk)
+    return retrieve_space(request, pk)
+
+@condition(etag_func=space_etag, last_modified_func=catalogue_modified)
+def retrieve_space(request, pk):
+    data = space_detail_payload(pk)
+    if not data:
+        return Response({"error": "Space not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(data)
+
+def update_space(request, pk):
+    if not request.user.is_staff:
+        return Response({"error": "Only staff can update spaces"}, status=status.HTTP_403_FORBIDDEN)
+    space = Space.objects.filter(pk=pk).first()
+    if space is None:
+        return Response({"error": "Space not found"}, status=status.HTTP_404_NOT_FOUND)
+    error = check_if_match(request, space)
+    if error:
+        return error
+
+    serializer = SpaceSerializer(space, data=request.data, partial=True)
+    if not serializer.is_valid():
+        return Response({
+            'message': 'Failed to update space',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
     try:
-        space = Space.objects.get(pk=pk)
-    except Space.DoesNotExist:
+        # UPDATE ... WHERE version = <read>; no row lock is taken
+        with transaction.atomic():
+            serializer.save()
+    except StaleVersion:
+        space.refresh_from_db(fields=['version'])
+        return precondition_failed(space)
+
+    response = Response(serializer.data)
+    response['ETag'] = space.etag
+    return response
+
+def parse_window_datetime(value):
+    parsed = parse_datetime(value) if value else None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def parse_window(query_params, max_days=None):
+    """
+    Read the 'from'/'to' query parameters. Returns (start, end, error) where
+    error is a message for a 400 response, or None.
+    """
+    window_start = parse_window_datetime(query_params.get('from'))
+    window_end = parse_window_datetime(query_params.get('to'))
+    if window_start is None or window_end is None:
+        return None, None, "'from' and 'to' must be ISO datetimes"
+    if window_end <= window_start:
+        return None, None, "'to' must be after 'from'"
+    if max_days is not None and window_end - window_start > timedelta(days=max_days):
+        return None, None, f"The window cannot be longer than {max_days} days"
+    return window_start, window_end, None
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="List the free time slots of a space between two datetimes.",
+    manual_parameters=[
+        openapi.Parameter('from', openapi.IN_QUERY, type=openapi.TYPE_STRING, format='date-time',
+                          required=True, description='Window start (ISO format)'),
+        openapi.Parameter('to', openapi.IN_QUERY, type=openapi.TYPE_STRING, format='date-time',
+                          required=True, description=f'Window end (ISO format, at most {MAX_AVAILABILITY_DAYS} days after start)'),
+        openapi.Parameter('min_duration', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description='Only return slots at least this many minutes long'),
+    ],
+    responses={200: 'Free slots', 400: 'Invalid window', 404: 'Not Found'}
+)
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def space_availability(request, pk):
+    """
+    List the free time slots of a space between two datetimes.
+    """
+    window_start, window_end, error = parse_window(request.query_params, MAX_AVAILABILITY_DAYS)
+    if error:
+        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        min_duration = timedelta(minutes=int(request.query_params.get('min_duration', 0)))
+    except ValueError:
+        return Response({"error": "'min_duration' must be a number of minutes"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not Space.objects.filter(pk=pk).exists():
         return Response({"error": "Space not found"}, status=status.HTTP_404_NOT_FOUND)
-    serializer = SpaceSerializer(space)
-    return Response(serializer.data)
+
+    intervals = busy_intervals(pk, window_start, window_end)
+    slots = free_slots(intervals, window_start, window_end, min_duration)
+    return Response({
+        'space': pk,
+        'from': window_start,
+        'to': window_end,
+        'free_slots': [{'start': start, 'end': end} for start, end in slots]
+    })
+
+class SpaceSearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+class SearchFreeSpacesView(ListAPIView):
+    """
+    Find spaces with enough capacity that are free for a whole time window
+    """
+    serializer_class = SpaceSerializer
+    permission_classes = [AllowAny]
+    pagination_class = SpaceSearchPagination
+    ordering_fields = {'price_per_hour', '-price_per_hour', 'capacity', '-capacity'}
+
+    def get_queryset(self):
+        """
+        Spaces with capacity >= N and no pending/confirmed event overlapping
+        the window. Overlaps are filtered by one anti-join on the indexed
+        event columns, so each page is limited in SQL and a search never
+        loads the interval index of every candidate space.
+        """
+        queryset = Space.objects.all()
+        if self.capacity:
+            queryset = queryset.filter(capacity__gte=self.capacity)
+
+        ordering = self.request.query_params.get('ordering', 'price_per_hour')
+        if ordering not in self.ordering_fields:
+            ordering = 'price_per_hour'
+        overlapping = Event.objects.overlapping(OuterRef('pk'), self.window_start, self.window_end)
+        # id keeps pages stable between equal prices/capacities
+        return queryset.filter(~Exists(overlapping)).order_by(ordering, 'id')
+
+    @swagger_auto_schema(
+        operation_summary='Search free spaces',
+        operation_description='List spaces with at least `capacity` seats that have no pending or confirmed event between `from` and `to`.',
+        manual_parameters=[
+            openapi.Parameter('from', openapi.IN_QUERY, type=openapi.TYPE_STRING, format='date-time',
+                              required=True, description='Window start (ISO format)'),
+            openapi.Parameter('to', openapi.IN_QUERY, type=openapi.TYPE_STRING, format='date-time',
+                              required=True, description='Window end (ISO format)'),
+            openapi.Parameter('capacity', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='Minimum capacity'),
+            openapi.Parameter('ordering', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=sorted(ordering_fields), description='Sort order (default price_per_hour)'),
+        ],
+        responses={200: SpaceSerializer(many=True), 400: 'Invalid search'}
+    )
+    def get(self, request, *args, **kwargs):
+        self.window_start, self.window_end, error = parse_window(request.query_params)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            self.capacity = int(request.query_params.get('capacity', 0))
+        except ValueError:
+            return Response({"error": "'capacity' must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        return self.list(request, *args, **kwargs)
 
 @swagger_auto_schema(
     method='get',
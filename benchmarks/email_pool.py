@@ -0,0 +1,103 @@
+"""
+Compare messages/sec through core.backends.email_backend.EmailBackend with
+and without SMTP session pooling, against a local aiosmtpd sink.
+
+    pip install aiosmtpd
+    python benchmarks/email_pool.py --messages 500 --handshake-ms 50
+
+--handshake-ms delays the EHLO reply to stand in for the TCP/TLS/AUTH round
+trips a real provider such as Gmail costs on every new session.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class SinkHandler:
+    def __init__(self, handshake_delay):
+        self.handshake_delay = handshake_delay
+        self.sessions = 0
+        self.messages = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        await asyncio.sleep(self.handshake_delay)
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return '250 OK'
+
+
+def run(messages, pool_size, port):
+    from django.core.mail import EmailMessage, get_connection
+    from core.backends import email_backend
+
+    settings.EMAIL_POOL_SIZE = pool_size
+    email_backend.connection_pool.clear()
+
+    started = time.perf_counter()
+    for i in range(messages):
+        # A fresh backend per message, like send_mail() in a request
+        connection = get_connection(
+            'core.backends.email_backend.EmailBackend',
+            host='127.0.0.1', port=port, username='', password='',
+            use_tls=False, use_ssl=False
+        )
+        EmailMessage(
+            f'Benchmark {i}', 'Body', 'bench@example.com', ['sink@example.com'],
+            connection=connection
+        ).send()
+    return messages / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--handshake-ms', type=float, default=20.0)
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+
+    from aiosmtpd.controller import Controller
+
+    settings.configure(
+        EMAIL_HOST='127.0.0.1',
+        EMAIL_PORT=args.port,
+        EMAIL_HOST_USER='',
+        EMAIL_HOST_PASSWORD='',
+        EMAIL_USE_TLS=False,
+        EMAIL_USE_SSL=False,
+        EMAIL_POOL_SIZE=4,
+        EMAIL_POOL_IDLE_TIMEOUT=60,
+        EMAIL_POOL_MAX_MESSAGES=100,
+    )
+    django.setup()
+
+    handler = SinkHandler(args.handshake_ms / 1000)
+    controller = Controller(handler, hostname='127.0.0.1', port=args.port)
+    controller.start()
+    try:
+        results = {}
+        for label, pool_size in (('without pooling', 0), ('with pooling', 4)):
+            handler.sessions = 0
+            rate = run(args.messages, pool_size, args.port)
+            results[label] = rate
+            print(f'{label:>16}: {rate:8.1f} msg/s over {handler.sessions} SMTP sessions')
+        speedup = results['with pooling'] / results['without pooling']
+        print(f'{"speedup":>16}: {speedup:8.1f}x')
+    finally:
+        controller.stop()
+
+
+if __name__ == '__main__':
+    os.environ.pop('DJANGO_SETTINGS_MODULE', None)
+    main()
@@ -0,0 +1,163 @@
+"""
+Measure the in-process interval index (apps.bookings.space_index) at
+production scale: build time, memory, single-space conflict checks and a
+search across every space, optionally against the equivalent SQL on an
+indexed SQLite table.
+
+    python benchmarks/interval_index.py --spaces 10000 --events 1000
+    python benchmarks/interval_index.py --spaces 10000 --events 1000 --sql
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+HOUR = 3600 * 1_000_000
+EPOCH_2030 = int(datetime(2030, 1, 1, tzinfo=timezone.utc).timestamp()) * 1_000_000
+
+
+def synthetic_events(space_id, events, rng):
+    """Non-overlapping 1-3 hour events separated by 0-6 hour gaps"""
+    cursor = EPOCH_2030 + rng.randrange(24) * HOUR
+    rows = []
+    for i in range(events):
+        cursor += rng.randrange(0, 7) * HOUR
+        end = cursor + rng.randrange(1, 4) * HOUR
+        rows.append((cursor, end, space_id * events + i))
+        cursor = end
+    return rows
+
+
+def timed(label, operations, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f'{label:>34}: {elapsed * 1e6 / operations:10.2f} us/op  ({operations} ops, {elapsed:.2f}s)')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--spaces', type=int, default=10000)
+    parser.add_argument('--events', type=int, default=1000, help='events per space')
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--searches', type=int, default=20)
+    parser.add_argument('--sql', action='store_true', help='also time the same queries in SQLite')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    settings.configure(
+        INSTALLED_APPS=[
+            'django.contrib.contenttypes',
+            'django.contrib.auth',
+            'apps.authentication',
+            'apps.spaces',
+            'apps.notifications',
+            'apps.bookings',
+        ],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        AUTH_USER_MODEL='authentication.User',
+        USE_TZ=True,
+        SECRET_KEY='benchmark',
+    )
+    django.setup()
+    from apps.bookings.space_index import SpaceIntervals
+
+    rng = random.Random(args.seed)
+    total = args.spaces * args.events
+    print(f'{args.spaces} spaces x {args.events} events = {total:,} intervals')
+
+    started = time.perf_counter()
+    rows = {}
+    index = {}
+    for space_id in range(args.spaces):
+        rows[space_id] = synthetic_events(space_id, args.events, rng)
+        index[space_id] = SpaceIntervals(rows[space_id])
+    build_seconds = time.perf_counter() - started
+    index_bytes = sum(
+        sum(column.buffer_info()[1] * column.itemsize for column in
+            (intervals.starts, intervals.ends, intervals.max_ends, intervals.event_ids))
+        for intervals in index.values()
+    )
+    print(f'{"build (incl. generating rows)":>34}: {build_seconds:10.2f} s')
+    print(f'{"index memory":>34}: {index_bytes / 2 ** 20:10.1f} MiB')
+
+    span = rows[0][-1][1] - EPOCH_2030
+    queries = [
+        (rng.randrange(args.spaces), EPOCH_2030 + rng.randrange(span), rng.randrange(1, 4) * HOUR)
+        for _ in range(args.lookups)
+    ]
+
+    def lookups():
+        return sum(
+            index[space_id].find_overlap(start, start + length) is not None
+            for space_id, start, length in queries
+        )
+
+    conflicts = timed('index: conflict check', args.lookups, lookups)
+    print(f'{"":>34}  {conflicts / args.lookups:.0%} of checks found a conflict')
+
+    windows = [
+        (EPOCH_2030 + rng.randrange(span), rng.randrange(1, 4) * HOUR)
+        for _ in range(args.searches)
+    ]
+
+    def searches():
+        return [
+            sum(1 for intervals in index.values() if intervals.find_overlap(start, start + length) is None)
+            for start, length in windows
+        ]
+
+    timed(f'index: search {args.spaces} spaces', args.searches, searches)
+
+    if not args.sql:
+        return
+
+    db = sqlite3.connect(':memory:')
+    db.execute('CREATE TABLE event (id INTEGER PRIMARY KEY, space_id INTEGER, start INTEGER, "end" INTEGER)')
+    started = time.perf_counter()
+    db.executemany(
+        'INSERT INTO event VALUES (?, ?, ?, ?)',
+        ((event_id, space_id, start, end) for space_id, space_rows in rows.items()
+         for start, end, event_id in space_rows)
+    )
+    db.execute('CREATE INDEX event_space_range ON event (space_id, start, "end")')
+    db.execute('CREATE TABLE space (id INTEGER PRIMARY KEY)')
+    db.executemany('INSERT INTO space VALUES (?)', ((space_id,) for space_id in range(args.spaces)))
+    db.commit()
+    print(f'{"sqlite load + index":>34}: {time.perf_counter() - started:10.2f} s')
+
+    overlap_sql = 'SELECT id FROM event WHERE space_id = ? AND start < ? AND "end" > ? LIMIT 1'
+
+    def sql_lookups():
+        return sum(
+            db.execute(overlap_sql, (space_id, start + length, start)).fetchone() is not None
+            for space_id, start, length in queries
+        )
+
+    sql_conflicts = timed('sqlite: conflict check', args.lookups, sql_lookups)
+    assert sql_conflicts == conflicts, 'index and SQL disagree'
+
+    search_sql = (
+        'SELECT count(*) FROM space WHERE NOT EXISTS ('
+        ' SELECT 1 FROM event WHERE event.space_id = space.id AND start < ? AND "end" > ?)'
+    )
+
+    def sql_searches():
+        return [db.execute(search_sql, (start + length, start)).fetchone()[0] for start, length in windows]
+
+    timed(f'sqlite: search {args.spaces} spaces', args.searches, sql_searches)
+
+
+if __name__ == '__main__':
+    os.environ.pop('DJANGO_SETTINGS_MODULE', None)
+    main()
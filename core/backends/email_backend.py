@@ -1,9 +1,93 @@
+import os
+import smtplib
 import ssl
+import threading
+import time
+from collections import defaultdict
 
+from django.conf import settings
 from django.core.mail.backends.smtp import EmailBackend as SMTPBackend
 from django.utils.functional import cached_property
 
+
+class PooledConnection:
+    """An authenticated SMTP session plus the bookkeeping the pool needs"""
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Per-process pool of idle SMTP sessions, keyed by server and credentials
+    """
+
+    def __init__(self):
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def checkout(self, key, idle_timeout):
+        """Return a live pooled session for key, or None"""
+        while True:
+            with self._lock:
+                if not self._idle[key]:
+                    return None
+                pooled = self._idle[key].pop()
+            if time.monotonic() - pooled.last_used > idle_timeout:
+                self.discard(pooled)
+                continue
+            try:
+                # Servers drop idle sessions without telling us
+                if pooled.smtp.noop()[0] == 250:
+                    return pooled
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.discard(pooled)
+
+    def checkin(self, key, pooled, max_size):
+        """Keep pooled for reuse, or close it if the pool is full"""
+        pooled.last_used = time.monotonic()
+        with self._lock:
+            if len(self._idle[key]) < max_size:
+                self._idle[key].append(pooled)
+                return
+        self.discard(pooled)
+
+    def discard(self, pooled):
+        try:
+            pooled.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pooled.smtp.close()
+
+    def clear(self):
+        """Forget every pooled session without touching the sockets"""
+        with self._lock:
+            self._idle.clear()
+
+
+connection_pool = SMTPConnectionPool()
+
+# A forked child (gunicorn/celery prefork) must not share its parent's sockets
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=connection_pool.clear)
+
+
 class EmailBackend(SMTPBackend):
+    """
+    SMTP backend that returns sessions to a per-process pool on close()
+    instead of quitting, so consecutive sends skip the TCP/TLS handshake
+    and login. Set EMAIL_POOL_SIZE = 0 to disable pooling.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_size = getattr(settings, 'EMAIL_POOL_SIZE', 4)
+        self.pool_idle_timeout = getattr(settings, 'EMAIL_POOL_IDLE_TIMEOUT', 60)
+        self.pool_max_messages = getattr(settings, 'EMAIL_POOL_MAX_MESSAGES', 100)
+        self._pooled = None
+
     @cached_property
     def ssl_context(self):
         if self.ssl_certfile or self.ssl_keyfile:
@@ -14,4 +98,54 @@ class EmailBackend(SMTPBackend):
             ssl_context = ssl.create_default_context()
             ssl_context.check_hostname = False
             ssl_context.verify_mode = ssl.CERT_NONE
-            return ssl_context
\ No newline at end of file
+            return ssl_context
+
+    @property
+    def pool_key(self):
+        return (self.host, self.port, self.username, self.use_ssl, self.use_tls)
+
+    def open(self):
+        if self.connection:
+            return False
+
+        if self.pool_size > 0:
+            pooled = connection_pool.checkout(self.pool_key, self.pool_idle_timeout)
+            if pooled is not None:
+                self._pooled = pooled
+                self.connection = pooled.smtp
+                return True
+
+        opened = super().open()
+        if self.connection is not None:
+            self._pooled = PooledConnection(self.connection)
+        return opened
+
+    def close(self):
+        if self.connection is None:
+            return
+        pooled, self._pooled = self._pooled, None
+        if (
+            self.pool_size > 0 and pooled is not None
+            and pooled.messages_sent < self.pool_max_messages
+        ):
+            connection_pool.checkin(self.pool_key, pooled, self.pool_size)
+            self.connection = None
+            return
+        super().close()
+
+    def _send(self, email_message):
+        # Rotate long-lived sessions; some servers cap messages per session
+        if self._pooled is not None and self._pooled.messages_sent >= self.pool_max_messages:
+            super().close()
+            self._pooled = None
+            self.open()
+        try:
+            sent = super()._send(email_message)
+        except smtplib.SMTPServerDisconnected:
+            # Never hand a dead session back to the pool
+            self._pooled = None
+            super().close()
+            raise
+        if sent and self._pooled is not None:
+            self._pooled.messages_sent += 1
+        return sent
@@ -16,14 +16,35 @@ app.autodiscover_tasks()
 
 # Define periodic tasks
 app.conf.beat_schedule = {
-    'update-space-status-every-5-minutes': {
+    # Safety net for the start_event/finish_event ETA tasks scheduled on approval,
+    # and queues those of events coming within EVENT_TRANSITION_HORIZON
+    'reconcile-space-status-every-hour': {
         'task': 'apps.bookings.tasks.update_space_status',
-        'schedule': 300.0,  # every 5 minutes
+        'schedule': 3600.0,  # every hour
+    },
+    # Picks up outbox emails whose on_commit publish was lost or is due a retry
+    'send-queued-emails-every-minute': {
+        'task': 'apps.notifications.tasks.send_queued_emails',
+        'schedule': 60.0,  # every minute
     },
     'check-pending-events-every-hour': {
         'task': 'apps.bookings.tasks.check_pending_events',
         'schedule': 3600.0,  # every hour
     },
+    # Monthly partitions of closed events (PostgreSQL only)
+    'manage-event-partitions-daily': {
+        'task': 'apps.bookings.tasks.manage_event_partitions',
+        'schedule': 86400.0,  # every day
+    },
+    'archive-old-events-daily': {
+        'task': 'apps.bookings.tasks.archive_old_events',
+        'schedule': 86400.0,  # every day
+    },
+    # Safety net for the usage rollups maintained by the event signals
+    'reconcile-space-usage-nightly': {
+        'task': 'apps.bookings.tasks.reconcile_space_usage',
+        'schedule': 86400.0,  # every day
+    },
 }
 
 app.conf.timezone = 'Africa/Nairobi'
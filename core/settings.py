@@ -109,6 +109,53 @@ else:
         }
     }
 
+if DEBUG:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+    # Without a channel for invalidations the interval index is not live and
+    # overlap lookups run as indexed SQL queries
+    INTERVAL_INDEX_REDIS_URL = env("INTERVAL_INDEX_REDIS_URL", default=None)
+    # Booking holds are disabled unless a Redis server is given
+    BOOKING_HOLD_REDIS_URL = env("BOOKING_HOLD_REDIS_URL", default=None)
+else:
+    # Shared across gunicorn workers and Celery so version bumps are global
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": env("REDIS_CACHE_URL", default="redis://localhost:6379/1"),
+        }
+    }
+    # Pub/sub channel telling every process which spaces' intervals changed
+    INTERVAL_INDEX_REDIS_URL = env("INTERVAL_INDEX_REDIS_URL", default=CACHES["default"]["LOCATION"])
+    # Sorted set per space of the slots held while booking forms are open
+    BOOKING_HOLD_REDIS_URL = env("BOOKING_HOLD_REDIS_URL", default=CACHES["default"]["LOCATION"])
+
+# Spaces kept in each process's in-memory interval index (least recently used evicted)
+INTERVAL_INDEX_MAX_SPACES = env.int("INTERVAL_INDEX_MAX_SPACES", default=10000)
+
+# How long POST /api/bookings/hold/ keeps a slot for the user
+BOOKING_HOLD_SECONDS = env.int("BOOKING_HOLD_SECONDS", default=600)
+
+# How long a booking response is replayed for retries with the same Idempotency-Key
+IDEMPOTENCY_KEY_TTL = env.int("IDEMPOTENCY_KEY_TTL", default=24 * 60 * 60)
+
+# Monthly partitions of closed events created ahead of time, and the age in
+# months after which they are detached from the events table (unset: never)
+EVENT_PARTITION_MONTHS_AHEAD = env.int("EVENT_PARTITION_MONTHS_AHEAD", default=3)
+EVENT_PARTITION_DETACH_MONTHS = env.int("EVENT_PARTITION_DETACH_MONTHS", default=None)
+
+# Completed and cancelled events are moved out of the database into gzipped
+# NDJSON files under EVENT_ARCHIVE_DIR once they ended this many days ago
+EVENT_ARCHIVE_AFTER_DAYS = env.int("EVENT_ARCHIVE_AFTER_DAYS", default=365)
+
+# Hours a space is bookable per day, the denominator of utilization reports
+SPACE_OPEN_HOURS_PER_DAY = env.int("SPACE_OPEN_HOURS_PER_DAY", default=24)
+# Days either side of today whose usage rollups are rebuilt every night
+SPACE_USAGE_RECONCILE_DAYS = env.int("SPACE_USAGE_RECONCILE_DAYS", default=31)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -174,6 +221,10 @@ EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
+# SMTP session pooling in core.backends.email_backend (EMAIL_POOL_SIZE = 0 disables it)
+EMAIL_POOL_SIZE = env.int('EMAIL_POOL_SIZE', default=4)
+EMAIL_POOL_IDLE_TIMEOUT = 60  # seconds an idle session is kept
+EMAIL_POOL_MAX_MESSAGES = 100  # messages per session before reconnecting
 
 # Add this line to your settings file if it's not already there
 AUTH_USER_MODEL = 'authentication.User'
@@ -186,6 +237,13 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+# Event start/end ETA tasks are only queued this many seconds ahead; the hourly
+# update_space_status sweep queues later ones as they come within range
+EVENT_TRANSITION_HORIZON = env.int('EVENT_TRANSITION_HORIZON', default=24 * 3600)
+# The Redis transport redelivers any message unacknowledged for longer than
+# visibility_timeout, and ETA tasks stay unacknowledged until they run, so it
+# must exceed the horizon or every ETA task would be executed more than once
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': EVENT_TRANSITION_HORIZON + 3600}
 
 SWAGGER_SETTINGS = {
     'DOC_EXPANSION': 'none',
@@ -255,6 +313,7 @@ CORS_ALLOWED_ORIGIN_REGEXES = [
 # Media files (uploaded by users)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+EVENT_ARCHIVE_DIR = os.path.join(MEDIA_ROOT, 'event-archive')
 
 # Site URL for absolute URLs in emails
 # In production, set this to the actual domain